@@ -1,7 +1,19 @@
 # SpreadsheetManager.py
+import asyncio
 import os
-from google.oauth2.service_account import Credentials
+import re
+import sqlite3
+import threading
+import time
 import gspread
+import requests
+
+from applicant_archive import archive as applicant_archive
+from applicant_mirror import ApplicantMirror
+from applicant_queue import ApplicantQueue
+from metrics import metrics
+from sheets_client import registry as sheets_registry
+from sheets_scheduler import scheduler
 
 
 # 新しいスプレッドシート設定
@@ -11,6 +23,52 @@ NEW_SHEET_NAME = '応募者シート'
 # 旧スプレッドシート設定（参照用に保持）
 OLD_SPREADSHEET_ID = '1UQk_YkjIFSrg1hSRRYLsO9bHwZ0xGSrxC3fFB62pONo'
 
+# 新しいカラム構成（A列から順に書き込む28列）
+ROW_HEADERS = [
+    "クライアント", "職種", "応募日時", "都道府県", "エリア", "名前", "年齢",
+    "応募先求人（URL）", "施設形態", "施設形態詳細", "ふりがな", "メールアドレス",
+    "電話番号", "生年月日", "性別", "住所", "タイトル", "クライアント名", "備考",
+    "pdfURL", "アカウントID", "応募者ID", "割り当て", "集計状況", "媒体",
+    "応募先企業名", "", ""
+]
+
+# シートのヘッダー名から列位置を探して書き込むカラム
+EXTRA_HEADERS = ["郵便番号", "実行環境"]
+
+# (スプレッドシートID, シート名) → {列名: 列番号(1-based)}
+_header_map_cache = {}
+
+
+def _default_credentials_path():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, "Credentials.json")
+
+
+def row_layout(header_map=None):
+    """
+    書き込み用の行の列ごとの出力カラム名。ROW_HEADERS（A列から28列）に、
+    シートのヘッダー（header_map: 列名→列番号）で位置が分かる EXTRA_HEADERS の列を加える
+    """
+    layout = list(ROW_HEADERS)
+    for header in EXTRA_HEADERS:
+        col_index = (header_map or {}).get(header)
+        if not col_index:
+            continue
+        if len(layout) < col_index:
+            layout.extend([""] * (col_index - len(layout)))
+        layout[col_index - 1] = header
+    return layout
+
+
+def _parse_updated_rows(response, row_count):
+    """values.append のレスポンス（updatedRange）から書き込まれた行番号を取り出す"""
+    updated_range = (response or {}).get('updates', {}).get('updatedRange', '')
+    match = re.search(r'![A-Z]+(\d+)', updated_range)
+    if not match:
+        return []
+    first_row = int(match.group(1))
+    return list(range(first_row, first_row + row_count))
+
 
 class SpreadsheetManager:
     def __init__(self, credentials_path, spreadsheet_key=None, sheet_name=None):
@@ -22,104 +80,162 @@ class SpreadsheetManager:
         self.sheet = self._get_sheet()
 
     def _authenticate(self):
-        scopes = [
-            'https://www.googleapis.com/auth/spreadsheets',
-            'https://www.googleapis.com/auth/drive'
-        ]
-        credentials = Credentials.from_service_account_file(
-            self.credentials_path, scopes=scopes
-        )
-        return gspread.authorize(credentials)
+        # 認証済みクライアントはプロセス内で共有する
+        return sheets_registry.get_client(self.credentials_path)
 
     def _get_sheet(self):
-        spreadsheet = self.client.open_by_key(self.spreadsheet_key)
-        return spreadsheet.worksheet(self.sheet_name)
+        return sheets_registry.get_worksheet(self.spreadsheet_key, self.sheet_name, self.credentials_path)
+
+    def _get_header_map(self):
+        """1行目のヘッダーを読み込み、列名→列番号(1-based)の対応をキャッシュする"""
+        cache_key = (self.spreadsheet_key, self.sheet_name)
+        header_map = _header_map_cache.get(cache_key)
+        if header_map is None:
+            header_map = {}
+            header_row = scheduler.read(self.sheet.row_values, 1, coalesce_key=('row_values', *cache_key, 1))
+            for index, header in enumerate(header_row, start=1):
+                if header and header not in header_map:
+                    header_map[header] = index
+            _header_map_cache[cache_key] = header_map
+        return header_map
+
+    def _build_rows(self, data_list):
+        """変換済みのデータ（DataProcessor.process_batch の結果）を書き込み用の2次元配列に並べる"""
+        # USER_ENTEREDで書き込み（数値・日付を適切に解釈させる）
+        layout = row_layout(self._get_header_map())
+        return DataProcessor.to_matrix(data_list, layout, processed=True)
 
-    def write_data(self, data):
-        # 新しいカラム構成（26列）
-        headers = [
-            "クライアント", "職種", "応募日時", "都道府県", "エリア", "名前", "年齢",
-            "応募先求人（URL）", "施設形態", "施設形態詳細", "ふりがな", "メールアドレス",
-            "電話番号", "生年月日", "性別", "住所", "タイトル", "クライアント名", "備考",
-            "pdfURL", "アカウントID", "応募者ID", "割り当て", "集計状況", "媒体",
-            "応募先企業名", "", ""
-        ]
-
-        # Prepare the row data
-        row_data = [
-            data.get(header, "") for header in headers
-        ]
+    def write_rows(self, data_list):
+        """
+        複数件のデータを1回の values.append で書き込む
+        書き込まれた行番号のリストを返す
+        """
+        if not data_list:
+            return []
 
-        # USER_ENTEREDで書き込み（数値・日付を適切に解釈させる）
-        self.sheet.append_row(row_data, value_input_option='USER_ENTERED')
+        rows = self._build_rows(data_list)
+        response = scheduler.append(self.sheet.append_rows, rows, value_input_option='USER_ENTERED')
+        return _parse_updated_rows(response, len(rows))
 
-        # ヘッダー名で列を探して追加書き込み
-        header_row = self.sheet.row_values(1)
-        last_row = len(self.sheet.get_all_values())
+    def write_data(self, data):
+        return self.write_rows([data])
 
-        # 郵便番号
-        postal_code = data.get("郵便番号", "")
-        if postal_code and "郵便番号" in header_row:
-            col_index = header_row.index("郵便番号") + 1  # 1-based
-            self.sheet.update_cell(last_row, col_index, postal_code)
+    def upsert_rows(self, data_list, key_column="応募者ID"):
+        """
+        key_column（ID または 応募者ID）をキーに、既存の行があればその行を更新し、なければ追記する。
+        ミラーのロック内で「同期→判定→書き込み→ミラー反映」を行うため、
+        即時スクレイパーと定期スクレイパーが同時に書き込んでも同じキーの行は二重に追記されない。
+        更新する行はシート上のキー列を読み直して確認し、一致しなければ（行の削除・挿入・並べ替え）
+        ミラーを全件同期し直してから書き込む。それでも一致しない行は追記する。
+        戻り値: {'updated': [行番号, ...], 'appended': [行番号, ...]}
+        """
+        result = {'updated': [], 'appended': []}
+        if not data_list:
+            return result
 
-        # 実行環境
-        execution_env = data.get("実行環境", "")
-        if execution_env and "実行環境" in header_row:
-            col_index = header_row.index("実行環境") + 1  # 1-based
-            self.sheet.update_cell(last_row, col_index, execution_env)
+        # 同じキーが複数あれば後のデータを優先
+        keyed = {}
+        for data in data_list:
+            key = data.get(key_column, "")
+            keyed[key or id(data)] = data
+
+        mirror = ApplicantMirror(self.spreadsheet_key, self.sheet_name)
+        try:
+            with mirror.locked():
+                mirror.sync(self.sheet)
+                updates, appends = self._split_upserts(mirror, keyed, key_column)
+                if updates and self._mismatched_updates(mirror, updates, key_column):
+                    print("更新先の行のキーがミラーと一致しません。ミラーを全件同期し直します")
+                    mirror.resync(self.sheet)
+                    updates, appends = self._split_upserts(mirror, keyed, key_column)
+                    mismatched = set(self._mismatched_updates(mirror, updates, key_column))
+                    if mismatched:
+                        print(f"全件同期後もキーが一致しない行は追記します: {sorted(mismatched)}")
+                        appends.extend(data for row_number, data in updates if row_number in mismatched)
+                        updates = [(row_number, data) for row_number, data in updates if row_number not in mismatched]
+
+                if updates:
+                    self._update_rows(updates)
+                    result['updated'] = [row_number for row_number, _ in updates]
+
+                if appends:
+                    rows = self._build_rows(appends)
+                    response = scheduler.append(self.sheet.append_rows, rows, value_input_option='USER_ENTERED')
+                    result['appended'] = _parse_updated_rows(response, len(rows))
+                    mirror.record_rows(result['appended'], rows, appends)
+        finally:
+            mirror.close()
+        return result
+
+    @staticmethod
+    def _split_upserts(mirror, keyed, key_column):
+        """ミラーで行番号が見つかったデータを更新、それ以外を追記に分ける。(updates, appends) を返す"""
+        if not mirror.has_column(key_column):
+            print(f"'{key_column}'カラムが見つからないため追記します")
+            return [], list(keyed.values())
+        updates, appends = [], []
+        for key, data in keyed.items():
+            row_number = mirror.find_row(key_column, key) if isinstance(key, str) else None
+            if row_number:
+                updates.append((row_number, data))
+            else:
+                appends.append(data)
+        return updates, appends
+
+    def _mismatched_updates(self, mirror, updates, key_column):
+        """更新先の行のキー列をシートから読み直し、キーが一致しない行番号を返す"""
+        expected = {row_number: data.get(key_column, "") for row_number, data in updates}
+        return mirror.mismatched_rows(self.sheet, key_column, expected)
+
+    def _update_rows(self, updates):
+        """既存行を1回の batch_update で更新する（手入力される空欄の列は上書きしない）"""
+        value_ranges = []
+        rows = self._build_rows([data for _, data in updates])
+        for (row_number, _), row_data in zip(updates, rows):
+            for col_index, value in enumerate(row_data, start=1):
+                if value == "" or value is None:
+                    continue
+                value_ranges.append({
+                    'range': gspread.utils.rowcol_to_a1(row_number, col_index),
+                    'values': [[value]],
+                })
+        if value_ranges:
+            scheduler.write(self.sheet.batch_update, value_ranges, value_input_option='USER_ENTERED')
+
+    def synced_mirror(self):
+        """ローカルミラーを差分同期して返す"""
+        mirror = ApplicantMirror(self.spreadsheet_key, self.sheet_name)
+        mirror.sync(self.sheet)
+        return mirror
 
     @classmethod
     def get_existing_ids(cls):
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        credentials_path = os.path.join(current_dir, "Credentials.json")
+        credentials_path = _default_credentials_path()
         spreadsheet_key = '1UQk_YkjIFSrg1hSRRYLsO9bHwZ0xGSrxC3fFB62pONo'
 
         writer = cls(credentials_path, spreadsheet_key)
-        all_values = writer.sheet.get_all_values()
-        
-        if len(all_values) > 1:  # Check if there's data besides the header
-            return [row[0] for row in all_values[1:]]  # Assuming ID is the first column
-        return []
+        # Assuming ID is the first column
+        return writer.synced_mirror().first_values()
+
     @classmethod
     def check_existing_id(cls, id_to_check):
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        credentials_path = os.path.join(current_dir, "Credentials.json")
+        credentials_path = _default_credentials_path()
         spreadsheet_key = '1UQk_YkjIFSrg1hSRRYLsO9bHwZ0xGSrxC3fFB62pONo'
 
-        manager = cls(credentials_path, spreadsheet_key)
-        all_values = manager.sheet.get_all_values()
-        
-        if len(all_values) > 1:
-            headers = all_values[0]
-            try:
-                id_index = headers.index("ID")
-                existing_ids = [row[id_index] for row in all_values[1:]]
-                return id_to_check in existing_ids
-            except ValueError:
-                print("'ID'カラムが見つかりません")
-                return False
-        return False
-        
+        mirror = cls(credentials_path, spreadsheet_key).synced_mirror()
+        if not mirror.has_column("ID"):
+            print("'ID'カラムが見つかりません")
+            return False
+        return mirror.has_record_id(id_to_check)
+
     @classmethod
     def check_existing_email(cls, email_to_check):
         """後方互換性のために残す（非推奨）"""
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        credentials_path = os.path.join(current_dir, "Credentials.json")
-
-        manager = cls(credentials_path)
-        all_values = manager.sheet.get_all_values()
-
-        if len(all_values) > 1:
-            headers = all_values[0]
-            try:
-                email_index = headers.index("メールアドレス")
-                existing_emails = [row[email_index] for row in all_values[1:]]
-                return email_to_check in existing_emails
-            except ValueError:
-                print("'メールアドレス'カラムが見つかりません")
-                return False
-        return False
+        mirror = cls(_default_credentials_path()).synced_mirror()
+        if not mirror.has_column("メールアドレス"):
+            print("'メールアドレス'カラムが見つかりません")
+            return False
+        return mirror.has_email(email_to_check)
 
     @classmethod
     def check_duplicate_application(cls, email_to_check, job_url_to_check):
@@ -127,30 +243,179 @@ class SpreadsheetManager:
         メールアドレスと求人URLの両方が一致するレコードがあるかチェック
         同一求人に同一人物が応募した場合は重複とみなす
         """
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        credentials_path = os.path.join(current_dir, "Credentials.json")
+        mirror = cls(_default_credentials_path()).synced_mirror()
+        for column in ("メールアドレス", "応募先求人（URL）"):
+            if not mirror.has_column(column):
+                print(f"必要なカラムが見つかりません: {column}")
+                return False
+        return mirror.has_application(email_to_check, job_url_to_check)
 
-        manager = cls(credentials_path)
-        all_values = manager.sheet.get_all_values()
 
-        if len(all_values) > 1:
-            headers = all_values[0]
-            try:
-                email_index = headers.index("メールアドレス")
-                job_url_index = headers.index("応募先求人（URL）")
+class DuplicateIndex:
+    """
+    応募者シートの (メールアドレス, 応募先求人（URL）) を実行中メモリに保持し、
+    重複判定をO(1)で行う。実行開始時にローカルミラーから1回だけ読み込み、転記した行は add() で反映する。
+    """
 
-                for row in all_values[1:]:
-                    existing_email = row[email_index] if email_index < len(row) else ""
-                    existing_job_url = row[job_url_index] if job_url_index < len(row) else ""
+    def __init__(self, pairs=None):
+        # None は読み込み失敗（都度シートを参照する従来方式にフォールバック）
+        self._pairs = set(pairs) if pairs is not None else None
+        self._added = set()
 
-                    if existing_email == email_to_check and existing_job_url == job_url_to_check:
-                        return True
-                return False
-            except ValueError as e:
-                print(f"必要なカラムが見つかりません: {e}")
+    @classmethod
+    def load(cls, credentials_path=None):
+        try:
+            manager = SpreadsheetManager(credentials_path or _default_credentials_path())
+            pairs = manager.synced_mirror().application_pairs()
+            print(f"重複チェック用インデックスを読み込みました: {len(pairs)}件")
+            return cls(pairs)
+        except Exception as e:
+            sheets_registry.handle_error(e, NEW_SPREADSHEET_ID, NEW_SHEET_NAME)
+            print(f"重複チェック用インデックスの読み込みに失敗しました（都度チェックします）: {str(e)}")
+            return cls()
+
+    def contains(self, email, job_url):
+        key = (email, job_url)
+        if key in self._added:
+            return True
+        if self._pairs is None:
+            try:
+                return SpreadsheetManager.check_duplicate_application(email, job_url)
+            except (sqlite3.OperationalError, gspread.exceptions.APIError,
+                    requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                # 「選考へ進める」を押した後なので取りこぼさない。重複と判定できなければキューに積む
+                # （キューは ID で二重に積まず、シートへは応募者IDで upsert する）
+                print(f"重複チェックができませんでした（重複なしとして転記します）: {type(e).__name__}: {str(e)}")
                 return False
-        return False
+        return key in self._pairs
+
+    async def contains_async(self, email, job_url):
+        """
+        contains のコルーチン版。インデックスを読み込めずシートを参照する場合は
+        別スレッドで実行し、リトライ待機でイベントループを止めない
+        """
+        if self._pairs is None and (email, job_url) not in self._added:
+            return await asyncio.to_thread(self.contains, email, job_url)
+        return self.contains(email, job_url)
+
+    def add(self, email, job_url):
+        self._added.add((email, job_url))
+
+    def __len__(self):
+        return len(self._pairs or ()) + len(self._added)
+
+
+# 応募日時の変換ルール（上から順に試す）: (正規表現, 前後の空白を除去してから照合するか)
+# グループは (年, 月, 日, 時, 分, 秒)。時刻がない形式は 0:00:00、秒がない形式は :00 を補う
+_DATETIME_PATTERNS = [
+    # 「2026年1月28日 23:51」
+    (re.compile(r'(\d{4})年(\d{1,2})月(\d{1,2})日\s*(\d{1,2}):(\d{2})'), False),
+    # 「2026/1/28 23:51」
+    (re.compile(r'(\d{4})/(\d{1,2})/(\d{1,2})\s*(\d{1,2}):(\d{2})'), False),
+    # 「2026-01-28 23:51:00」
+    (re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})\s*(\d{1,2}):(\d{2}):?(\d{2})?'), False),
+    # 「2026/2/16」（時刻なし）
+    (re.compile(r'(\d{4})/(\d{1,2})/(\d{1,2})$'), True),
+    # 「2026年2月16日」（時刻なし）
+    (re.compile(r'(\d{4})年(\d{1,2})月(\d{1,2})日$'), True),
+]
+# 既に 'YYYY-MM-DD H:MM:SS' 形式ならそのまま返す
+_DATETIME_NORMALIZED = re.compile(r'^\d{4}-\d{2}-\d{2} \d{1,2}:\d{2}:\d{2}$')
+
+# 生年月日の変換ルール（上から順に試す）: グループは (年, 月, 日)
+_BIRTHDAY_PATTERNS = [
+    re.compile(r'(\d{4})年(\d{1,2})月(\d{1,2})日'),      # 「1967年2月21日」
+    re.compile(r'(\d{4})/(\d{1,2})/(\d{1,2})'),         # 「1967/2/21」
+    re.compile(r"^'?(\d{4})-(\d{1,2})-(\d{1,2})$"),     # 「1967-02-21」（ゼロパディング除去）
+]
+
+
+def format_datetime(value):
+    """日時を 'YYYY-MM-DD H:MM:SS' 形式に変換"""
+    if not value or value == "情報なし":
+        return ""
+    if _DATETIME_NORMALIZED.match(value):
+        return value
+    stripped = None
+    for pattern, strip in _DATETIME_PATTERNS:
+        if strip:
+            if stripped is None:
+                stripped = value.strip()
+            match = pattern.match(stripped)
+        else:
+            match = pattern.match(value)
+        if match:
+            groups = match.groups()
+            year, month, day = groups[0], int(groups[1]), int(groups[2])
+            hour = int(groups[3]) if len(groups) > 3 else 0
+            minute = int(groups[4]) if len(groups) > 4 else 0
+            sec = int(groups[5] or 0) if len(groups) > 5 else 0
+            return f"{year}-{month:02d}-{day:02d} {hour}:{minute:02d}:{sec:02d}"
+    return value
+
+
+def format_birthday(value):
+    """生年月日を 'YYYY-M-D' 形式に変換"""
+    if not value or value == "情報なし":
+        return ""
+    for pattern in _BIRTHDAY_PATTERNS:
+        match = pattern.match(value)
+        if match:
+            year, month, day = match.groups()
+            return f"{year}-{int(month)}-{int(day)}"
+    return value
+
 
+def format_age(value):
+    """年齢から「歳」を削除し数値として返す"""
+    if not value or value == "情報なし":
+        return ""
+    age_str = value.replace("歳", "").strip()
+    try:
+        return int(age_str)
+    except ValueError:
+        return age_str
+
+
+def _quoted(value):
+    """先頭に ' を付けて文字列として書き込ませる（空欄はそのまま）"""
+    return f"'{value}" if value else ""
+
+
+DEFAULT_EXECUTION_ENV = "VPS4号_ Engage-automation"
+
+# 出力カラムの定義（新しいカラム構成に対応）: (出力カラム, 元データのキー, 変換関数)
+# 元データのキーが None の列は固定値（変換関数の戻り値）
+_FIELD_SPECS = [
+    ("クライアント", "クライアント", None),
+    ("職種", "職種", None),
+    ("応募日時", "応募日時", lambda v: _quoted(format_datetime(v))),
+    ("都道府県", "都道府県", None),
+    ("エリア", "エリア", None),
+    ("名前", "名前", None),
+    ("年齢", "年齢", format_age),
+    ("応募先求人（URL）", "求人URL", None),
+    ("施設形態", "施設形態", None),
+    ("施設形態詳細", "施設形態詳細", None),
+    ("ふりがな", "ふりがな", None),
+    ("メールアドレス", "メールアドレス", None),
+    ("電話番号", "電話番号", _quoted),
+    ("生年月日", "生年月日", format_birthday),
+    ("性別", "性別", None),
+    ("住所", "住所", None),
+    ("郵便番号", "郵便番号", None),
+    ("タイトル", "タイトル", None),
+    ("クライアント名", "クライアント", None),  # クライアントと同じ値
+    ("備考", None, ""),
+    ("pdfURL", None, ""),
+    ("アカウントID", "アカウントID", None),
+    ("応募者ID", "応募者ID", None),
+    ("割り当て", None, ""),
+    ("集計状況", None, ""),  # 空欄
+    ("媒体", None, "Engage"),  # 固定値
+    ("応募先企業名", None, ""),  # 空欄
+    ("", None, ""),  # 末尾の空欄カラム
+]
 
 
 class DataProcessor:
@@ -166,163 +431,202 @@ class DataProcessor:
 
     def _format_datetime(self, value):
         """日時を 'YYYY-MM-DD H:MM:SS' 形式に変換"""
-        if not value or value == "情報なし":
-            return ""
-        import re
-        # 既にハイフン形式の場合はそのまま返す
-        if re.match(r'^\d{4}-\d{2}-\d{2} \d{1,2}:\d{2}:\d{2}$', value):
-            return value
-        # 「2026年1月28日 23:51」のような形式を変換
-        match = re.match(r'(\d{4})年(\d{1,2})月(\d{1,2})日\s*(\d{1,2}):(\d{2})', value)
-        if match:
-            year, month, day, hour, minute = match.groups()
-            return f"{year}-{int(month):02d}-{int(day):02d} {int(hour)}:{int(minute):02d}:00"
-        # 「2026/1/28 23:51」のような形式を変換
-        match = re.match(r'(\d{4})/(\d{1,2})/(\d{1,2})\s*(\d{1,2}):(\d{2})', value)
-        if match:
-            year, month, day, hour, minute = match.groups()
-            return f"{year}-{int(month):02d}-{int(day):02d} {int(hour)}:{int(minute):02d}:00"
-        # 「2026-01-28 23:51:00」のような形式を変換
-        match = re.match(r'(\d{4})-(\d{1,2})-(\d{1,2})\s*(\d{1,2}):(\d{2}):?(\d{2})?', value)
-        if match:
-            year, month, day, hour, minute, sec = match.groups()
-            return f"{year}-{int(month):02d}-{int(day):02d} {int(hour)}:{int(minute):02d}:{int(sec or 0):02d}"
-        # 「2026/2/16」のような日付のみ（時刻なし）を変換
-        match = re.match(r'(\d{4})/(\d{1,2})/(\d{1,2})$', value.strip())
-        if match:
-            year, month, day = match.groups()
-            return f"{year}-{int(month):02d}-{int(day):02d} 0:00:00"
-        # 「2026年2月16日」のような日付のみ（時刻なし）を変換
-        match = re.match(r'(\d{4})年(\d{1,2})月(\d{1,2})日$', value.strip())
-        if match:
-            year, month, day = match.groups()
-            return f"{year}-{int(month):02d}-{int(day):02d} 0:00:00"
-        return value
+        return format_datetime(value)
 
     def _format_age(self, value):
         """年齢から「歳」を削除し数値として返す"""
-        if not value or value == "情報なし":
-            return ""
-        age_str = value.replace("歳", "").strip()
-        try:
-            return int(age_str)
-        except ValueError:
-            return age_str
+        return format_age(value)
 
     def _format_birthday(self, value):
         """生年月日を 'YYYY-M-D' 形式に変換"""
-        if not value or value == "情報なし":
-            return ""
-        import re
-        # 「1967年2月21日」のような形式を変換
-        match = re.match(r'(\d{4})年(\d{1,2})月(\d{1,2})日', value)
-        if match:
-            year, month, day = match.groups()
-            return f"{year}-{int(month)}-{int(day)}"
-        # 「1967/2/21」のような形式を変換
-        match = re.match(r'(\d{4})/(\d{1,2})/(\d{1,2})', value)
-        if match:
-            year, month, day = match.groups()
-            return f"{year}-{int(month)}-{int(day)}"
-        # 「1967-02-21」のような形式を変換（ゼロパディング除去）
-        match = re.match(r'^\'?(\d{4})-(\d{1,2})-(\d{1,2})$', value)
-        if match:
-            year, month, day = match.groups()
-            return f"{year}-{int(month)}-{int(day)}"
-        return value
+        return format_birthday(value)
 
     def process_data(self):
-        client_name = self._get_value("クライアント")
-
-        # 新しいカラム構成（27列）に対応
-        processed_data = {
-            "クライアント": client_name,
-            "職種": self._get_value("職種"),
-            "応募日時": f"'{self._format_datetime(self._get_value('応募日時'))}" if self._format_datetime(self._get_value('応募日時')) else "",
-            "都道府県": self._get_value("都道府県"),
-            "エリア": self._get_value("エリア"),
-            "名前": self._get_value("名前"),
-            "年齢": self._format_age(self._get_value("年齢")),
-            "応募先求人（URL）": self._get_value("求人URL"),
-            "施設形態": self._get_value("施設形態"),
-            "施設形態詳細": self._get_value("施設形態詳細"),
-            "ふりがな": self._get_value("ふりがな"),
-            "メールアドレス": self._get_value("メールアドレス"),
-            "電話番号": f"'{self._get_value('電話番号')}" if self._get_value('電話番号') else "",
-            "生年月日": self._format_birthday(self._get_value("生年月日")),
-            "性別": self._get_value("性別"),
-            "住所": self._get_value("住所"),
-            "郵便番号": self._get_value("郵便番号"),
-            "タイトル": self._get_value("タイトル"),
-            "クライアント名": client_name,  # クライアントと同じ値
-            "備考": "",
-            "pdfURL": "",
-            "アカウントID": self._get_value("アカウントID"),
-            "応募者ID": self._get_value("応募者ID"),
-            "割り当て": "",
-            "集計状況": "",  # 空欄
-            "媒体": "Engage",  # 固定値
-            "応募先企業名": "",  # 空欄
-            "": "",  # 末尾の空欄カラム
-            "実行環境": self.scraper_data.get("実行環境", "VPS4号_ Engage-automation"),
-        }
+        return self._process(self.scraper_data)
+
+    @staticmethod
+    def _process(scraper_data):
+        processed_data = {}
+        for column, key, normalizer in _FIELD_SPECS:
+            if key is None:
+                processed_data[column] = normalizer
+                continue
+            value = scraper_data.get(key, "")
+            if value == "情報なし":
+                value = ""
+            processed_data[column] = normalizer(value) if normalizer else value
+        processed_data["実行環境"] = scraper_data.get("実行環境", DEFAULT_EXECUTION_ENV)
         return processed_data
 
+    @classmethod
+    def process_batch(cls, scraper_data_list):
+        """複数件のスクレイピング結果を1パスで変換する"""
+        return [cls._process(scraper_data) for scraper_data in scraper_data_list]
+
+    @classmethod
+    def to_matrix(cls, data_list, layout=None, processed=False):
+        """
+        複数件のスクレイピング結果を書き込み用の2次元配列に1パスで変換する
+        layout は列ごとの出力カラム名（省略時は row_layout()。郵便番号・実行環境の列はシートのヘッダーから
+        row_layout(header_map) で求める）。processed=True なら変換済みのデータ（キューの行）をそのまま並べる
+        """
+        layout = layout or row_layout()
+        rows = data_list if processed else map(cls._process, data_list)
+        return [[data.get(column, "") for column in layout] for data in rows]
+
 
 def write_row(self, data):
     self.write_data(data)
 
 
+class SpreadsheetQueueFlusher:
+    """
+    永続キュー（applicant_queue）に積まれた行をバックグラウンドスレッドで応募者シートへ書き込む。
+    書き込みは応募者IDをキーにした upsert で行う。
+    """
+
+    BATCH_SIZE = 100
+    LINGER_SECONDS = 1.0      # 通知後、後続の行を待ってからまとめて書き込む
+    RETRY_INTERVAL = 30.0     # 書き込み失敗時の再試行間隔
+
+    def __init__(self, credentials_path=None, queue_path=None):
+        self.credentials_path = credentials_path or _default_credentials_path()
+        self.queue_path = queue_path
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="spreadsheet-flusher", daemon=True)
+            self._thread.start()
+        self.notify()
+
+    def notify(self):
+        self._wakeup.set()
+
+    def stop(self, timeout=120):
+        """スレッドを止め、残りの行を書き込む。未送信の件数を返す"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.drain()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if self._stopping.is_set():
+                break
+            time.sleep(self.LINGER_SECONDS)
+            if self.drain() > 0:
+                # 書き込めなかった行は間隔を空けて再試行
+                self._stopping.wait(self.RETRY_INTERVAL)
+                self._wakeup.set()
+
+    def drain(self):
+        """キューが空になるまでバッチ単位で書き込む。書き込めずに残った件数を返す"""
+        with self._lock:
+            queue = ApplicantQueue(self.queue_path)
+            try:
+                while True:
+                    batch = queue.pending(self.BATCH_SIZE)
+                    if not batch:
+                        return 0
+                    record_ids = [record_id for record_id, _, _ in batch]
+                    try:
+                        with metrics.span('sheets_flush'):
+                            self._write_batch(queue, batch)
+                    except Exception as e:
+                        sheets_registry.handle_error(e, NEW_SPREADSHEET_ID, NEW_SHEET_NAME)
+                        queue.mark_failed(record_ids, e)
+                        print(f"An error occurred while writing to the spreadsheet (キューに保持): {str(e)}")
+                        return queue.pending_count()
+            finally:
+                queue.close()
+
+    def _write_batch(self, queue, batch):
+        # 応募者IDをキーにupsertするため、書き込み後・送信済み記録前に落ちた行を再送しても二重にならない
+        writer = SpreadsheetManager(self.credentials_path)
+        rows = [row for _, _, row in batch]
+        result = writer.upsert_rows(rows)
+        queue.mark_sent([record_id for record_id, _, _ in batch])
+        # シートに書き込んだ行だけをバッチごとにアーカイブへ書き出す（強制終了しても食い違わない）
+        _archive_rows(rows)
+        print(f"スプレッドシートに書き込み完了: 追記{len(result['appended'])}件 / 更新{len(result['updated'])}件")
+
+
+_flusher = SpreadsheetQueueFlusher()
+
+
+def start_spreadsheet_flusher():
+    """書き込み処理を開始する（前回実行で残った行もここで書き込まれる）"""
+    _flusher.start()
+
+
+def stop_spreadsheet_flusher(timeout=120):
+    """書き込み処理を止め、残りの行を書き込む。未送信の件数を返す"""
+    flush_archive()
+    remaining = _flusher.stop(timeout)
+    if remaining:
+        print(f"未送信の行がキューに残っています（次回実行時に再送）: {remaining}件")
+    return remaining
+
+
 def write_to_spreadsheet(scraper_data):
+    """
+    処理した行をローカルの永続キューに書き込む（シートへはバックグラウンドで書き込む）
+    キューに積んだ件数を返す
+    """
+    if isinstance(scraper_data, dict):
+        scraper_data_list = [scraper_data]
+    elif isinstance(scraper_data, list):
+        scraper_data_list = scraper_data
+    else:
+        raise ValueError("scraper_data must be a dictionary or a list of dictionaries")
+
+    queue = ApplicantQueue()
+    queued = []
     try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        credentials_path = os.path.join(current_dir, "Credentials.json")
+        for data, processed_data in zip(scraper_data_list, DataProcessor.process_batch(scraper_data_list)):
+            record_id = data.get("ID") or f"{data.get('work_id')}_{data.get('応募者ID')}"
+            if queue.enqueue(record_id, processed_data.get("応募者ID", ""), processed_data):
+                queued.append(processed_data)
+            else:
+                print(f"キューに登録済みのためスキップしました: {record_id}")
+    finally:
+        queue.close()
 
-        # 新しいスプレッドシートに書き込み
-        writer = SpreadsheetManager(credentials_path)
+    _flusher.start()
+    return len(queued)
 
-        if isinstance(scraper_data, dict):
-            scraper_data_list = [scraper_data]
-        elif isinstance(scraper_data, list):
-            scraper_data_list = scraper_data
-        else:
-            raise ValueError("scraper_data must be a dictionary or a list of dictionaries")
 
-        for data in scraper_data_list:
-            processor = DataProcessor(data)
-            processed_data = processor.process_data()
-            writer.write_data(processed_data)
-
-        print("スプレッドシートに書き込み完了")
+def _archive_rows(processed_list):
+    """集計用のローカルアーカイブにも追記し、すぐにファイル化する（失敗しても転記は止めない）"""
+    try:
+        applicant_archive.append(processed_list)
+        applicant_archive.flush()
     except Exception as e:
-        print(f"An error occurred while writing to the spreadsheet: {str(e)}")
-
+        print(f"アーカイブへの追記に失敗しました: {e}")
 
 
+def flush_archive():
+    try:
+        applicant_archive.flush()
+    except Exception as e:
+        print(f"アーカイブの書き出しに失敗しました: {e}")
 
 
 def get_engage_data():
-    # Google Sheets APIの認証設定
-    scopes = [
-        'https://www.googleapis.com/auth/spreadsheets',
-        'https://www.googleapis.com/auth/drive'
-    ]
-    
-    
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    credentials_path = os.path.join(current_dir, "Credentials.json")
-    credentials = Credentials.from_service_account_file(credentials_path, scopes=scopes)
-    client = gspread.authorize(credentials)
-    
-    # スプレッドシートを開く
+    # スプレッドシートの「アイパスマスタ」シートを開く（認証・ハンドルはプロセス内で共有）
     spreadsheet_id = '1UQk_YkjIFSrg1hSRRYLsO9bHwZ0xGSrxC3fFB62pONo'
-    spreadsheet = client.open_by_key(spreadsheet_id)
-    
-    # アクセスするシートを「アイパスマスタ」に変更
-    ipass_master_sheet = spreadsheet.worksheet("アイパスマスタ")
+    ipass_master_sheet = sheets_registry.get_worksheet(spreadsheet_id, "アイパスマスタ", _default_credentials_path())
     
     # 全データを取得
-    all_values = ipass_master_sheet.get_all_values()
+    all_values = scheduler.read(ipass_master_sheet.get_all_values)
     
     if not all_values:
         return []
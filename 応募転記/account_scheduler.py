@@ -0,0 +1,91 @@
+# account_scheduler.py
+"""
+reCAPTCHA の予想時間にもとづくアカウントの処理順と見送りの判断
+
+captcha_history の記録から、各アカウントを今処理した場合の reCAPTCHA の予想時間を求め、
+1サイクルの予想 reCAPTCHA 時間が CAPTCHA_BUDGET_SEC に収まるように
+予想時間の短いアカウントから処理し、収まらないアカウントは次のサイクルに見送る。
+見送りが続いて上限を超えたアカウントと、記録のないアカウントは見送らない。
+新規応募の通知は「5分以内」を前提にしているため、見送りの上限は ACCOUNT_FRESHNESS_MINUTES を超えない
+（CAPTCHA_MAX_DEFER_HOURS を長くしても、前回のログインから鮮度の期間が経ったアカウントは必ず処理する）。
+
+  CAPTCHA_BUDGET_SEC         1サイクルあたりの reCAPTCHA 時間の予算（秒、0 で並べ替え・見送りをしない）
+  CAPTCHA_MAX_DEFER_HOURS    前回のログインからこの時間が経ったアカウントは必ず処理する（既定: 6）
+  ACCOUNT_FRESHNESS_MINUTES  各アカウントを確認する間隔の上限（分、既定: 5）。見送りの上限はこれで頭打ちになる
+"""
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+from captcha_history import captcha_history
+
+
+CAPTCHA_BUDGET_SEC = float(os.getenv("CAPTCHA_BUDGET_SEC", "0"))
+CAPTCHA_MAX_DEFER_HOURS = float(os.getenv("CAPTCHA_MAX_DEFER_HOURS", "6"))
+ACCOUNT_FRESHNESS_MINUTES = float(os.getenv("ACCOUNT_FRESHNESS_MINUTES", "5"))
+
+
+@dataclass
+class AccountPlan:
+    """1アカウントの処理予定"""
+    account: Any                       # User（client_name を持つもの）
+    expected_captcha: float            # reCAPTCHA の予想時間（秒）
+    run_seconds: Optional[float]       # reCAPTCHA を除く処理時間の平均（秒、記録がなければ None）
+    deferred: bool = False
+    required: bool = False             # 見送り不可（記録なし・見送り上限超え）
+
+
+class AccountScheduler:
+    def __init__(self, history=captcha_history, budget_sec=CAPTCHA_BUDGET_SEC, max_defer_hours=CAPTCHA_MAX_DEFER_HOURS,
+                 freshness_minutes=ACCOUNT_FRESHNESS_MINUTES):
+        self.history = history
+        self.budget_sec = budget_sec
+        # 見送りで鮮度の期間を超えて確認が空かないようにする
+        self.max_defer_seconds = min(max_defer_hours * 3600, freshness_minutes * 60)
+
+    def plan(self, accounts: List[Any], now: Optional[float] = None) -> List[AccountPlan]:
+        """処理する順に並べた予定を返す（見送るアカウントは deferred=True で末尾に置く）"""
+        now = time.time() if now is None else now
+        plans = []
+        for account in accounts:
+            last_login = self.history.last_login(account.client_name)
+            plans.append(AccountPlan(
+                account=account,
+                expected_captcha=self.history.expected_captcha_seconds(account.client_name, now),
+                run_seconds=self.history.run_seconds(account.client_name),
+                required=last_login is None or now - last_login >= self.max_defer_seconds,
+            ))
+        if self.budget_sec <= 0:
+            return plans
+
+        # 見送れないアカウントを先に予算に入れ、残りを予想時間の短い順に入れていく
+        spent = sum(plan.expected_captcha for plan in plans if plan.required)
+        for plan in sorted((plan for plan in plans if not plan.required), key=lambda plan: plan.expected_captcha):
+            if spent + plan.expected_captcha > self.budget_sec:
+                plan.deferred = True
+            else:
+                spent += plan.expected_captcha
+        return sorted(plans, key=lambda plan: (plan.deferred, plan.expected_captcha))
+
+    def expected_cycle_seconds(self, plans: List[AccountPlan], concurrency: int = 1):
+        """(予想サイクル時間, reCAPTCHA の予想時間の合計) を返す。処理時間の記録がないアカウントは記録のある平均で補う"""
+        running = [plan for plan in plans if not plan.deferred]
+        known = [plan.run_seconds for plan in running if plan.run_seconds is not None]
+        fallback = sum(known) / len(known) if known else 0.0
+        captcha = sum(plan.expected_captcha for plan in running)
+        run = sum(plan.run_seconds if plan.run_seconds is not None else fallback for plan in running)
+        return (run + captcha) / max(1, concurrency), captcha
+
+    def format_plan(self, plans: List[AccountPlan], concurrency: int = 1):
+        cycle, captcha = self.expected_cycle_seconds(plans, concurrency)
+        deferred = sum(1 for plan in plans if plan.deferred)
+        budget = f"予算 {self.budget_sec:.0f}秒" if self.budget_sec > 0 else "予算なし"
+        return (
+            f"予想サイクル時間: {cycle:.0f}秒（reCAPTCHA合計 {captcha:.0f}秒 / {budget}）, "
+            f"処理: {len(plans) - deferred}件, 見送り: {deferred}件"
+        )
+
+
+# プロセス全体で共有するスケジューラ
+account_scheduler = AccountScheduler()
@@ -0,0 +1,166 @@
+# applicant_archive.py
+"""
+転記した応募者行のローカル列指向アーカイブ（Parquet）
+
+集計（クライアント別件数・都道府県別の内訳・重複率など）を Sheets API を使わずに行うため、
+応募者シートに書き込んだ行を month=YYYY-MM/client=クライアント のパーティションに追記する。
+SpreadsheetManager はキューのバッチをシートに書き込むたびに append → flush でファイル化する
+（実行が強制終了されても、シートに書き込んだ行とアーカイブが食い違わない）。
+append だけを呼んだ場合は ARCHIVE_FLUSH_ROWS 件ごとにまとめてファイル化する。
+pyarrow が入っていない環境ではアーカイブをスキップする（転記処理には影響しない）。
+"""
+import os
+import threading
+import uuid
+from datetime import datetime
+from urllib.parse import quote
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - アーカイブは任意機能
+    pa = ds = pq = None
+
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ARCHIVE_DIR = os.getenv("APPLICANT_ARCHIVE_DIR", os.path.join(CURRENT_DIR, "applicant_archive"))
+ARCHIVE_FLUSH_ROWS = int(os.getenv("ARCHIVE_FLUSH_ROWS", "500"))
+
+# アーカイブするカラム（processed_data のキー）。値はすべて文字列で保存する
+ARCHIVE_COLUMNS = [
+    "クライアント", "職種", "応募日時", "都道府県", "エリア", "名前", "年齢",
+    "応募先求人（URL）", "施設形態", "施設形態詳細", "ふりがな", "メールアドレス", "電話番号",
+    "生年月日", "性別", "住所", "郵便番号", "タイトル", "アカウントID", "応募者ID", "媒体", "実行環境",
+]
+ARCHIVED_AT_COLUMN = "archived_at"
+PARTITION_COLUMNS = ["month", "client"]
+
+
+def available():
+    return pa is not None
+
+
+def _clean(value):
+    """書き込み用に付けた先頭の ' を外して文字列にする"""
+    if value is None:
+        return ""
+    value = str(value)
+    return value[1:] if value.startswith("'") else value
+
+
+def _month_of(record, default):
+    """応募日時（YYYY-MM-DD ...）から年月を取り出す。取れなければ default"""
+    applied_at = _clean(record.get("応募日時", ""))
+    if len(applied_at) >= 7 and applied_at[4] == "-" and applied_at[:4].isdigit():
+        return applied_at[:7]
+    return default
+
+
+def schema():
+    fields = [pa.field(column, pa.string()) for column in ARCHIVE_COLUMNS]
+    fields.append(pa.field(ARCHIVED_AT_COLUMN, pa.string()))
+    return pa.schema(fields)
+
+
+class ApplicantArchive:
+    def __init__(self, archive_dir=None, flush_rows=ARCHIVE_FLUSH_ROWS):
+        self.archive_dir = archive_dir or DEFAULT_ARCHIVE_DIR
+        self.flush_rows = flush_rows
+        self._buffer = []
+        self._lock = threading.Lock()
+        self.stats = {'rows': 0, 'files': 0}
+
+    def append(self, processed_list):
+        """処理済みの行（dict）をアーカイブ待ちに積む。たまったらファイル化する"""
+        if not available():
+            return
+        archived_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            for processed in processed_list:
+                self._buffer.append((processed, archived_at))
+            if len(self._buffer) < self.flush_rows:
+                return
+        self.flush()
+
+    def flush(self):
+        """アーカイブ待ちの行をパーティションごとに1ファイルずつ書き出す。書き出した行数を返す"""
+        if not available():
+            return 0
+        with self._lock:
+            buffered, self._buffer = self._buffer, []
+            if not buffered:
+                return 0
+
+            partitions = {}
+            for processed, archived_at in buffered:
+                month = _month_of(processed, archived_at[:7])
+                client = _clean(processed.get("クライアント", "")) or "不明"
+                partitions.setdefault((month, client), []).append((processed, archived_at))
+
+            try:
+                for (month, client), rows in partitions.items():
+                    self._write_partition(month, client, rows)
+            except Exception:
+                # 書き出せなかった行は次回の flush で再度書き出す
+                self._buffer = buffered + self._buffer
+                raise
+            self.stats['rows'] += len(buffered)
+            return len(buffered)
+
+    def _write_partition(self, month, client, rows):
+        columns = {column: [_clean(processed.get(column, "")) for processed, _ in rows] for column in ARCHIVE_COLUMNS}
+        columns[ARCHIVED_AT_COLUMN] = [archived_at for _, archived_at in rows]
+        table = pa.Table.from_pydict(columns, schema=schema())
+
+        directory = os.path.join(self.archive_dir, f"month={month}", f"client={quote(client, safe='')}")
+        os.makedirs(directory, exist_ok=True)
+        file_name = f"part-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet"
+        temp_path = os.path.join(directory, f".{file_name}.tmp")
+        # 書き込み途中のファイルをスキャン対象にしないよう、書き終えてからリネームする
+        pq.write_table(table, temp_path, compression="zstd")
+        os.replace(temp_path, os.path.join(directory, file_name))
+        self.stats['files'] += 1
+
+    def compact(self, month=None):
+        """パーティション内の小さなファイルを1ファイルにまとめる。まとめたパーティション数を返す"""
+        if not available() or not os.path.isdir(self.archive_dir):
+            return 0
+        compacted = 0
+        for month_dir in sorted(os.listdir(self.archive_dir)):
+            if not month_dir.startswith("month=") or (month and month_dir != f"month={month}"):
+                continue
+            month_path = os.path.join(self.archive_dir, month_dir)
+            for client_dir in sorted(os.listdir(month_path)):
+                client_path = os.path.join(month_path, client_dir)
+                parts = sorted(name for name in os.listdir(client_path) if name.endswith(".parquet"))
+                if len(parts) < 2:
+                    continue
+                table = pa.concat_tables([pq.read_table(os.path.join(client_path, name)) for name in parts])
+                file_name = f"part-compacted-{uuid.uuid4().hex[:8]}.parquet"
+                temp_path = os.path.join(client_path, f".{file_name}.tmp")
+                pq.write_table(table, temp_path, compression="zstd")
+                os.replace(temp_path, os.path.join(client_path, file_name))
+                for name in parts:
+                    os.remove(os.path.join(client_path, name))
+                compacted += 1
+        return compacted
+
+
+def open_dataset(archive_dir=None):
+    """アーカイブ全体を pyarrow.dataset として開く（month/client はパーティション列）"""
+    if not available():
+        raise RuntimeError("pyarrow がインストールされていません（pip install pyarrow）")
+    partitioning = ds.partitioning(
+        pa.schema([pa.field("month", pa.string()), pa.field("client", pa.string())]),
+        flavor="hive",
+    )
+    return ds.dataset(
+        archive_dir or DEFAULT_ARCHIVE_DIR, format="parquet", partitioning=partitioning,
+        schema=schema().append(pa.field("month", pa.string())).append(pa.field("client", pa.string())),
+        exclude_invalid_files=False, ignore_prefixes=[".", "_"],
+    )
+
+
+# プロセス全体で共有するアーカイブ
+archive = ApplicantArchive()
@@ -0,0 +1,342 @@
+# applicant_mirror.py
+"""
+応募者シートのローカルSQLiteミラー
+
+重複チェック・ID照会に必要なカラムだけを保持し、前回同期した行より後ろの行だけを
+取得して差分同期する。WALモード + BEGIN IMMEDIATE で複数プロセスから安全に共有できる。
+シートからの取得は書き込みロックの外で行い、ロックは取得した差分を反映する間だけ取る。
+"""
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+
+import gspread
+
+from sheets_scheduler import scheduler
+
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MIRROR_PATH = os.path.join(CURRENT_DIR, "applicant_mirror.sqlite3")
+# 同期中に他のプロセスの同期と重なったときに、ロックを取らずに取り直す回数
+SYNC_ROUNDS = 3
+
+# ミラー対象のカラム（シートのヘッダー名 → テーブルの列名）
+MIRROR_COLUMNS = {
+    "ID": "record_id",
+    "メールアドレス": "email",
+    "応募先求人（URL）": "job_url",
+    "応募者ID": "applicant_id",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_state (
+    sheet_key TEXT PRIMARY KEY,
+    last_row INTEGER NOT NULL,
+    header TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS applicants (
+    sheet_key TEXT NOT NULL,
+    row_number INTEGER NOT NULL,
+    first_value TEXT,
+    record_id TEXT,
+    email TEXT,
+    job_url TEXT,
+    applicant_id TEXT,
+    PRIMARY KEY (sheet_key, row_number)
+);
+CREATE INDEX IF NOT EXISTS idx_applicants_record_id ON applicants (sheet_key, record_id);
+CREATE INDEX IF NOT EXISTS idx_applicants_email_job_url ON applicants (sheet_key, email, job_url);
+CREATE INDEX IF NOT EXISTS idx_applicants_job_url ON applicants (sheet_key, job_url);
+CREATE INDEX IF NOT EXISTS idx_applicants_applicant_id ON applicants (sheet_key, applicant_id);
+"""
+
+
+def _column_letter(col):
+    return gspread.utils.rowcol_to_a1(1, col)[:-1]
+
+
+class ApplicantMirror:
+    def __init__(self, spreadsheet_key, sheet_name, db_path=None):
+        self.sheet_key = f"{spreadsheet_key}/{sheet_name}"
+        self.db_path = db_path or DEFAULT_MIRROR_PATH
+        self._conn = None
+        self._depth = 0
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @contextmanager
+    def _transaction(self):
+        """書き込みトランザクション（BEGIN IMMEDIATEで他プロセスの同期と直列化する）"""
+        conn = self._connect()
+        if self._depth == 0:
+            conn.execute("BEGIN IMMEDIATE")
+        self._depth += 1
+        try:
+            yield conn
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                conn.execute("ROLLBACK")
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            conn.execute("COMMIT")
+
+    @contextmanager
+    def locked(self):
+        """
+        ミラーの書き込みロックを保持したまま処理を行う。
+        「同期→判定→シート書き込み→ミラー反映」をこの中で行えば、同じミラーを使う他プロセスと直列化される。
+        """
+        with self._transaction():
+            yield self
+
+    def _load_state(self, conn):
+        state = conn.execute(
+            "SELECT last_row, header FROM sync_state WHERE sheet_key = ?", (self.sheet_key,)
+        ).fetchone()
+        if state is None:
+            return 1, None
+        return state[0], json.loads(state[1])
+
+    def _reset(self, conn, header):
+        conn.execute("DELETE FROM applicants WHERE sheet_key = ?", (self.sheet_key,))
+        conn.execute(
+            "INSERT OR REPLACE INTO sync_state (sheet_key, last_row, header) VALUES (?, 1, ?)",
+            (self.sheet_key, json.dumps(header, ensure_ascii=False)),
+        )
+
+    @staticmethod
+    def _mirrored_columns(header):
+        """(ヘッダー名, 列番号) のリスト。先頭列は get_existing_ids 用に常に含める"""
+        columns = [(None, 1)]
+        for name in MIRROR_COLUMNS:
+            if name in header:
+                columns.append((name, header.index(name) + 1))
+        return columns
+
+    def _mirrored_keys(self, conn, row_number):
+        """ミラーに保持している row_number 行目のキー列の値"""
+        row = conn.execute(
+            "SELECT record_id, email, job_url, applicant_id FROM applicants WHERE sheet_key = ? AND row_number = ?",
+            (self.sheet_key, row_number),
+        ).fetchone()
+        return tuple(value or "" for value in row) if row else None
+
+    def sync(self, sheet):
+        """
+        前回同期した行より後ろの行だけを1回の batch_get で取得してミラーに反映する。追加行数を返す。
+        同期済みの最終行も取り直してミラーと照合し、一致しなければ（シート上で行が削除・挿入・並べ替えされた）
+        全件を取り直す。
+        シートからの取得（リトライ待機を含む）は書き込みロックの外で行い、反映するときだけロックを取る。
+        取得している間に他のプロセスが同期した場合は取り直し、SYNC_ROUNDS 回続いたらロックを取ったまま同期する
+        """
+        for _ in range(SYNC_ROUNDS - 1):
+            row_count = self._sync_round(sheet)
+            if row_count is not None:
+                return row_count
+        with self._transaction():
+            # ロック中は他のプロセスが同期しないので、全件の取り直し（リセット）以外で繰り返さない
+            while True:
+                row_count = self._sync_round(sheet)
+                if row_count is not None:
+                    return row_count
+
+    def _sync_round(self, sheet):
+        """1回分の取得と反映。追加行数を返す（取り直しが必要なら None）"""
+        state = self._load_state(self._connect())
+        last_row, header = state
+        if header is None:
+            header = scheduler.read(sheet.row_values, 1)
+            last_row = 1
+
+        columns = self._mirrored_columns(header)
+        # 照合用に同期済みの最終行から取得する（未同期ならデータ行の先頭から）
+        check_row = last_row if last_row > 1 else None
+        start_row = last_row if check_row else 2
+        ranges = ["1:1"] + [f"{_column_letter(col)}{start_row}:{_column_letter(col)}" for _, col in columns]
+        try:
+            value_ranges = scheduler.read(sheet.batch_get, ranges, major_dimension='COLUMNS',
+                                          coalesce_key=('batch_get', self.sheet_key, tuple(ranges)))
+        except gspread.exceptions.APIError as e:
+            # 最終行より後ろの範囲を指定すると grid limits エラーになる
+            if 'exceeds grid limits' not in str(e):
+                raise
+            value_ranges = None
+
+        with self._transaction() as conn:
+            if self._load_state(conn) != state:
+                # 取得している間に他のプロセスが同期した
+                return None
+            if state[1] is None:
+                self._reset(conn, header)
+            return self._apply(conn, header, columns, check_row, start_row, value_ranges)
+
+    def _apply(self, conn, header, columns, check_row, start_row, value_ranges):
+        """取得した値をミラーに反映する（書き込みトランザクション内で呼ぶ）。全件の取り直しが必要なら None"""
+        if value_ranges is None:
+            if check_row is None:
+                return 0
+            # 同期済みの最終行までシートにない → 行が削除されている
+            print("応募者シートの行が削除されています。ミラーを全件同期し直します")
+            self._reset(conn, header)
+            return None
+
+        current_header = [col[0] if col else "" for col in value_ranges[0]]
+        if current_header != header:
+            # ヘッダー（列構成）が変わった場合は全件を取り直す
+            self._reset(conn, current_header)
+            return None
+
+        column_values = [vr[0] if vr else [] for vr in value_ranges[1:]]
+        if check_row:
+            sheet_keys = {"record_id": "", "email": "", "job_url": "", "applicant_id": ""}
+            for (name, _), values in zip(columns, column_values):
+                if name is not None:
+                    sheet_keys[MIRROR_COLUMNS[name]] = values[0] if values else ""
+            if self._mirrored_keys(conn, check_row) != tuple(sheet_keys.values()):
+                print(f"応募者シートの{check_row}行目がミラーと一致しません（行の削除・挿入・並べ替え）。ミラーを全件同期し直します")
+                self._reset(conn, header)
+                return None
+            column_values = [values[1:] for values in column_values]
+            start_row = check_row + 1
+
+        row_count = max((len(values) for values in column_values), default=0)
+        if row_count == 0:
+            return 0
+
+        records = []
+        for offset in range(row_count):
+            record = {"first_value": None, "record_id": None, "email": None, "job_url": None, "applicant_id": None}
+            for (name, _), values in zip(columns, column_values):
+                value = values[offset] if offset < len(values) else ""
+                record["first_value" if name is None else MIRROR_COLUMNS[name]] = value
+            records.append((
+                self.sheet_key, start_row + offset, record["first_value"], record["record_id"],
+                record["email"], record["job_url"], record["applicant_id"],
+            ))
+        conn.executemany(
+            "INSERT OR REPLACE INTO applicants "
+            "(sheet_key, row_number, first_value, record_id, email, job_url, applicant_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            records,
+        )
+        conn.execute(
+            "UPDATE sync_state SET last_row = ? WHERE sheet_key = ?",
+            (start_row + row_count - 1, self.sheet_key),
+        )
+        return row_count
+
+    def resync(self, sheet):
+        """ミラーを破棄して全件を取り直す。取得した行数を返す"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM applicants WHERE sheet_key = ?", (self.sheet_key,))
+            conn.execute("DELETE FROM sync_state WHERE sheet_key = ?", (self.sheet_key,))
+        return self.sync(sheet)
+
+    def mismatched_rows(self, sheet, column, expected):
+        """
+        expected（{行番号: 値}）の各行について、シートの column 列の値を1回の batch_get で読み、
+        一致しない行番号のリストを返す（ミラーの行番号に書き込む前の確認用）
+        """
+        if not expected:
+            return []
+        _, header = self._load_state(self._connect())
+        if not header or column not in header:
+            return sorted(expected)
+        letter = _column_letter(header.index(column) + 1)
+        row_numbers = sorted(expected)
+        try:
+            value_ranges = scheduler.read(sheet.batch_get, [f"{letter}{row_number}" for row_number in row_numbers])
+        except gspread.exceptions.APIError as e:
+            # シートの最終行より後ろ → 行が削除されている
+            if 'exceeds grid limits' not in str(e):
+                raise
+            return row_numbers
+        mismatched = []
+        for row_number, value_range in zip(row_numbers, value_ranges):
+            value = value_range[0][0] if value_range and value_range[0] else ""
+            if str(value) != str(expected[row_number]):
+                mismatched.append(row_number)
+        return mismatched
+
+    def record_rows(self, row_numbers, rows, data_list):
+        """自プロセスで追記した行をミラーに反映する（次回の差分同期を待たずに照会できるようにする）"""
+        if not row_numbers:
+            return
+        with self._transaction() as conn:
+            last_row, _ = self._load_state(conn)
+            conn.executemany(
+                "INSERT OR REPLACE INTO applicants "
+                "(sheet_key, row_number, first_value, record_id, email, job_url, applicant_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        self.sheet_key, row_number, str(row[0]) if row else "",
+                        data.get("ID", ""), data.get("メールアドレス", ""),
+                        data.get("応募先求人（URL）", ""), data.get("応募者ID", ""),
+                    )
+                    for row_number, row, data in zip(row_numbers, rows, data_list)
+                ],
+            )
+            # 同期済みの最終行の直後に追記された場合のみ同期位置を進める（間に他の行があれば差分同期で拾う）
+            if row_numbers[0] == last_row + 1:
+                conn.execute(
+                    "UPDATE sync_state SET last_row = ? WHERE sheet_key = ?",
+                    (row_numbers[-1], self.sheet_key),
+                )
+
+    def find_row(self, column, value):
+        """ヘッダー名 column の値が value の行番号を返す（複数あれば最後の行）。なければ None"""
+        row = self._connect().execute(
+            f"SELECT MAX(row_number) FROM applicants WHERE sheet_key = ? AND {MIRROR_COLUMNS[column]} = ?",
+            (self.sheet_key, value),
+        ).fetchone()
+        return row[0] if row else None
+
+    def has_column(self, name):
+        _, header = self._load_state(self._connect())
+        return bool(header) and name in header
+
+    def _exists(self, where, params):
+        row = self._connect().execute(
+            f"SELECT 1 FROM applicants WHERE sheet_key = ? AND {where} LIMIT 1",
+            (self.sheet_key, *params),
+        ).fetchone()
+        return row is not None
+
+    def has_record_id(self, record_id):
+        return self._exists("record_id = ?", (record_id,))
+
+    def has_email(self, email):
+        return self._exists("email = ?", (email,))
+
+    def has_application(self, email, job_url):
+        return self._exists("email = ? AND job_url = ?", (email, job_url))
+
+    def first_values(self):
+        rows = self._connect().execute(
+            "SELECT first_value FROM applicants WHERE sheet_key = ? ORDER BY row_number",
+            (self.sheet_key,),
+        )
+        return [row[0] for row in rows]
+
+    def application_pairs(self):
+        rows = self._connect().execute(
+            "SELECT email, job_url FROM applicants WHERE sheet_key = ?",
+            (self.sheet_key,),
+        )
+        return {(email or "", job_url or "") for email, job_url in rows}
@@ -0,0 +1,88 @@
+# applicant_queue.py
+"""
+応募者シートへの書き込み待ち行を保持するローカルの永続キュー（SQLite）
+
+スクレイパーは処理した行をまずこのキューに書き込み、バックグラウンドの書き込み処理が
+まとめて応募者シートへ反映する。キーは ID（work_id_apply_id）で、同じ応募者を二重に積まない。
+"""
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_QUEUE_PATH = os.path.join(CURRENT_DIR, "applicant_queue.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS applicant_queue (
+    record_id TEXT PRIMARY KEY,
+    applicant_id TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    enqueued_at TEXT NOT NULL,
+    sent_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_applicant_queue_status ON applicant_queue (status, enqueued_at);
+"""
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+class ApplicantQueue:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or DEFAULT_QUEUE_PATH
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def enqueue(self, record_id, applicant_id, row):
+        """1行をキューに積む。同じ record_id が既にあれば積まずに False を返す"""
+        cursor = self._connect().execute(
+            "INSERT OR IGNORE INTO applicant_queue (record_id, applicant_id, payload, enqueued_at) "
+            "VALUES (?, ?, ?, ?)",
+            (record_id, applicant_id, json.dumps(row, ensure_ascii=False), _now()),
+        )
+        return cursor.rowcount == 1
+
+    def pending(self, limit=100):
+        """未送信の行を古い順に返す [(record_id, applicant_id, row), ...]"""
+        rows = self._connect().execute(
+            "SELECT record_id, applicant_id, payload FROM applicant_queue "
+            "WHERE status = 'pending' ORDER BY enqueued_at, rowid LIMIT ?",
+            (limit,),
+        ).fetchall()
+        return [(record_id, applicant_id, json.loads(payload)) for record_id, applicant_id, payload in rows]
+
+    def pending_count(self):
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM applicant_queue WHERE status = 'pending'"
+        ).fetchone()[0]
+
+    def mark_sent(self, record_ids):
+        self._connect().executemany(
+            "UPDATE applicant_queue SET status = 'sent', sent_at = ?, last_error = NULL WHERE record_id = ?",
+            [(_now(), record_id) for record_id in record_ids],
+        )
+
+    def mark_failed(self, record_ids, error):
+        self._connect().executemany(
+            "UPDATE applicant_queue SET attempts = attempts + 1, last_error = ? WHERE record_id = ?",
+            [(str(error)[:500], record_id) for record_id in record_ids],
+        )
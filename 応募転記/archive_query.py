@@ -0,0 +1,110 @@
+# archive_query.py
+"""
+応募者アーカイブ（applicant_archive.py）の集計コマンド。Sheets API は使わない。
+
+  python archive_query.py count --by クライアント
+  python archive_query.py count --by 都道府県 --from 2026-01 --to 2026-03
+  python archive_query.py duplicates --by month --client "〇〇病院"
+  python archive_query.py compact --month 2026-01
+
+必要なカラムだけをパーティション単位の絞り込み付きでバッチごとに読み、集計結果だけを保持する。
+"""
+import argparse
+import hashlib
+import sys
+from collections import Counter
+
+import pyarrow.dataset as ds
+
+from applicant_archive import archive, open_dataset
+
+
+BATCH_SIZE = 64 * 1024
+
+
+def _filter(args):
+    expression = None
+    conditions = []
+    if args.month_from:
+        conditions.append(ds.field("month") >= args.month_from)
+    if args.month_to:
+        conditions.append(ds.field("month") <= args.month_to)
+    if args.client:
+        conditions.append(ds.field("client") == args.client)
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _scan(args, columns):
+    """条件に合う行を必要なカラムだけバッチごとに返す"""
+    dataset = open_dataset(args.archive_dir)
+    for batch in dataset.to_batches(columns=columns, filter=_filter(args), batch_size=BATCH_SIZE):
+        yield batch.to_pydict()
+
+
+def count(args):
+    counts = Counter()
+    for batch in _scan(args, [args.by]):
+        counts.update(batch[args.by])
+    total = sum(counts.values())
+    for key, value in counts.most_common(args.limit):
+        print(f"{key or '(空欄)'}\t{value}\t{value / total:.1%}")
+    print(f"合計\t{total}")
+
+
+def duplicates(args):
+    """メールアドレス + 応募先求人（URL）が既出の行を重複として数える"""
+    seen = set()
+    totals = Counter()
+    dups = Counter()
+    for batch in _scan(args, [args.by, "メールアドレス", "応募先求人（URL）"]):
+        for key, email, job_url in zip(batch[args.by], batch["メールアドレス"], batch["応募先求人（URL）"]):
+            totals[key] += 1
+            # キーはハッシュで保持してメモリを抑える
+            digest = hashlib.blake2b(f"{email}\t{job_url}".encode(), digest_size=12).digest()
+            if digest in seen:
+                dups[key] += 1
+            else:
+                seen.add(digest)
+    for key, total in totals.most_common(args.limit):
+        print(f"{key or '(空欄)'}\t{dups[key]}/{total}\t{dups[key] / total:.1%}")
+    total = sum(totals.values())
+    if total:
+        print(f"合計\t{sum(dups.values())}/{total}\t{sum(dups.values()) / total:.1%}")
+
+
+def compact(args):
+    print(f"まとめたパーティション: {archive.compact(args.month)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="応募者アーカイブの集計")
+    parser.add_argument("--archive-dir", default=None, help="アーカイブのディレクトリ（省略時は既定の場所）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for name, handler, help_text in (
+        ("count", count, "カラムの値ごとの件数"),
+        ("duplicates", duplicates, "メールアドレス + 求人URL の重複率"),
+    ):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--by", default="クライアント", help="集計キーのカラム（month / client も可）")
+        sub.add_argument("--from", dest="month_from", help="開始月 YYYY-MM")
+        sub.add_argument("--to", dest="month_to", help="終了月 YYYY-MM")
+        sub.add_argument("--client", help="クライアントで絞り込む")
+        sub.add_argument("--limit", type=int, default=None, help="上位N件のみ表示")
+        sub.set_defaults(handler=handler)
+
+    sub = subparsers.add_parser("compact", help="パーティション内の小さなファイルをまとめる")
+    sub.add_argument("--month", help="対象月 YYYY-MM（省略時は全期間）")
+    sub.set_defaults(handler=compact)
+
+    args = parser.parse_args(argv)
+    if args.command == "compact" and args.archive_dir:
+        archive.archive_dir = args.archive_dir
+    args.handler(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,14 @@
+# conftest.py
+"""
+ベンチマーク（pytest-benchmark）の共通設定
+
+  pip install pytest pytest-benchmark
+  python -m pytest 応募転記/bench --benchmark-group-by=group
+"""
+import os
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PACKAGE_DIR = os.path.dirname(BENCH_DIR)
+if PACKAGE_DIR not in sys.path:
+    sys.path.insert(0, PACKAGE_DIR)
@@ -0,0 +1,145 @@
+# test_captcha_solver.py
+"""
+TwoCaptchaSolver をローカルの fake 2Captcha（fake_2captcha_server.py）に向けた動作確認とベンチマーク
+
+解決成功・ポーリング回数と所要時間・ポーリング中のキャンセル・ERROR_* 応答・タイムアウトを確認する。
+外部通信・課金なしで実行できる。
+"""
+import asyncio
+import importlib
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from aiohttp import web
+
+import captcha_solver
+from fake_2captcha_server import FakeTwoCaptcha
+
+
+SITEKEY = "6LcFakeSiteKeyForBench0000000000000000"
+PAGE_URL = "https://en-gage.net/company_login/login/"
+# テスト用に短くしたポーリング間隔（秒）
+FIRST_POLL_SECONDS = 0.05
+POLL_INTERVAL_SECONDS = 0.02
+
+
+@pytest.fixture
+def solver_module(monkeypatch):
+    """TWOCAPTCHA_BASE_URL を fake に向けて読み込み直した captcha_solver（終了後に元に戻す）"""
+    def load(base_url):
+        monkeypatch.setenv("TWOCAPTCHA_BASE_URL", base_url)
+        return importlib.reload(captcha_solver)
+
+    yield load
+    monkeypatch.undo()
+    importlib.reload(captcha_solver)
+
+
+async def _serve(fake):
+    runner = web.AppRunner(fake.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def _run(fake, solver_module, scenario, **solver_options):
+    """fake を起動し、TWOCAPTCHA_BASE_URL を向けた solver で scenario(solver) を実行する"""
+    async def main():
+        runner, base_url = await _serve(fake)
+        module = solver_module(base_url)
+        options = {
+            'first_poll_seconds': FIRST_POLL_SECONDS,
+            'poll_interval_seconds': POLL_INTERVAL_SECONDS,
+            'log': lambda message: None,
+        }
+        options.update(solver_options)
+        solver = module.TwoCaptchaSolver("fake-api-key", **options)
+        assert solver.base_url == base_url
+        try:
+            return await scenario(solver)
+        finally:
+            await solver.close()
+            await runner.cleanup()
+
+    return asyncio.run(main())
+
+
+def test_solve_success(solver_module):
+    fake = FakeTwoCaptcha(solve_seconds=0.15, jitter_seconds=0.0)
+    result = _run(fake, solver_module, lambda solver: solver.solve(SITEKEY, PAGE_URL))
+
+    assert result.token == "fake-token-1000"
+    assert result.error == ''
+    # 解決前は CAPCHA_NOT_READY が返るので複数回問い合わせる
+    assert result.polls == fake.stats['polls'] >= 2
+    assert fake.stats['submitted'] == 1
+    assert 0.15 <= result.elapsed < 1.0
+
+
+def test_cancel_mid_poll(solver_module):
+    fake = FakeTwoCaptcha(solve_seconds=30.0, jitter_seconds=0.0)
+
+    async def scenario(solver):
+        task = asyncio.create_task(solver.solve(SITEKEY, PAGE_URL))
+        while fake.stats['polls'] < 2:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        polls = fake.stats['polls']
+        await asyncio.sleep(POLL_INTERVAL_SECONDS * 5)
+        # キャンセル後は問い合わせない
+        assert fake.stats['polls'] == polls
+
+    _run(fake, solver_module, scenario)
+
+
+def test_unsolvable(solver_module):
+    fake = FakeTwoCaptcha(solve_seconds=0.05, jitter_seconds=0.0, error_rate=1.0)
+    result = _run(fake, solver_module, lambda solver: solver.solve(SITEKEY, PAGE_URL))
+
+    assert result.token is None
+    assert result.error == "エラー: ERROR_CAPTCHA_UNSOLVABLE"
+    assert result.polls >= 1
+
+
+def test_submit_error(solver_module):
+    fake = FakeTwoCaptcha()
+    result = _run(fake, solver_module, lambda solver: solver.solve("", PAGE_URL))
+
+    assert result.token is None
+    assert result.error == "リクエスト失敗: ERROR_GOOGLEKEY"
+    assert result.polls == 0
+
+
+def test_timeout(solver_module):
+    fake = FakeTwoCaptcha(solve_seconds=30.0, jitter_seconds=0.0)
+    result = _run(fake, solver_module, lambda solver: solver.solve(SITEKEY, PAGE_URL), timeout_seconds=0.2)
+
+    assert result.token is None
+    assert result.error == "タイムアウト（0秒）"
+    # 次の問い合わせがタイムアウトを超える時点で打ち切る（解決予定の30秒までは待たない）
+    assert 0 < result.elapsed < 1.0
+    assert result.polls == fake.stats['polls']
+
+
+def test_concurrent_solves(benchmark, solver_module):
+    """解決時間0秒の fake に20件同時に解決リクエストを送る（セッションの使い回しと問い合わせのオーバーヘッド）"""
+    requests = 20
+
+    def run():
+        fake = FakeTwoCaptcha(solve_seconds=0.0, jitter_seconds=0.0)
+
+        async def scenario(solver):
+            return await asyncio.gather(*(solver.solve(SITEKEY, PAGE_URL) for _ in range(requests)))
+
+        return _run(fake, solver_module, scenario, first_poll_seconds=0.0)
+
+    benchmark.group = "TwoCaptchaSolver.solve（fake 2Captcha）"
+    benchmark.extra_info["requests"] = requests
+    results = benchmark.pedantic(run, rounds=5, iterations=1)
+    assert all(result.token for result in results)
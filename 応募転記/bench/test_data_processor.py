@@ -0,0 +1,126 @@
+# test_data_processor.py
+"""
+スクレイピング結果の変換コスト
+
+- 応募日時・生年月日・年齢の変換と、名前からふりがなを除く clean_name（形式の混ざった入力）
+- process_batch（1万件）
+- 書き込み用の2次元配列（to_matrix）。郵便番号・実行環境の列を含むシートのヘッダー（row_layout）で並べる
+"""
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from SpreadsheetManager import DataProcessor, row_layout
+
+
+BATCH_SIZES = [10, 100, 1_000]
+# process_batch の計測件数
+PROCESS_BATCH_RECORDS = 10_000
+
+# 画面・シートに現れる形式を混ぜた入力（1回の計測で全件を変換する）
+DATETIMES = [
+    "2026年1月28日 23:51", "2026/1/28 23:51", "2026-01-28 23:51:00", "2026-01-28 23:51",
+    " 2026/2/16 ", "2026年2月16日", "2026-02-16 9:05:00", "情報なし", "", "不明",
+] * 10
+BIRTHDAYS = ["1967年2月21日", "1967/2/21", "1967-02-21", "'1967-02-21", "情報なし", "", "不明"] * 10
+AGES = ["30歳", "45 歳", "30", "情報なし", "", "不明"] * 10
+NAMES = [
+    {"名前": "山田 太郎", "ふりがな": "やまだ たろう"},
+    {"名前": "山田やまだ 太郎たろう", "ふりがな": "やまだ たろう"},
+    {"名前": "佐藤さとう 花子", "ふりがな": "さとう はなこ"},
+    {"名前": "John Smith", "ふりがな": ""},
+    {"名前": "鈴木すずき", "ふりがな": "すずき"},
+] * 10
+# 応募者シートの29・30列目に郵便番号・実行環境がある想定
+HEADER_MAP = {"郵便番号": 29, "実行環境": 30}
+
+
+def _scraper_data(count):
+    return [
+        {
+            "クライアント": "サンプル法人",
+            "職種": "介護職",
+            "応募日時": f"2025年4月{i % 28 + 1}日 10:{i % 60:02d}",
+            "都道府県": "東京都",
+            "名前": f"応募者{i}",
+            "年齢": f"{20 + i % 40}歳",
+            "求人URL": f"https://en-gage.net/user/search/desc/{i}/#/",
+            "メールアドレス": f"applicant{i}@example.com",
+            "電話番号": "09012345678",
+            "生年月日": "1990年1月2日",
+            "住所": "東京都新宿区",
+            "郵便番号": "160-0022",
+            "応募者ID": f"A{i}",
+            "実行環境": "bench",
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize("method, values", [
+    ("_format_datetime", DATETIMES),
+    ("_format_birthday", BIRTHDAYS),
+    ("_format_age", AGES),
+])
+def test_formatter(benchmark, method, values):
+    formatter = getattr(DataProcessor({}), method)
+
+    benchmark.group = "DataProcessor の変換（形式混在）"
+    benchmark.extra_info["values"] = len(values)
+    results = benchmark(lambda: [formatter(value) for value in values])
+    assert len(results) == len(values)
+
+
+def test_format_results():
+    """計測対象の変換の結果（高速化で結果が変わっていないことの確認）"""
+    processor = DataProcessor({})
+    assert processor._format_datetime("2026年1月28日 23:51") == "2026-01-28 23:51:00"
+    assert processor._format_datetime(" 2026/2/16 ") == "2026-02-16 0:00:00"
+    assert processor._format_datetime("情報なし") == ""
+    assert processor._format_birthday("'1967-02-21") == "1967-2-21"
+    assert processor._format_age("45 歳") == 45
+
+
+def test_clean_name(benchmark):
+    # engage_check_apply は playwright などのスクレイパーの依存がないと読み込めない
+    engage_check_apply = pytest.importorskip("engage_check_apply")
+
+    benchmark.group = "DataProcessor の変換（形式混在）"
+    benchmark.extra_info["values"] = len(NAMES)
+    results = benchmark(lambda: [engage_check_apply.clean_name(dict(details)) for details in NAMES])
+    assert results[1]["名前"] == "山田 太郎"
+
+
+def test_process_batch(benchmark):
+    data_list = _scraper_data(PROCESS_BATCH_RECORDS)
+
+    benchmark.group = "DataProcessor.process_batch"
+    benchmark.extra_info["rows"] = PROCESS_BATCH_RECORDS
+    processed = benchmark(DataProcessor.process_batch, data_list)
+    assert len(processed) == PROCESS_BATCH_RECORDS
+    assert processed[0]["応募日時"] == "'2025-04-01 10:00:00"
+
+
+@pytest.mark.parametrize("count", BATCH_SIZES)
+def test_to_matrix(benchmark, count):
+    data_list = _scraper_data(count)
+    layout = row_layout(HEADER_MAP)
+
+    benchmark.group = "DataProcessor.to_matrix（スクレイピング結果）"
+    benchmark.extra_info["rows"] = count
+    rows = benchmark(DataProcessor.to_matrix, data_list, layout)
+    assert len(rows) == count
+    assert rows[0][HEADER_MAP["郵便番号"] - 1] == "160-0022"
+    assert rows[0][HEADER_MAP["実行環境"] - 1] == "bench"
+
+
+@pytest.mark.parametrize("count", BATCH_SIZES)
+def test_to_matrix_processed(benchmark, count):
+    """キューから取り出した変換済みの行を並べるだけのコスト（SpreadsheetManager.write_rows / upsert_rows）"""
+    processed_list = DataProcessor.process_batch(_scraper_data(count))
+    layout = row_layout(HEADER_MAP)
+
+    benchmark.group = "DataProcessor.to_matrix（変換済み）"
+    benchmark.extra_info["rows"] = count
+    rows = benchmark(DataProcessor.to_matrix, processed_list, layout, processed=True)
+    assert rows == DataProcessor.to_matrix(_scraper_data(count), layout)
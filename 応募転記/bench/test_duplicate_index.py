@@ -0,0 +1,32 @@
+# test_duplicate_index.py
+"""
+DuplicateIndex の重複判定が応募者シートの行数に関係なく一定時間で済むことの確認（1万〜20万行）
+"""
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from SpreadsheetManager import DuplicateIndex
+
+
+SHEET_ROWS = [10_000, 50_000, 100_000, 200_000]
+# 1回の計測で判定する件数（ヒット・ミスを半分ずつ）
+LOOKUPS = 1_000
+
+
+def _pairs(rows):
+    return [(f"applicant{i}@example.com", f"https://en-gage.net/user/search/desc/{i % 5000}/#/") for i in range(rows)]
+
+
+@pytest.mark.parametrize("rows", SHEET_ROWS)
+def test_contains(benchmark, rows):
+    pairs = _pairs(rows)
+    index = DuplicateIndex(pairs)
+    hits = pairs[:: max(1, rows // (LOOKUPS // 2))][: LOOKUPS // 2]
+    misses = [(f"new{i}@example.com", url) for i, (_, url) in enumerate(hits)]
+    queries = hits + misses
+
+    benchmark.group = "DuplicateIndex.contains（1000件）"
+    benchmark.extra_info["rows"] = rows
+    found = benchmark(lambda: sum(index.contains(email, url) for email, url in queries))
+    assert found == len(hits)
@@ -0,0 +1,317 @@
+# captcha_history.py
+"""
+アカウントごとの reCAPTCHA の結果履歴
+
+ログインごとに reCAPTCHA が出たか、出た場合の結果（チェックボックスだけで通過したか、2Captcha の解決時間）を
+時刻（時間帯）と前回ログインからの間隔とともにローカルの SQLite に積み上げる。
+即時スクレイパーと定期スクレイパーが同時に記録しても失われないよう、WALモード + BEGIN IMMEDIATE で書き込む。
+
+- チェックボックスの通過率が低いアカウントでは、サイトキーを検出した時点で 2Captcha への解決リクエストを
+  先行して送る（speculative solving）
+- 時間帯・ログイン間隔ごとの出現率と解決時間から、アカウントを今処理した場合の reCAPTCHA の予想時間を求める
+  （account_scheduler.py が処理順と見送りの判断に使う）
+
+  CAPTCHA_SPECULATIVE            auto（通過率で判断）/ always / off（既定: auto）
+  CAPTCHA_SPECULATIVE_THRESHOLD  通過率がこの値未満なら先行して送る（既定: 0.5）
+  CAPTCHA_SPECULATIVE_MIN_SAMPLES  判断に必要な最低の記録数（既定: 3）
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_right
+from contextlib import contextmanager
+
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_HISTORY_PATH = os.path.join(CURRENT_DIR, "captcha_history.sqlite3")
+# 以前の形式（JSONファイル）。あれば初回に取り込む
+LEGACY_HISTORY_PATH = os.path.join(CURRENT_DIR, "captcha_history.json")
+
+CAPTCHA_SPECULATIVE = os.getenv("CAPTCHA_SPECULATIVE", "auto").lower()
+CAPTCHA_SPECULATIVE_THRESHOLD = float(os.getenv("CAPTCHA_SPECULATIVE_THRESHOLD", "0.5"))
+CAPTCHA_SPECULATIVE_MIN_SAMPLES = int(os.getenv("CAPTCHA_SPECULATIVE_MIN_SAMPLES", "3"))
+# アカウントごとに保持するログインの記録数（古いものから捨てる）
+CAPTCHA_HISTORY_SIZE = 200
+
+# reCAPTCHA 処理結果（実行履歴の reCAPTCHA 列の値）→ チェックボックスで通過したか
+# 先行解決でチェックボックス側を打ち切った場合は通過したか分からないので記録しない
+CHECKBOX_OUTCOMES = {
+    'チェックボックス通過': True,
+    '2Captcha解決': False,
+    '解決失敗': False,
+}
+
+# 出現率の推定に使うログイン間隔の区切り（秒）: 1時間未満 / 3時間未満 / 12時間未満 / それ以上
+SPACING_BUCKETS = (3600, 3 * 3600, 12 * 3600)
+# 記録がないときの出現率と、reCAPTCHA 1回あたりの時間（秒）
+DEFAULT_INCIDENCE = 0.2
+DEFAULT_CAPTCHA_SECONDS = 60.0
+# チェックボックスだけで通過した場合にかかる時間（秒）
+CHECKBOX_SECONDS = 5.0
+# 条件ごとの出現率を上位の推定に寄せる強さ（記録数がこれより少ない条件は上位の推定に近くなる）
+PRIOR_WEIGHT = 3.0
+# アカウントの処理時間（reCAPTCHA を除く）の指数移動平均の重み
+RUN_SECONDS_ALPHA = 0.3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS captcha_logins (
+    account TEXT NOT NULL,
+    at REAL NOT NULL,
+    hour INTEGER NOT NULL,
+    spacing REAL,
+    captcha INTEGER NOT NULL,
+    checkbox INTEGER,
+    solve_seconds REAL
+);
+CREATE INDEX IF NOT EXISTS idx_captcha_logins_account ON captcha_logins (account, at);
+CREATE TABLE IF NOT EXISTS captcha_runs (
+    account TEXT PRIMARY KEY,
+    run_seconds REAL NOT NULL
+);
+"""
+
+LOGIN_COLUMNS = ("at", "hour", "spacing", "captcha", "checkbox", "solve_seconds")
+
+
+def _spacing_bucket(spacing):
+    # 初回（前回ログインの記録なし）は最も長い間隔として扱う
+    if spacing is None:
+        return len(SPACING_BUCKETS)
+    return bisect_right(SPACING_BUCKETS, spacing)
+
+
+def _blend(entries, prior):
+    """entries での出現率を、記録数に応じて prior に寄せる"""
+    shown = sum(1 for entry in entries if entry.get('captcha', True))
+    return (shown + PRIOR_WEIGHT * prior) / (len(entries) + PRIOR_WEIGHT)
+
+
+def _captcha_seconds(entry):
+    if entry.get('solve_seconds') is not None:
+        return entry['solve_seconds']
+    return CHECKBOX_SECONDS if entry['checkbox'] else None
+
+
+def _bool_or_none(value):
+    return None if value is None else int(bool(value))
+
+
+class CaptchaHistory:
+    def __init__(self, db_path=None, mode=CAPTCHA_SPECULATIVE, threshold=CAPTCHA_SPECULATIVE_THRESHOLD,
+                 min_samples=CAPTCHA_SPECULATIVE_MIN_SAMPLES, max_entries=CAPTCHA_HISTORY_SIZE,
+                 legacy_path=LEGACY_HISTORY_PATH):
+        if mode not in ("auto", "always", "off"):
+            print(f"CAPTCHA_SPECULATIVE の値が不正です（{mode}）。auto で実行します")
+            mode = "auto"
+        self.db_path = db_path or DEFAULT_HISTORY_PATH
+        self.legacy_path = legacy_path
+        self.mode = mode
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.max_entries = max_entries
+        self._conn = None
+        # 接続はスレッド間で共有するため、1つの操作ごとにロックを取る
+        self._lock = threading.Lock()
+        self.stats = {'recorded': 0, 'speculative': 0}
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            self._import_legacy()
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @contextmanager
+    def _transaction(self):
+        """書き込みトランザクション（BEGIN IMMEDIATEで他プロセスの記録と直列化する）"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _import_legacy(self):
+        """以前の JSON ファイルの記録を取り込み、取り込んだファイルは .migrated に改名する"""
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+        try:
+            with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                accounts = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"以前のreCAPTCHA履歴を読み込めませんでした（取り込まずに開始）: {e}")
+            return
+        with self._transaction() as conn:
+            for account, value in accounts.items():
+                # 旧形式（reCAPTCHAが出たログインだけのリスト）も読めるようにする
+                if isinstance(value, list):
+                    value = {'logins': value, 'run_seconds': None}
+                conn.executemany(
+                    "INSERT INTO captcha_logins (account, at, hour, spacing, captcha, checkbox, solve_seconds) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            account, entry['at'], entry.get('hour', time.localtime(entry['at']).tm_hour),
+                            entry.get('spacing'), int(entry.get('captcha', True)),
+                            _bool_or_none(entry.get('checkbox')), entry.get('solve_seconds'),
+                        )
+                        for entry in value.get('logins', [])[-self.max_entries:]
+                    ],
+                )
+                if value.get('run_seconds') is not None:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO captcha_runs (account, run_seconds) VALUES (?, ?)",
+                        (account, value['run_seconds']),
+                    )
+        os.replace(self.legacy_path, f"{self.legacy_path}.migrated")
+        print(f"以前のreCAPTCHA履歴を取り込みました: {len(accounts)}アカウント")
+
+    def _logins(self, account):
+        """アカウントのログインの記録（古い順）: [{"at", "hour", "spacing", "captcha", "checkbox", "solve_seconds"}]"""
+        rows = self._connect().execute(
+            f"SELECT {', '.join(LOGIN_COLUMNS)} FROM captcha_logins WHERE account = ? ORDER BY at, rowid",
+            (account,),
+        )
+        return [dict(zip(LOGIN_COLUMNS, row)) for row in rows]
+
+    def record(self, account, status, solve_seconds=None, at=None):
+        """ログインの結果を記録する（status は実行履歴の reCAPTCHA 列の値。reCAPTCHAが出なければ 'なし'）"""
+        at = time.time() if at is None else at
+        with self._lock:
+            try:
+                with self._transaction() as conn:
+                    # 前回ログインは他プロセスの記録も含めてトランザクション内で読む
+                    previous = conn.execute(
+                        "SELECT MAX(at) FROM captcha_logins WHERE account = ?", (account,)
+                    ).fetchone()[0]
+                    conn.execute(
+                        "INSERT INTO captcha_logins (account, at, hour, spacing, captcha, checkbox, solve_seconds) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            account, at, time.localtime(at).tm_hour,
+                            at - previous if previous is not None else None,
+                            int(status != 'なし'), _bool_or_none(CHECKBOX_OUTCOMES.get(status)), solve_seconds,
+                        ),
+                    )
+                    conn.execute(
+                        "DELETE FROM captcha_logins WHERE account = ? AND rowid NOT IN ("
+                        "SELECT rowid FROM captcha_logins WHERE account = ? ORDER BY at DESC, rowid DESC LIMIT ?)",
+                        (account, account, self.max_entries),
+                    )
+                self.stats['recorded'] += 1
+            except sqlite3.Error as e:
+                print(f"reCAPTCHA履歴の保存に失敗しました: {e}")
+
+    def record_run(self, account, seconds):
+        """アカウント1件の処理時間（reCAPTCHAの解決時間を除く）を記録する"""
+        with self._lock:
+            try:
+                with self._transaction() as conn:
+                    row = conn.execute(
+                        "SELECT run_seconds FROM captcha_runs WHERE account = ?", (account,)
+                    ).fetchone()
+                    previous = row[0] if row else None
+                    conn.execute(
+                        "INSERT OR REPLACE INTO captcha_runs (account, run_seconds) VALUES (?, ?)",
+                        (account, seconds if previous is None else previous + RUN_SECONDS_ALPHA * (seconds - previous)),
+                    )
+            except sqlite3.Error as e:
+                print(f"reCAPTCHA履歴の保存に失敗しました: {e}")
+
+    def pass_rate(self, account):
+        """チェックボックスだけで通過した割合と、その判断に使った記録数を返す（記録がなければ (None, 0)）"""
+        with self._lock:
+            passed, samples = self._connect().execute(
+                "SELECT SUM(checkbox), COUNT(checkbox) FROM captcha_logins WHERE account = ?", (account,)
+            ).fetchone()
+        if not samples:
+            return None, 0
+        return passed / samples, samples
+
+    def should_speculate(self, account):
+        """サイトキー検出時に 2Captcha へ先行して解決リクエストを送るか"""
+        if self.mode == "off":
+            return False
+        if self.mode == "always":
+            return True
+        rate, samples = self.pass_rate(account)
+        return samples >= self.min_samples and rate < self.threshold
+
+    def last_login(self, account):
+        """最後にログインした時刻（epoch秒）。記録がなければ None"""
+        with self._lock:
+            return self._connect().execute(
+                "SELECT MAX(at) FROM captcha_logins WHERE account = ?", (account,)
+            ).fetchone()[0]
+
+    def run_seconds(self, account):
+        """reCAPTCHAを除く処理時間の平均（秒）。記録がなければ None"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT run_seconds FROM captcha_runs WHERE account = ?", (account,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def incidence(self, account, at=None):
+        """
+        時刻 at にログインした場合に reCAPTCHA が出る確率の推定。
+        全アカウント → アカウント → 同じ時間帯 → 同じログイン間隔 の順に絞り込み、
+        記録の少ない条件は一つ上の推定に寄せる
+        """
+        at = time.time() if at is None else at
+        with self._lock:
+            total, shown = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(captcha), 0) FROM captcha_logins"
+            ).fetchone()
+            logins = self._logins(account)
+        hour = time.localtime(at).tm_hour
+        spacing = _spacing_bucket(at - logins[-1]['at'] if logins else None)
+
+        # 全アカウントの出現率は件数だけで求める（_blend と同じ式）
+        estimate = (shown + PRIOR_WEIGHT * DEFAULT_INCIDENCE) / (total + PRIOR_WEIGHT)
+        estimate = _blend(logins, estimate)
+        estimate = _blend([entry for entry in logins if entry.get('hour', time.localtime(entry['at']).tm_hour) == hour], estimate)
+        estimate = _blend([entry for entry in logins if _spacing_bucket(entry.get('spacing')) == spacing], estimate)
+        return estimate
+
+    def captcha_seconds(self, account):
+        """reCAPTCHAが出た場合にかかる時間（秒）の平均。アカウントの記録がなければ全アカウントの平均"""
+        with self._lock:
+            own = [_captcha_seconds(entry) for entry in self._logins(account) if entry.get('captcha', True)]
+            own = [seconds for seconds in own if seconds is not None]
+            if own:
+                return sum(own) / len(own)
+            # 全アカウントの平均（_captcha_seconds と同じ規則。AVG は NULL を除いて平均する）
+            every = self._connect().execute(
+                "SELECT AVG(COALESCE(solve_seconds, CASE WHEN checkbox THEN ? END)) "
+                "FROM captcha_logins WHERE captcha",
+                (CHECKBOX_SECONDS,),
+            ).fetchone()[0]
+        return every if every is not None else DEFAULT_CAPTCHA_SECONDS
+
+    def expected_captcha_seconds(self, account, at=None):
+        """時刻 at に処理した場合の reCAPTCHA の予想時間（出現率 × 1回あたりの時間）"""
+        return self.incidence(account, at) * self.captcha_seconds(account)
+
+    def format_stats(self):
+        return (
+            f"モード: {self.mode}（通過率 {self.threshold:.0%} 未満で先行解決）, "
+            f"記録: {self.stats['recorded']}件, 先行解決: {self.stats['speculative']}回"
+        )
+
+
+# プロセス全体で共有する履歴
+captcha_history = CaptchaHistory()
@@ -0,0 +1,123 @@
+# captcha_solver.py
+"""
+2Captcha API の非同期クライアント（reCAPTCHA v2）
+
+- aiohttp のセッションを使い回す（リクエストごとに接続し直さない）
+- ポーリングは最初に長めに待ってから短い間隔で確認する。最初の待機は直近の解決時間から調整する
+- 呼び出し側でタスクをキャンセルすれば、ポーリングの途中でもすぐに止まる
+- 接続先は TWOCAPTCHA_BASE_URL で差し替えられる（fake_2captcha_server.py でオフライン確認用）
+"""
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import aiohttp
+
+
+TWOCAPTCHA_BASE_URL = os.getenv("TWOCAPTCHA_BASE_URL", "http://2captcha.com")
+# 最初のポーリングまでの待機（秒）の範囲と既定値。reCAPTCHA は通常20秒前後かかる
+FIRST_POLL_MIN_SECONDS = 10.0
+FIRST_POLL_MAX_SECONDS = 30.0
+FIRST_POLL_SECONDS = float(os.getenv("TWOCAPTCHA_FIRST_POLL_SECONDS", "15"))
+POLL_INTERVAL_SECONDS = float(os.getenv("TWOCAPTCHA_POLL_INTERVAL_SECONDS", "5"))
+SOLVE_TIMEOUT_SECONDS = float(os.getenv("TWOCAPTCHA_TIMEOUT_SECONDS", "180"))
+
+
+@dataclass
+class SolveResult:
+    """1回の解決リクエストの結果"""
+    token: Optional[str] = None
+    elapsed: float = 0.0      # 送信から結果（または失敗）までの秒数
+    polls: int = 0            # res.php への問い合わせ回数
+    error: str = ''
+
+
+class TwoCaptchaSolver:
+    def __init__(self, api_key, base_url=TWOCAPTCHA_BASE_URL, first_poll_seconds=FIRST_POLL_SECONDS,
+                 poll_interval_seconds=POLL_INTERVAL_SECONDS, timeout_seconds=SOLVE_TIMEOUT_SECONDS, log=print):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.first_poll_seconds = first_poll_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.timeout_seconds = timeout_seconds
+        self.log = log
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _adapt(self, elapsed: float) -> None:
+        """直近の解決時間に合わせて最初の待機を調整する（解決時間の約8割、上下限あり）"""
+        target = min(FIRST_POLL_MAX_SECONDS, max(FIRST_POLL_MIN_SECONDS, elapsed * 0.8))
+        self.first_poll_seconds = self.first_poll_seconds * 0.7 + target * 0.3
+
+    async def _call(self, http_method: str, path: str, **params) -> dict:
+        session = await self._get_session()
+        url = f"{self.base_url}/{path}"
+        if http_method == 'POST':
+            async with session.post(url, data=params) as response:
+                return await response.json(content_type=None)
+        async with session.get(url, params=params) as response:
+            return await response.json(content_type=None)
+
+    async def solve(self, sitekey: str, page_url: str) -> SolveResult:
+        """reCAPTCHA v2 を解決してトークンを返す。キャンセルされた場合は CancelledError を送出する"""
+        result = SolveResult()
+        started = time.monotonic()
+        self.log(f"2Captcha: reCAPTCHA解決リクエスト送信中 (sitekey={sitekey[:16]}...)")
+
+        try:
+            response = await self._call('POST', 'in.php', key=self.api_key, method='userrecaptcha',
+                                        googlekey=sitekey, pageurl=page_url, json=1)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            result.error = f"リクエスト送信エラー: {str(e)}"
+            result.elapsed = time.monotonic() - started
+            self.log(f"2Captcha: {result.error}")
+            return result
+
+        if response.get('status') != 1:
+            result.error = f"リクエスト失敗: {response.get('request', 'unknown error')}"
+            result.elapsed = time.monotonic() - started
+            self.log(f"2Captcha: {result.error}")
+            return result
+
+        request_id = response['request']
+        self.log(f"2Captcha: リクエストID={request_id}、解決待機中（初回確認まで{self.first_poll_seconds:.0f}秒）...")
+
+        delay = self.first_poll_seconds
+        while time.monotonic() - started + delay <= self.timeout_seconds:
+            await asyncio.sleep(delay)
+            delay = self.poll_interval_seconds
+            result.polls += 1
+            try:
+                response = await self._call('GET', 'res.php', key=self.api_key, action='get', id=request_id, json=1)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                self.log(f"2Captcha: ポーリングエラー: {str(e)}")
+                continue
+
+            if response.get('status') == 1:
+                result.token = response['request']
+                result.elapsed = time.monotonic() - started
+                self._adapt(result.elapsed)
+                self.log(f"2Captcha: 解決成功（{result.elapsed:.0f}秒、ポーリング{result.polls}回）")
+                return result
+
+            if response.get('request') != 'CAPCHA_NOT_READY':
+                result.error = f"エラー: {response.get('request', 'unknown')}"
+                result.elapsed = time.monotonic() - started
+                self.log(f"2Captcha: {result.error}")
+                return result
+
+        result.error = f"タイムアウト（{self.timeout_seconds:.0f}秒）"
+        result.elapsed = time.monotonic() - started
+        self.log(f"2Captcha: {result.error}")
+        return result
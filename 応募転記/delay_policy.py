@@ -0,0 +1,133 @@
+# delay_policy.py
+"""
+人間らしい待機時間（human_delay）のポリシー
+
+待機はすべて名前付きのフェーズ（login / modal / navigation / between_applicants など）で指定し、
+フェーズごとの待機時間の範囲と、実行全体の速度プロファイル（DELAY_PROFILE）で実際の待機時間を決める。
+フェーズごと・アカウントごとに実際に待機した時間を集計し、実行時間のうち意図的な待機がどれだけかを出力する。
+
+  DELAY_PROFILE           careful / normal / fast / none（既定: normal）
+  DELAY_<PHASE>           フェーズの範囲を上書き（例: DELAY_BETWEEN_APPLICANTS=300,600）
+  DELAY_ACCOUNT_PROFILES  アカウントごとの速度プロファイル（例: {"〇〇病院": "careful"}）
+"""
+import asyncio
+import json
+import os
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+# フェーズごとの待機時間の範囲（ミリ秒）
+PHASES = {
+    'typing': (100, 300),              # 入力欄をクリックしてから入力を始めるまで
+    'typing_done': (200, 500),         # 入力し終えた後
+    'form_input': (300, 600),          # ログインIDの入力後
+    'form_input_done': (500, 1000),    # パスワードの入力後
+    'login': (800, 1500),              # ログインページ・ログイン後の画面への遷移後
+    'logout_redirect': (500, 1000),    # 前回のセッションのログアウトURLへの遷移後
+    'login_submit': (1000, 2000),      # ログインボタン送信後
+    'recaptcha': (2000, 3000),         # reCAPTCHAチェックボックスのクリック後・再確認前
+    'recaptcha_inject': (500, 1000),   # reCAPTCHAトークン注入の前後
+    'modal': (200, 400),               # モーダルの開閉・ボタンクリック後
+    'login_popup': (200, 300),         # ログイン後にポップアップを閉じるクリックの後
+    'navigation': (1000, 2000),        # 管理画面への遷移後
+    'processing_page': (300, 500),     # 選考中ページの遷移後
+    'between_applicants': (500, 1000), # 応募者と応募者の間
+}
+
+# 速度プロファイル（範囲に掛ける倍率）
+SPEED_PROFILES = {
+    'careful': 1.5,
+    'normal': 1.0,
+    'fast': 0.5,
+    'none': 0.0,
+}
+
+DELAY_PROFILE = os.getenv("DELAY_PROFILE", "normal").lower()
+
+
+def _env_phases():
+    phases = dict(PHASES)
+    for phase in PHASES:
+        value = os.getenv(f"DELAY_{phase.upper()}")
+        if not value:
+            continue
+        try:
+            min_ms, max_ms = (int(part) for part in value.split(","))
+            phases[phase] = (min_ms, max(min_ms, max_ms))
+        except ValueError:
+            print(f"DELAY_{phase.upper()} の値が不正です（{value}）。既定値を使います")
+    return phases
+
+
+def _env_account_profiles():
+    value = os.getenv("DELAY_ACCOUNT_PROFILES")
+    if not value:
+        return {}
+    try:
+        return json.loads(value)
+    except ValueError:
+        print(f"DELAY_ACCOUNT_PROFILES の値が不正です（{value}）。無視します")
+        return {}
+
+
+class DelayPolicy:
+    def __init__(self, profile=DELAY_PROFILE, phases=None, account_profiles=None):
+        if profile not in SPEED_PROFILES:
+            print(f"DELAY_PROFILE の値が不正です（{profile}）。normal で実行します")
+            profile = 'normal'
+        self.profile = profile
+        self.phases = phases if phases is not None else _env_phases()
+        self.account_profiles = account_profiles if account_profiles is not None else _env_account_profiles()
+        # 実行中のアカウント（並列実行時もタスクごとに分かれる）
+        self._account: ContextVar = ContextVar('delay_account', default=None)
+        self.phase_totals = {}    # フェーズ → [回数, 合計秒]
+        self.account_totals = {}  # アカウント → 合計秒
+
+    def _scale(self):
+        account = self._account.get()
+        profile = self.account_profiles.get(account, self.profile) if account else self.profile
+        return SPEED_PROFILES.get(profile, SPEED_PROFILES[self.profile])
+
+    def duration(self, phase):
+        """フェーズの待機秒数を決める"""
+        if phase not in self.phases:
+            raise KeyError(f"未定義の待機フェーズです: {phase}")
+        min_ms, max_ms = self.phases[phase]
+        return random.randint(min_ms, max_ms) * self._scale() / 1000
+
+    async def sleep(self, phase):
+        seconds = self.duration(phase)
+        totals = self.phase_totals.setdefault(phase, [0, 0.0])
+        totals[0] += 1
+        totals[1] += seconds
+        account = self._account.get()
+        if account:
+            self.account_totals[account] = self.account_totals.get(account, 0.0) + seconds
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+    @contextmanager
+    def account(self, name):
+        """この中の待機をアカウント name として集計する（アカウント別の速度プロファイルも適用する）"""
+        token = self._account.set(name)
+        try:
+            yield
+        finally:
+            self._account.reset(token)
+
+    def account_seconds(self, name):
+        return self.account_totals.get(name, 0.0)
+
+    def format_stats(self):
+        total = sum(seconds for _, seconds in self.phase_totals.values())
+        phases = ", ".join(
+            f"{phase}: {seconds:.1f}秒/{count}回"
+            for phase, (count, seconds) in sorted(self.phase_totals.items(), key=lambda item: -item[1][1])
+        )
+        return f"プロファイル: {self.profile}, 合計 {total:.1f}秒（{phases or 'なし'}）"
+
+
+# プロセス全体で共有するポリシー
+delay_policy = DelayPolicy()
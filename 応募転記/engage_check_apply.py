@@ -1,22 +1,33 @@
 import asyncio
 import re
 import random
+import threading
 import time
-import requests
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from urllib.parse import urlparse, parse_qs
-from dataclasses import dataclass
+from html.parser import HTMLParser
+from dataclasses import dataclass, field
 import os
 import certifi
 import json
 from datetime import datetime
 from dotenv import load_dotenv
 import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 
 from playwright.async_api import async_playwright, Page, ElementHandle, TimeoutError as PlaywrightTimeoutError
 from playwright_stealth import Stealth
-from SpreadsheetManager import SpreadsheetManager, write_to_spreadsheet
+from SpreadsheetManager import DuplicateIndex, write_to_spreadsheet, start_spreadsheet_flusher, stop_spreadsheet_flusher
+from sheets_client import registry as sheets_registry
+from sheets_scheduler import scheduler as sheets_scheduler
+from session_store import session_store
+from job_location_cache import job_location_cache
+from resource_blocking import resource_blocker
+from memory_governor import memory_governor
+from delay_policy import delay_policy
+from captcha_solver import SolveResult, TwoCaptchaSolver
+from captcha_history import captcha_history
+from account_scheduler import account_scheduler
+from metrics import metrics
 from Notification.NotificationManagerClass import NotificationManager
 from Notification.config import config
 from constants import AREA_MAPPING, FACILITY_TYPES, PROFESSIONS
@@ -34,12 +45,29 @@ TWOCAPTCHA_API_KEY = '510106e415b0e9081f74199608d3b5c2'
 # 実行履歴スプレッドシート設定
 EXECUTION_LOG_SPREADSHEET_ID = '1j-u3vJ0DaJLKoeF1F_MR6eywWU07XDg_rAOblMjktlk'
 EXECUTION_LOG_SHEET_NAME = '実行履歴'
+EXECUTION_LOG_HEADERS = [
+    '実行日時', 'クライアント名', 'ログイン結果',
+    'reCAPTCHA状態', '2Captcha解決時間(秒)',
+    '新規応募者数', '転記成功数', '重複スキップ数',
+    'エラー内容', '処理時間(秒)', 'セッション再利用', 'ブラウザ最大メモリ(MB)',
+    '2Captchaポーリング回数',
+]
 
 # ログファイル設定
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 LOG_FILE_PREFIX = "engage_scraper_"
 LOG_FILE_EXTENSION = ".log"
 
+# 実行履歴ジャーナル（ローカルに追記し、N件ごと・実行終了時にまとめて書き込む）
+EXECUTION_LOG_JOURNAL_PATH = os.path.join(CURRENT_DIR, "execution_log_journal.jsonl")
+EXECUTION_LOG_FLUSH_EVERY = int(os.getenv("EXECUTION_LOG_FLUSH_EVERY", "20"))
+
+# ログイン済みセッションを保存・復元してログインを省略する（1 で有効）
+SESSION_REUSE = os.getenv("SESSION_REUSE", "0") == "1"
+
+# 並列に処理するブラウザコンテキスト数（1 の場合は永続プロファイルで順番に処理する）
+SCRAPER_CONCURRENCY = max(1, int(os.getenv("SCRAPER_CONCURRENCY", "1")))
+
 def get_log_file_path():
     """当日の日付を含むログファイルパスを取得"""
     today = datetime.now().strftime('%Y-%m-%d')
@@ -97,13 +125,16 @@ class ExecutionRecord:
     start_time: str = ''
     client_name: str = ''
     login_result: str = ''          # 成功 / 失敗
-    recaptcha_status: str = 'なし'  # なし / チェックボックス通過 / 2Captcha解決 / 解決失敗
+    recaptcha_status: str = 'なし'  # なし / チェックボックス通過 / 2Captcha解決 / 2Captcha先行解決 / 解決失敗
     captcha_solve_time: str = ''    # 2Captcha解決時間（秒）
     new_applicants: int = 0         # 新規応募者数
     written_count: int = 0          # 転記成功数
     duplicate_count: int = 0        # 重複スキップ数
     error_message: str = ''         # エラー内容
     processing_time: str = ''       # 処理時間（秒）
+    session_reused: str = ''        # 再利用 / （空欄: 通常ログイン）
+    peak_rss_mb: str = ''           # 処理中のブラウザ（Chromeプロセス全体）の最大RSS（MB）
+    captcha_polls: str = ''         # 2Captchaへの結果問い合わせ回数
 
     def to_row(self) -> list:
         return [
@@ -117,14 +148,23 @@ class ExecutionRecord:
             self.duplicate_count,
             self.error_message,
             self.processing_time,
+            self.session_reused,
+            self.peak_rss_mb,
+            self.captcha_polls,
         ]
 
+    def set_captcha(self, attempt: 'CaptchaAttempt') -> None:
+        """reCAPTCHA対応の結果を記録する"""
+        self.recaptcha_status = attempt.status
+        self.captcha_solve_time = str(int(attempt.solve_seconds)) if attempt.solve_seconds is not None else ''
+        self.captcha_polls = str(attempt.solve_polls) if attempt.solve_polls is not None else ''
+
 class SpreadsheetUserRepository:
-    def __init__(self, client: gspread.Client, spreadsheet_id: str, sheet_name: str):
-        self.worksheet = client.open_by_key(spreadsheet_id).worksheet(sheet_name)
+    def __init__(self, spreadsheet_id: str, sheet_name: str):
+        self.worksheet = sheets_registry.get_worksheet(spreadsheet_id, sheet_name)
 
     def find_by_media(self, media_name: str) -> List[User]:
-        all_records = self.worksheet.get_all_records()
+        all_records = sheets_scheduler.read(self.worksheet.get_all_records)
         users = []
         for record in all_records:
             media = record.get('媒体名', '')
@@ -146,52 +186,132 @@ class SpreadsheetUserRepository:
                 ))
         return users
 
-def create_credentials() -> Optional[Dict[str, Any]]:
+def authorize_spreadsheet() -> Optional[gspread.Client]:
+    """プロセス内で共有する認証済みクライアントを取得する"""
     try:
-        with open('Credentials.json', 'r') as file:
-            return json.load(file)
+        return sheets_registry.get_client()
     except FileNotFoundError:
         print_log("Credentials.jsonファイルが見つかりません。")
         return None
 
-def authorize_spreadsheet() -> Optional[gspread.Client]:
-    credentials = create_credentials()
-    if not credentials:
-        return None
-    
-    scope = [
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive"
-    ]
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(credentials, scope)
-    return gspread.authorize(creds)
+class ExecutionLogJournal:
+    """
+    実行履歴をローカルの追記専用ジャーナル（JSON Lines）に書き、まとめてシートに書き込む。
+    書き込み前にクラッシュした行は次回起動時の flush() で再送される。
+    シートへの書き込みはリトライ待機でブロックするため、コルーチンからは asyncio.to_thread 経由で呼ぶ。
+    """
+
+    def __init__(self, path: str, flush_every: int):
+        self.path = path
+        self.flush_every = flush_every
+        self._pending = 0
+        self._header_checked = False
+        # 複数のスレッドから呼ばれる（flush 中の追記がジャーナルを空にする際に失われないようにする）
+        self._lock = threading.RLock()
+
+    def append(self, record: ExecutionRecord) -> None:
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record.to_row(), ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._pending += 1
+            if self.flush_every > 0 and self._pending >= self.flush_every:
+                self.flush()
+
+    def _read_rows(self) -> List[list]:
+        if not os.path.exists(self.path):
+            return []
+        rows = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 書き込み途中でクラッシュした行は破棄する
+                    print_log(f"実行履歴ジャーナルの壊れた行をスキップしました: {line[:50]}")
+        return rows
+
+    @staticmethod
+    def _ensure_header(sheet) -> None:
+        """
+        1行目を EXECUTION_LOG_HEADERS と照合する。空なら書き込み、列が足りなければ
+        （実行履歴の列を追加する前に作られたシート）空いている列にヘッダーを書き足す
+        """
+        current = sheets_scheduler.read(sheet.row_values, 1)
+        if not current:
+            sheets_scheduler.append(sheet.append_row, EXECUTION_LOG_HEADERS, value_input_option='RAW')
+            return
 
-def write_execution_log(record: ExecutionRecord) -> None:
-    """実行履歴を Google スプレッドシートに書き込む"""
-    try:
-        client = authorize_spreadsheet()
-        if not client:
-            print_log("実行履歴: スプレッドシート認証に失敗しました")
+        missing = []
+        for col_index, header in enumerate(EXECUTION_LOG_HEADERS, start=1):
+            existing = current[col_index - 1] if col_index <= len(current) else ''
+            if not existing:
+                missing.append((col_index, header))
+            elif existing != header:
+                # 手入力で変えられた見出しは上書きしない（値は列の位置で書き込まれる）
+                print_log(f"実行履歴: {col_index}列目のヘッダーが「{existing}」です（想定: {header}）")
+        if not missing:
             return
 
-        spreadsheet = client.open_by_key(EXECUTION_LOG_SPREADSHEET_ID)
-        sheet = spreadsheet.worksheet(EXECUTION_LOG_SHEET_NAME)
-
-        # ヘッダーが未設定なら書き込む
-        existing = sheet.row_values(1)
-        if not existing:
-            headers = [
-                '実行日時', 'クライアント名', 'ログイン結果',
-                'reCAPTCHA状態', '2Captcha解決時間(秒)',
-                '新規応募者数', '転記成功数', '重複スキップ数',
-                'エラー内容', '処理時間(秒)',
-            ]
-            sheet.append_row(headers, value_input_option='RAW')
-
-        sheet.append_row(record.to_row(), value_input_option='USER_ENTERED')
-        print_log(f"実行履歴を記録しました: {record.client_name}")
+        if sheet.col_count < len(EXECUTION_LOG_HEADERS):
+            sheets_scheduler.write(sheet.add_cols, len(EXECUTION_LOG_HEADERS) - sheet.col_count)
+        sheets_scheduler.write(sheet.batch_update, [
+            {'range': gspread.utils.rowcol_to_a1(1, col_index), 'values': [[header]]}
+            for col_index, header in missing
+        ], value_input_option='RAW')
+        print_log(f"実行履歴: ヘッダーに列を追加しました: {', '.join(header for _, header in missing)}")
+
+    def flush(self) -> bool:
+        """ジャーナルの全行を1回の append でシートに書き込む。成功したらジャーナルを空にする"""
+        with self._lock:
+            return self._flush()
+
+    def _flush(self) -> bool:
+        rows = self._read_rows()
+        if not rows:
+            self._pending = 0
+            return True
+        try:
+            client = authorize_spreadsheet()
+            if not client:
+                print_log("実行履歴: スプレッドシート認証に失敗しました")
+                return False
+
+            sheet = sheets_registry.get_worksheet(EXECUTION_LOG_SPREADSHEET_ID, EXECUTION_LOG_SHEET_NAME)
+
+            # ヘッダーを確認する（プロセス内で1回のみ）
+            if not self._header_checked:
+                self._ensure_header(sheet)
+            self._header_checked = True
+
+            sheets_scheduler.append(sheet.append_rows, rows, value_input_option='USER_ENTERED')
+        except Exception as e:
+            sheets_registry.handle_error(e, EXECUTION_LOG_SPREADSHEET_ID, EXECUTION_LOG_SHEET_NAME)
+            print_log(f"実行履歴の書き込みに失敗しました（ジャーナルに保持）: {type(e).__name__}: {str(e)}")
+            return False
+
+        open(self.path, 'w', encoding='utf-8').close()
+        self._pending = 0
+        print_log(f"実行履歴を記録しました: {len(rows)}件")
+        return True
+
+
+execution_log_journal = ExecutionLogJournal(EXECUTION_LOG_JOURNAL_PATH, EXECUTION_LOG_FLUSH_EVERY)
+
+def write_execution_log(record: ExecutionRecord) -> None:
+    """実行履歴をジャーナルに追記する（シートへは flush_execution_log() でまとめて書き込む）"""
+    try:
+        execution_log_journal.append(record)
     except Exception as e:
-        print_log(f"実行履歴の書き込みに失敗しました: {type(e).__name__}: {str(e)}")
+        print_log(f"実行履歴のジャーナル書き込みに失敗しました: {type(e).__name__}: {str(e)}")
+
+def flush_execution_log() -> bool:
+    """ジャーナルに溜まった実行履歴（前回実行の残りを含む）をシートに書き込む"""
+    return execution_log_journal.flush()
 
 def get_active_accounts() -> Optional[List[User]]:
     """認証DBからアクティブなアカウントを取得する"""
@@ -202,7 +322,6 @@ def get_active_accounts() -> Optional[List[User]]:
             return None
 
         user_repo = SpreadsheetUserRepository(
-            client,
             SPREADSHEET_ID,
             "ユーザ"
         )
@@ -213,6 +332,7 @@ def get_active_accounts() -> Optional[List[User]]:
         return active_users
 
     except Exception as e:
+        sheets_registry.handle_error(e, SPREADSHEET_ID, "ユーザ")
         print_log(f"エラーが発生しました: {str(e)}")
         return None
 
@@ -223,18 +343,17 @@ def print_log(message: str) -> None:
     print(log_message)
     write_log(log_message)
 
-async def human_delay(min_ms: int = 500, max_ms: int = 1500) -> None:
-    """人間らしいランダムな遅延を追加"""
-    delay = random.randint(min_ms, max_ms) / 1000
-    await asyncio.sleep(delay)
+async def human_delay(phase: str) -> None:
+    """人間らしいランダムな遅延を追加（待機時間はフェーズごとに delay_policy で決める）"""
+    await delay_policy.sleep(phase)
 
 async def human_type(page: Page, selector: str, text: str) -> None:
     """人間らしいタイピング速度で入力"""
     await page.click(selector)
-    await human_delay(100, 300)
+    await human_delay('typing')
     for char in text:
         await page.keyboard.type(char, delay=random.randint(50, 150))
-    await human_delay(200, 500)
+    await human_delay('typing_done')
 
 async def human_mouse_move(page: Page, x: int, y: int) -> None:
     """人間らしいマウス移動（カーブ付き）"""
@@ -274,57 +393,8 @@ async def detect_recaptcha(page: Page) -> Optional[str]:
     return sitekey
 
 
-def solve_recaptcha_2captcha(sitekey: str, page_url: str) -> Optional[str]:
-    """2Captcha APIでreCAPTCHA v2を解決し、トークンを返す。"""
-    print_log(f"2Captcha: reCAPTCHA解決リクエスト送信中 (sitekey={sitekey[:16]}...)")
-
-    # 1. 解決リクエスト送信
-    try:
-        resp = requests.post('http://2captcha.com/in.php', data={
-            'key': TWOCAPTCHA_API_KEY,
-            'method': 'userrecaptcha',
-            'googlekey': sitekey,
-            'pageurl': page_url,
-            'json': 1,
-        }, timeout=30)
-        result = resp.json()
-    except Exception as e:
-        print_log(f"2Captcha: リクエスト送信エラー: {str(e)}")
-        return None
-
-    if result.get('status') != 1:
-        print_log(f"2Captcha: リクエスト失敗: {result.get('request', 'unknown error')}")
-        return None
-
-    request_id = result['request']
-    print_log(f"2Captcha: リクエストID={request_id}、解決待機中...")
-
-    # 2. 結果をポーリング（最大180秒）
-    for attempt in range(36):
-        time.sleep(5)
-        try:
-            resp = requests.get('http://2captcha.com/res.php', params={
-                'key': TWOCAPTCHA_API_KEY,
-                'action': 'get',
-                'id': request_id,
-                'json': 1,
-            }, timeout=30)
-            result = resp.json()
-        except Exception as e:
-            print_log(f"2Captcha: ポーリングエラー: {str(e)}")
-            continue
-
-        if result.get('status') == 1:
-            token = result['request']
-            print_log(f"2Captcha: 解決成功（{(attempt + 1) * 5}秒）")
-            return token
-
-        if result.get('request') != 'CAPCHA_NOT_READY':
-            print_log(f"2Captcha: エラー: {result.get('request', 'unknown')}")
-            return None
-
-    print_log("2Captcha: タイムアウト（180秒）")
-    return None
+# 2Captcha クライアント（接続はプロセス内で使い回す）
+captcha_solver = TwoCaptchaSolver(TWOCAPTCHA_API_KEY, log=print_log)
 
 
 async def click_recaptcha_checkbox(page: Page) -> bool:
@@ -334,7 +404,7 @@ async def click_recaptcha_checkbox(page: Page) -> bool:
         checkbox = recaptcha_frame.locator('#recaptcha-anchor')
         await checkbox.click(timeout=5000)
         print_log("reCAPTCHAチェックボックスをクリックしました")
-        await human_delay(2000, 3000)
+        await human_delay('recaptcha')
         return True
     except Exception as e:
         print_log(f"reCAPTCHAチェックボックスのクリックに失敗: {str(e)}")
@@ -366,6 +436,49 @@ async def is_recaptcha_expired(page: Page) -> bool:
         return False
 
 
+async def wait_until_recaptcha_solved(page: Page, interval: float = 2.0) -> bool:
+    """reCAPTCHAが解決済みになるまで待つ（キャンセルされるまで戻らない）"""
+    while True:
+        if await is_recaptcha_solved(page):
+            return True
+        await asyncio.sleep(interval)
+
+
+def finished_solve_result(solve_task: asyncio.Task) -> SolveResult:
+    """
+    完了した解決リクエストの結果を返す。captcha_solver.solve が想定外の例外で終わった場合も
+    ログインを止めないよう、失敗（token なし）の結果として扱う
+    """
+    error = solve_task.exception()
+    if error is None:
+        return solve_task.result()
+    print_log(f"2Captcha: 解決リクエストがエラーで終了しました: {type(error).__name__}: {str(error)}")
+    return SolveResult(error=f"{type(error).__name__}: {str(error)}")
+
+
+async def solve_recaptcha_2captcha(page: Page, sitekey: str, page_url: str,
+                                   solve_task: Optional[asyncio.Task] = None) -> Optional[SolveResult]:
+    """
+    2Captchaで解決し、結果を返す。待機中にチェックボックス側で通過した場合は
+    解決リクエストのポーリングを取り消して None を返す（先行して送った solve_task があればそれを待つ）
+    """
+    if solve_task is None:
+        solve_task = asyncio.create_task(captcha_solver.solve(sitekey, page_url))
+    watch_task = asyncio.create_task(wait_until_recaptcha_solved(page))
+    try:
+        await asyncio.wait({solve_task, watch_task}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (solve_task, watch_task):
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(solve_task, watch_task, return_exceptions=True)
+
+    if solve_task.cancelled():
+        print_log("2Captcha: 解決待ちの間にreCAPTCHAが通過したため、ポーリングを中止しました")
+        return None
+    return finished_solve_result(solve_task)
+
+
 async def inject_recaptcha_token(page: Page, token: str) -> None:
     """reCAPTCHAトークンをページに注入し、コールバックを呼び出す。"""
     callback_called = await page.evaluate('''(token) => {
@@ -440,86 +553,169 @@ async def is_challenge_visible(page: Page) -> bool:
         return False
 
 
-# reCAPTCHA処理の最新結果を保持（実行履歴記録用）
-_last_recaptcha_status = 'なし'
-_last_captcha_solve_time = ''
+# reCAPTCHA処理の結果（ステータス）
+CAPTCHA_PASSED_STATUSES = ('チェックボックス通過', '2Captcha解決', '2Captcha先行解決')
 
-async def handle_recaptcha_if_present(page: Page) -> bool:
-    """reCAPTCHAが検出された場合、チェックボックスクリック→必要なら2Captchaで解決。"""
-    global _last_recaptcha_status, _last_captcha_solve_time
-    _last_recaptcha_status = 'なし'
-    _last_captcha_solve_time = ''
 
-    sitekey = await detect_recaptcha(page)
-    if not sitekey:
-        return False
+@dataclass
+class CaptchaAttempt:
+    """1回のreCAPTCHA対応の結果と、段階ごとの所要時間（秒）"""
+    status: str = 'なし'                   # なし / チェックボックス通過 / 2Captcha解決 / 2Captcha先行解決 / 解決失敗
+    speculative: bool = False              # 2Captchaへ先行して解決リクエストを送ったか
+    detect_seconds: float = 0.0            # サイトキーの検出
+    checkbox_seconds: float = 0.0          # チェックボックスのクリックと通過確認
+    challenge_wait_seconds: float = 0.0    # 画像チャレンジが出るかの待機・再クリック
+    solve_seconds: Optional[float] = None  # 2Captchaの解決時間（使わなかった場合は None）
+    solve_polls: Optional[int] = None      # 2Captchaへの結果問い合わせ回数
+    inject_seconds: float = 0.0            # トークンの注入
+
+    @property
+    def passed(self) -> bool:
+        return self.status in CAPTCHA_PASSED_STATUSES
+
+    def format_timings(self) -> str:
+        solve = f"{self.solve_seconds:.1f}秒（{self.solve_polls}回）" if self.solve_seconds is not None else "-"
+        return (
+            f"{self.status}{'（2Captcha先行送信）' if self.speculative else ''}: 検出 {self.detect_seconds:.1f}秒, "
+            f"チェックボックス {self.checkbox_seconds:.1f}秒, チャレンジ待ち {self.challenge_wait_seconds:.1f}秒, "
+            f"2Captcha {solve}, 注入 {self.inject_seconds:.1f}秒"
+        )
 
-    print_log(f"reCAPTCHA検出！サイトキー: {sitekey[:16]}...")
 
+@dataclass
+class LoginOutcome:
+    """login_to_website の結果"""
+    success: bool = False
+    captcha: CaptchaAttempt = field(default_factory=CaptchaAttempt)
+
+
+async def try_recaptcha_checkbox(page: Page, attempt: CaptchaAttempt) -> Optional[bool]:
+    """
+    チェックボックスのクリックで通過を試みる（所要時間は attempt に記録する）。
+    通過したら True、画像チャレンジが表示されたら None（2Captchaが必要）、チャレンジも出ずに通過しなければ False
+    """
+    started = time.monotonic()
     # 1. まずチェックボックスをクリック（これだけで通過する場合がある）
     clicked = await click_recaptcha_checkbox(page)
     if not clicked:
         print_log("チェックボックスクリック失敗、2Captchaで解決を試みます...")
 
     # 2. チェックボックスクリックで通過したか確認
-    if await is_recaptcha_solved(page):
+    passed = await is_recaptcha_solved(page)
+    attempt.checkbox_seconds = time.monotonic() - started
+    if passed:
         print_log("reCAPTCHAチェックボックスクリックのみで通過しました！")
-        _last_recaptcha_status = 'チェックボックス通過'
         return True
 
     # 3. 画像チャレンジが実際に表示されているか確認
-    if not await is_challenge_visible(page):
-        print_log("画像チャレンジは表示されていません。少し待機して再確認...")
-        await human_delay(2000, 3000)
-        # 再度チェック：待機中に解決した可能性
-        if await is_recaptcha_solved(page):
-            print_log("待機後にreCAPTCHA通過を確認しました！")
-            _last_recaptcha_status = 'チェックボックス通過'
-            return True
-        # まだ解決せず、チャレンジも出ていない場合
+    started = time.monotonic()
+    try:
         if not await is_challenge_visible(page):
-            print_log("画像チャレンジが表示されていないため、チェックボックスを再クリック...")
-            await click_recaptcha_checkbox(page)
+            print_log("画像チャレンジは表示されていません。少し待機して再確認...")
+            await human_delay('recaptcha')
+            # 再度チェック：待機中に解決した可能性
             if await is_recaptcha_solved(page):
-                print_log("再クリックでreCAPTCHA通過しました！")
-                _last_recaptcha_status = 'チェックボックス通過'
+                print_log("待機後にreCAPTCHA通過を確認しました！")
                 return True
+            # まだ解決せず、チャレンジも出ていない場合
             if not await is_challenge_visible(page):
-                print_log("チャレンジが表示されません。reCAPTCHA解決失敗。")
-                _last_recaptcha_status = '解決失敗'
-                return False
+                print_log("画像チャレンジが表示されていないため、チェックボックスを再クリック...")
+                await click_recaptcha_checkbox(page)
+                if await is_recaptcha_solved(page):
+                    print_log("再クリックでreCAPTCHA通過しました！")
+                    return True
+                if not await is_challenge_visible(page):
+                    return False
+        return None
+    finally:
+        attempt.challenge_wait_seconds = time.monotonic() - started
+
+async def handle_recaptcha_if_present(page: Page, speculative: bool = False) -> CaptchaAttempt:
+    """
+    reCAPTCHAが検出された場合、チェックボックスクリック→必要なら2Captchaで解決し、結果と段階ごとの所要時間を返す。
+    speculative の場合はサイトキー検出時点で2Captchaへ解決リクエストを送り、チェックボックスと並行して進める
+    （先に通過した方を採用し、もう一方は取り消す）
+    """
+    attempt = CaptchaAttempt()
+    started = time.monotonic()
+    sitekey = await detect_recaptcha(page)
+    attempt.detect_seconds = time.monotonic() - started
+    if not sitekey:
+        return attempt
 
-    # 4. 画像チャレンジが表示されている → 2Captchaで解決
-    print_log("画像チャレンジが表示されています。2Captchaで解決中...")
-    page_url = page.url
-    solve_start = time.time()
+    print_log(f"reCAPTCHA検出！サイトキー: {sitekey[:16]}...")
 
-    token = await asyncio.get_event_loop().run_in_executor(
-        None, solve_recaptcha_2captcha, sitekey, page_url
-    )
+    solve_task = None
+    if speculative:
+        print_log("チェックボックスの通過率が低いため、2Captchaへの解決リクエストを先行して送信します")
+        captcha_history.stats['speculative'] += 1
+        attempt.speculative = True
+        solve_task = asyncio.create_task(captcha_solver.solve(sitekey, page.url))
 
-    solve_elapsed = int(time.time() - solve_start)
+    checkbox_task = asyncio.create_task(try_recaptcha_checkbox(page, attempt))
+    speculative_won = False
+    try:
+        await asyncio.wait({task for task in (checkbox_task, solve_task) if task}, return_when=asyncio.FIRST_COMPLETED)
+        if not checkbox_task.done() and finished_solve_result(solve_task).token:
+            # 2Captchaの方が先に解決した → チェックボックス側を打ち切る
+            print_log("2Captchaの先行解決がチェックボックスより先に完了しました")
+            speculative_won = True
+            checkbox_task.cancel()
+            await asyncio.gather(checkbox_task, return_exceptions=True)
+            passed = None
+        else:
+            passed = await checkbox_task
+    except BaseException:
+        for task in (checkbox_task, solve_task):
+            if task is not None and not task.done():
+                task.cancel()
+        raise
+
+    if passed:
+        if solve_task is not None:
+            solve_task.cancel()
+            await asyncio.gather(solve_task, return_exceptions=True)
+            print_log("チェックボックスで通過したため、先行した2Captchaのリクエストを取り消しました")
+        attempt.status = 'チェックボックス通過'
+        return attempt
+
+    if passed is False and solve_task is None:
+        print_log("チャレンジが表示されません。reCAPTCHA解決失敗。")
+        attempt.status = '解決失敗'
+        return attempt
 
-    if not token:
+    # 4. 画像チャレンジが表示されている → 2Captchaで解決
+    if solve_task is not None and solve_task.done() and not finished_solve_result(solve_task).token:
+        # 先行したリクエストが失敗・エラーで終わっている → 新しく解決リクエストを送る
+        print_log("先行した2Captchaのリクエストは失敗したため、改めて解決リクエストを送信します")
+        solve_task = None
+    print_log("画像チャレンジが表示されています。2Captchaで解決中...")
+    result = await solve_recaptcha_2captcha(page, sitekey, page.url, solve_task)
+    if result is None:
+        attempt.status = 'チェックボックス通過'
+        return attempt
+
+    attempt.solve_seconds = result.elapsed
+    attempt.solve_polls = result.polls
+    if not result.token:
         print_log("reCAPTCHA解決失敗")
-        _last_recaptcha_status = '解決失敗'
-        _last_captcha_solve_time = str(solve_elapsed)
-        return False
-
-    _last_captcha_solve_time = str(solve_elapsed)
+        attempt.status = '解決失敗'
+        return attempt
 
+    started = time.monotonic()
     # 5. トークン注入前にreCAPTCHAが時間切れしていないか確認
     if await is_recaptcha_expired(page):
         print_log("reCAPTCHAが時間切れのため、チェックボックスを再クリックしてリセット...")
         await click_recaptcha_checkbox(page)
-        await human_delay(500, 1000)
+        await human_delay('recaptcha_inject')
 
     # 6. トークンを注入
-    await inject_recaptcha_token(page, token)
+    await inject_recaptcha_token(page, result.token)
     print_log("reCAPTCHAトークン注入完了")
-    await human_delay(500, 1000)
-    _last_recaptcha_status = '2Captcha解決'
-    return True
+    await human_delay('recaptcha_inject')
+    attempt.inject_seconds = time.monotonic() - started
+    attempt.status = '2Captcha先行解決' if speculative_won else '2Captcha解決'
+    return attempt
 
 
 async def wait_for_element(page: Page, selector: str, timeout: int = 10000) -> Optional[ElementHandle]:
@@ -530,6 +726,46 @@ async def wait_for_element(page: Page, selector: str, timeout: int = 10000) -> O
         print_log(f"要素が見つかりません: {selector}")
         return None
 
+async def wait_for_first(page: Page, conditions: Dict[str, List[str]], timeout: int = 10000) -> Optional[str]:
+    """
+    conditions の中で最初に成立した状態の名前を返す（状態ごとに、表示されているべきセレクタのリストを指定）。
+    DOMの変化（MutationObserver）で判定するため、XHRで描画された時点ですぐに返る。どれも成立しなければ None
+    """
+    try:
+        return await page.evaluate('''([conditions, timeout]) => new Promise(resolve => {
+            const visible = (selector) => {
+                const el = document.querySelector(selector);
+                if (!el) return false;
+                const style = getComputedStyle(el);
+                return style.display !== 'none' && style.visibility !== 'hidden' && el.getClientRects().length > 0;
+            };
+            const check = () => {
+                for (const [name, selectors] of conditions) {
+                    if (selectors.every(visible)) return name;
+                }
+                return null;
+            };
+            const state = check();
+            if (state) return resolve(state);
+            let timer = null;
+            const observer = new MutationObserver(() => {
+                const state = check();
+                if (state) {
+                    observer.disconnect();
+                    clearTimeout(timer);
+                    resolve(state);
+                }
+            });
+            observer.observe(document.documentElement, {
+                childList: true, subtree: true, attributes: true, attributeFilter: ['class', 'style', 'hidden'],
+            });
+            timer = setTimeout(() => { observer.disconnect(); resolve(null); }, timeout);
+        })''', [list(conditions.items()), timeout])
+    except Exception as e:
+        # 待機中のページ遷移などで評価が中断された場合
+        print_log(f"表示待機中にエラー: {type(e).__name__}: {str(e)}")
+        return None
+
 async def close_modal_if_exists(page: Page) -> bool:
     """モーダルが存在すればJavaScriptで強制的に非表示にする（クリックによるチェーン発動を回避）"""
     try:
@@ -548,7 +784,7 @@ async def close_modal_if_exists(page: Page) -> bool:
         }''')
         if result > 0:
             print_log(f"モーダルを{result}件、JavaScriptで強制的に閉じました")
-            await human_delay(200, 400)
+            await human_delay('modal')
             return True
     except Exception as e:
         print_log(f"モーダル強制非表示エラー: {str(e)}")
@@ -653,7 +889,7 @@ async def extract_additional_info(modal: ElementHandle, page: Page) -> Dict[str,
         if button:
             await button.click()
             print_log("「選考へ進める」ボタンをクリックしました。")
-            await human_delay(200, 400)
+            await human_delay('modal')
             # モーダルの閉じるボタンがあれば閉じる
             await close_modal_if_exists(page)
         else:
@@ -690,7 +926,91 @@ async def get_job_location(page: Page) -> Dict[str, str]:
         }
     else:
         return {"都道府県": "不明", "エリア": "不明"}
-async def get_applicant_details(page: Page, modal: ElementHandle, row_element: ElementHandle, client_name: str, mail: str, context=None) -> Dict[str, str]:
+# 新着応募一覧の行
+APPLICANT_ROW_SELECTOR = 'tbody#js_applicantList tr[data-seq]'
+
+async def harvest_applicant_rows(page: Page) -> List[Dict[str, Any]]:
+    """新着応募一覧の全行の preview_url / work_id / apply_id を1回の evaluate で取得する"""
+    return await page.evaluate('''(rowSelector) => {
+        return Array.from(document.querySelectorAll(rowSelector)).map(row => {
+            const link = row.querySelector('td.data div.main > a[href^="https://en-gage.net/company/popup/job/"]');
+            const href = link ? link.getAttribute('href') : '';
+            const params = href ? new URL(href).searchParams : new URLSearchParams();
+            return {
+                seq: row.getAttribute('data-seq'),
+                preview_url: href,
+                work_id: params.get('work_id'),
+                apply_id: params.get('apply_id'),
+                has_profile_button: !!row.querySelector('a.md_btn.md_btn--matchingDetail.js_modalOpenEx'),
+            };
+        });
+    }''', APPLICANT_ROW_SELECTOR)
+
+async def find_applicant_row(page: Page, apply_id: str) -> Optional[ElementHandle]:
+    """apply_id が一致する一覧の行を返す。一覧から消えていれば None"""
+    handle = await page.evaluate_handle('''([rowSelector, applyId]) => {
+        for (const row of document.querySelectorAll(rowSelector)) {
+            const link = row.querySelector('td.data div.main > a[href^="https://en-gage.net/company/popup/job/"]');
+            if (link && new URL(link.getAttribute('href')).searchParams.get('apply_id') === applyId) return row;
+        }
+        return null;
+    }''', [APPLICANT_ROW_SELECTOR, apply_id])
+    return handle.as_element()
+
+def is_on_applicant_list(page: Page) -> bool:
+    return urlparse(page.url).path.rstrip('/') == '/company/manage'
+
+async def open_applicant_list(page: Page) -> None:
+    try:
+        await page.goto(MANAGE_URL, wait_until='domcontentloaded', timeout=30000)
+    except PlaywrightTimeoutError:
+        print_log("ページ遷移タイムアウト（続行します）")
+    await human_delay('navigation')
+
+async def iter_new_applicants(page: Page, label: str):
+    """
+    新着応募一覧を1回の evaluate で読み取り、未処理の行を (行要素, 行情報) として順に返す。
+    行ごとに管理画面を開き直さず、次の行が一覧から消えていた場合だけ読み取り直す。
+    読み取った行を処理し終えたら一度だけ再読み込みして、処理中に届いた新着を確認する。
+    """
+    seen = set()
+    reloaded = False
+    while True:
+        if not is_on_applicant_list(page):
+            await open_applicant_list(page)
+
+        # 一覧の行と「新着の応募はありません」のどちらが先に表示されるかで判定する
+        state = await wait_for_first(page, {'rows': [APPLICANT_ROW_SELECTOR], 'empty': ['#js_applicantNoData']}, timeout=5000)
+        if state == 'empty':
+            print_log(f"{label}: 新着の応募はありません。")
+            return
+        if state is None:
+            print_log(f"{label}: 新規データがありません。")
+            return
+
+        rows = [row for row in await harvest_applicant_rows(page) if row['apply_id'] and row['apply_id'] not in seen]
+        if not rows:
+            if reloaded:
+                print_log(f"{label}: 新着応募をすべて処理しました。")
+                return
+            await open_applicant_list(page)
+            reloaded = True
+            continue
+        reloaded = False
+        print_log(f"{label}: 新着応募を{len(rows)}件読み取りました")
+
+        for row in rows:
+            if not is_on_applicant_list(page):
+                break
+            row_element = await find_applicant_row(page, row['apply_id'])
+            if row_element is None:
+                # 一覧が変わったので読み取り直す
+                break
+            seen.add(row['apply_id'])
+            yield row_element, row
+
+async def get_applicant_details(page: Page, modal: ElementHandle, row_element: ElementHandle, client_name: str, mail: str, context=None,
+                                processing_page: Optional['ProcessingPage'] = None) -> Dict[str, str]:
     """応募者の詳細情報を取得する"""
     details = {}
 
@@ -711,20 +1031,39 @@ async def get_applicant_details(page: Page, modal: ElementHandle, row_element: E
     details.update(await extract_applicant_info(modal, page))
     print_log(f"応募者情報抽出完了: {details.get('名前', '不明')}")
 
-    print_log("求人ページから勤務地情報を取得中...")
-    job_page = await context.new_page() if context else await page.context.new_page()
-    try:
-        await job_page.goto(details['求人URL'], wait_until='domcontentloaded', timeout=15000)
-        details.update(await get_job_location(job_page))
-    except Exception as e:
-        print_log(f"求人ページ取得エラー: {str(e)}")
-        details.update({"都道府県": "情報なし", "エリア": "情報なし"})
-    finally:
-        await job_page.close()
-    print_log("勤務地情報取得完了")
+    with metrics.span('job_location'):
+        location = job_location_cache.get(details['work_id']) if details['work_id'] else None
+        if location:
+            print_log(f"勤務地情報をキャッシュから取得しました: {location.get('都道府県')}")
+            details.update(location)
+        else:
+            print_log("求人ページから勤務地情報を取得中...")
+            job_page = await context.new_page() if context else await page.context.new_page()
+            try:
+                await job_page.goto(details['求人URL'], wait_until='domcontentloaded', timeout=15000)
+                location = await get_job_location(job_page)
+                details.update(location)
+                # 取得できなかった結果（情報なし）はキャッシュしない
+                if details['work_id'] and location.get("都道府県") != "情報なし":
+                    job_location_cache.put(details['work_id'], location)
+            except Exception as e:
+                print_log(f"求人ページ取得エラー: {str(e)}")
+                details.update({"都道府県": "情報なし", "エリア": "情報なし"})
+            finally:
+                await job_page.close()
+            print_log("勤務地情報取得完了")
 
     print_log("選考中ページから連絡先情報を取得中...")
-    applicant_info = await get_applicant_info(page, details['応募者ID'])
+    # 新着一覧のページを離れないよう、選考中ページは別タブで開く（アカウント内で使い回す）
+    with metrics.span('contact'):
+        if processing_page is None:
+            processing_page = ProcessingPage(context or page.context)
+            try:
+                applicant_info = await get_applicant_info(processing_page, details['応募者ID'])
+            finally:
+                await processing_page.close()
+        else:
+            applicant_info = await get_applicant_info(processing_page, details['応募者ID'])
     if applicant_info:
         details.update(applicant_info)
         print_log(f"連絡先取得完了: 電話={applicant_info.get('電話番号', 'なし')}, メール={applicant_info.get('メールアドレス', 'なし')}")
@@ -738,54 +1077,62 @@ async def get_applicant_details(page: Page, modal: ElementHandle, row_element: E
     print_log("応募者詳細取得完了")
     return details
 
-async def login_to_website(page: Page, user: User) -> bool:
-    """ウェブサイトにログインする（自動ログイン方式）"""
-    LOGIN_URL = "https://en-gage.net/company_login/login/"
-    MANAGE_URL = "https://en-gage.net/company/manage/"
+LOGIN_URL = "https://en-gage.net/company_login/login/"
+MANAGE_URL = "https://en-gage.net/company/manage/"
 
+async def login_to_website(page: Page, user: User) -> LoginOutcome:
+    """ウェブサイトにログインする（自動ログイン方式）。成否とreCAPTCHA対応の結果を返す"""
+    outcome = LoginOutcome()
     # 1. ログインページに遷移
     await page.goto(LOGIN_URL, wait_until='domcontentloaded')
     print_log(f'{user.client_name} のログイン処理を開始...')
-    await human_delay(800, 1500)
+    await human_delay('login')
 
     # 2. 前回のセッションが残っている場合（ログインページではなく管理画面等にリダイレクトされた）
     if '/company_login/login' not in page.url:
         print_log(f'前回のセッションが残っています（{page.url}）。ログアウトします...')
         await page.goto('https://en-gage.net/company_login/auth/logout/', wait_until='domcontentloaded')
-        await human_delay(500, 1000)
+        await human_delay('logout_redirect')
         # ログアウト後、ログインページに遷移
         if '/company_login/login' not in page.url:
             await page.goto(LOGIN_URL, wait_until='domcontentloaded')
-            await human_delay(800, 1500)
+            await human_delay('login')
 
     # 3. ID・パスワードを自動入力
     await page.fill('input[name="loginID"]', user.user_id)
-    await human_delay(300, 600)
+    await human_delay('form_input')
     await page.fill('input[name="password"]', user.password)
-    await human_delay(500, 1000)
+    await human_delay('form_input_done')
 
     # 4. ログインボタンをクリックしてページ遷移を待機
     try:
         async with page.expect_navigation(wait_until='domcontentloaded', timeout=30000):
             await page.click('#login-button')
         print_log(f'{user.client_name} のログインボタンをクリックしました')
-        await human_delay(1000, 2000)
+        await human_delay('login_submit')
     except PlaywrightTimeoutError:
         print_log("ログインボタンクリック後のページ遷移タイムアウト")
-        return False
+        return outcome
+
+    if '/company_login/login' not in page.url:
+        # reCAPTCHAなしで通過（出現率の集計用に記録する）
+        captcha_history.record(user.client_name, 'なし')
 
     # 5. ログイン後もまだログインページにいる場合 → reCAPTCHAが出ている可能性
     if '/company_login/login' in page.url:
         print_log("ログイン後もログインページのまま。reCAPTCHAを確認...")
-        recaptcha_solved = await handle_recaptcha_if_present(page)
-        if recaptcha_solved:
+        outcome.captcha = await handle_recaptcha_if_present(
+            page, speculative=captcha_history.should_speculate(user.client_name))
+        print_log(f"reCAPTCHA処理時間: {outcome.captcha.format_timings()}")
+        captcha_history.record(user.client_name, outcome.captcha.status, outcome.captcha.solve_seconds)
+        if outcome.captcha.passed:
             # ID/パスワードが消えている場合は再入力
             login_id_value = await page.input_value('input[name="loginID"]')
             if not login_id_value:
                 await page.fill('input[name="loginID"]', user.user_id)
-                await human_delay(300, 600)
+                await human_delay('form_input')
                 await page.fill('input[name="password"]', user.password)
-                await human_delay(500, 1000)
+                await human_delay('form_input_done')
 
             # フォーム直接送信（JSバリデーションをバイパス）
             print_log("reCAPTCHA解決後、フォームを直接送信します...")
@@ -799,7 +1146,7 @@ async def login_to_website(page: Page, user: User) -> bool:
                 await page.wait_for_load_state('domcontentloaded', timeout=15000)
             except PlaywrightTimeoutError:
                 pass
-            await human_delay(1000, 2000)
+            await human_delay('login_submit')
 
             # まだログインページの場合、ボタンクリックも試す
             if '/company_login/login' in page.url:
@@ -813,19 +1160,19 @@ async def login_to_website(page: Page, user: User) -> bool:
 
             if '/company_login/login' in page.url:
                 print_log("reCAPTCHA解決後のログイン再送信に失敗")
-                return False
+                return outcome
 
             print_log("reCAPTCHA解決後のログイン成功")
         else:
             print_log("reCAPTCHAなし、またはreCAPTCHA解決失敗。ログイン失敗。")
-            return False
+            return outcome
 
     # 6. 管理画面に遷移（まだの場合）
     if '/company/manage/' not in page.url and '/company_login/login' not in page.url:
         await page.goto(MANAGE_URL, wait_until='domcontentloaded')
     elif '/company_login/login' in page.url:
         print_log("ログイン失敗（reCAPTCHA未解決またはID/パスワード不正）")
-        return False
+        return outcome
     print_log(f'管理画面に遷移完了: {page.url}')
 
     # モーダルを閉じる
@@ -833,12 +1180,14 @@ async def login_to_website(page: Page, user: User) -> bool:
 
     # ポップアップ等を閉じるためのクリック
     await page.click('body', position={'x': 0, 'y': 0})
-    await human_delay(200, 300)
+    await human_delay('login_popup')
     await close_modal_if_exists(page)
 
-    return True
+    outcome.success = True
+    return outcome
 
-async def process_single_row(page: Page, row_element: ElementHandle, client_name: str, mail: str, context=None) -> Optional[Dict[str, str]]:
+async def process_single_row(page: Page, row_element: ElementHandle, client_name: str, mail: str, context=None,
+                             processing_page: Optional['ProcessingPage'] = None) -> Optional[Dict[str, str]]:
     """1行のデータを処理する"""
     # 処理開始前にモーダルを閉じる
     await close_modal_if_exists(page)
@@ -848,101 +1197,550 @@ async def process_single_row(page: Page, row_element: ElementHandle, client_name
         print_log("プロフィール確認ボタンが見つかりません")
         return None
 
-    # プロフィールボタンクリック（モーダル遮断時はforce=Trueでリトライ）
-    try:
-        await profile_button.click(timeout=10000)
-    except PlaywrightTimeoutError:
-        print_log("プロフィールボタンクリックがモーダルに遮断されました。強制クリックを試みます...")
-        await close_modal_if_exists(page)
+    with metrics.span('modal'):
+        # プロフィールボタンクリック（モーダル遮断時はforce=Trueでリトライ）
         try:
-            await profile_button.click(force=True, timeout=10000)
-        except Exception as e:
-            print_log(f"強制クリックも失敗: {str(e)}")
+            await profile_button.click(timeout=10000)
+        except PlaywrightTimeoutError:
+            print_log("プロフィールボタンクリックがモーダルに遮断されました。強制クリックを試みます...")
             await close_modal_if_exists(page)
-            return None
+            try:
+                await profile_button.click(force=True, timeout=10000)
+            except Exception as e:
+                print_log(f"強制クリックも失敗: {str(e)}")
+                await close_modal_if_exists(page)
+                return None
 
-    modal = await wait_for_element(page, '.base#js_applicantDetail')
+        # モーダルの表示と、応募者情報（名前）の描画が済むまで待つ
+        ready = await wait_for_first(page, {'ready': ['.base#js_applicantDetail', '.base#js_applicantDetail div.account em']})
+        modal = await page.query_selector('.base#js_applicantDetail') if ready else None
     if not modal:
         print_log("モーダルウィンドウが表示されませんでした")
         await close_modal_if_exists(page)
         return None
 
-    result = await get_applicant_details(page, modal, row_element, client_name, mail, context)
+    result = await get_applicant_details(page, modal, row_element, client_name, mail, context, processing_page)
     await close_modal_if_exists(page)
     return result
-async def get_applicant_info(page, target_apply_id):
-    try:
-        await page.goto("https://en-gage.net/company/manage/processing/", wait_until='domcontentloaded', timeout=30000)
-    except PlaywrightTimeoutError:
-        print_log("選考中ページへの遷移タイムアウト（続行します）")
-    await human_delay(300, 500)
+PROCESSING_URL = "https://en-gage.net/company/manage/processing/"
+# 選考中ページの一覧を何ページ目まで辿るか
+MAX_PROCESSING_PAGES = int(os.getenv("MAX_PROCESSING_PAGES", "20"))
+# 連絡先の取得方法: request（プロフィールのHTMLを直接取得し、失敗時はクリック） / click（常にドロワーをクリック）
+APPLICANT_FETCH_MODE = os.getenv("APPLICANT_FETCH_MODE", "request")
+# プロフィール（ドロワー）の取得URL。{apply_id} を含めて指定すると選考中ページを開かずに取得する
+# 未設定の場合は選考中ページのプロフィールボタンの data-url / href を使う
+PROFILE_URL_TEMPLATE = os.getenv("ENGAGE_PROFILE_URL_TEMPLATE", "")
+
+class ProcessingPage:
+    """
+    選考中ページを別タブで1アカウントにつき1つだけ開き、apply_id → (ページURL, data-seq) の索引で行を探す。
+    索引は1ページ分を1回の evaluate で作り、探している apply_id がない場合だけ先頭ページから読み直す
+    （「次へ」のリンクを辿り、見つかった時点で止める）。
+    """
+
+    def __init__(self, context):
+        self.context = context
+        self.page: Optional[Page] = None
+        self.index: Dict[str, tuple] = {}
+        self.stats = {'lookups': 0, 'hits': 0, 'page_loads': 0, 'fetched': 0, 'fallbacks': 0}
+
+    async def _goto(self, url: str) -> None:
+        if self.page is None:
+            self.page = await self.context.new_page()
+        try:
+            await self.page.goto(url, wait_until='domcontentloaded', timeout=30000)
+        except PlaywrightTimeoutError:
+            print_log("選考中ページへの遷移タイムアウト（続行します）")
+        self.stats['page_loads'] += 1
+        await human_delay('processing_page')
+
+    async def _index_current_page(self) -> Optional[str]:
+        """表示中のページの行を索引に追加し、次のページのURLを返す"""
+        result = await self.page.evaluate('''() => {
+            const rows = {};
+            const profileUrl = (button) => {
+                if (!button) return null;
+                const url = button.dataset.url || button.dataset.href || button.dataset.ajax_url;
+                if (url) return new URL(url, location.href).href;
+                const href = button.getAttribute('href');
+                if (href && !href.startsWith('#') && !href.startsWith('javascript:')) return button.href;
+                return null;
+            };
+            document.querySelectorAll('tr[data-seq]').forEach(row => {
+                const link = row.querySelector('td.data a[href^="https://en-gage.net/company/popup/job/"]');
+                if (!link) return;
+                const applyId = new URL(link.getAttribute('href')).searchParams.get('apply_id');
+                if (applyId) rows[applyId] = [row.getAttribute('data-seq'), profileUrl(row.querySelector('a.js_drawerProfileOpen'))];
+            });
+            const next = document.querySelector('a[rel="next"], .md_pager .next a, .md_pager__next a, li.next a');
+            return {rows: rows, next: next ? next.href : null};
+        }''')
+        url = self.page.url
+        for apply_id, (seq, profile_url) in result['rows'].items():
+            self.index[apply_id] = (url, seq, profile_url)
+        return result['next']
+
+    async def _refresh(self, apply_id: str) -> None:
+        """先頭ページから読み直し、apply_id が見つかるまで次のページを辿る"""
+        self.index.clear()
+        url = PROCESSING_URL
+        for _ in range(MAX_PROCESSING_PAGES):
+            await self._goto(url)
+            url = await self._index_current_page()
+            if apply_id in self.index or not url:
+                return
+
+    async def _row_on_page(self, apply_id: str) -> Optional[ElementHandle]:
+        handle = await self.page.evaluate_handle('''(applyId) => {
+            for (const row of document.querySelectorAll('tr[data-seq]')) {
+                const link = row.querySelector('td.data a[href^="https://en-gage.net/company/popup/job/"]');
+                if (link && new URL(link.getAttribute('href')).searchParams.get('apply_id') === applyId) return row;
+            }
+            return null;
+        }''', apply_id)
+        return handle.as_element()
+
+    async def find_row(self, apply_id: str) -> Optional[ElementHandle]:
+        self.stats['lookups'] += 1
+        if apply_id in self.index:
+            self.stats['hits'] += 1
+        else:
+            await self._refresh(apply_id)
+        entry = self.index.get(apply_id)
+        if entry is None:
+            return None
 
-    details = {}
-    for seq in range(1, 101):  # max_attempts = 100
-        row = await page.query_selector(f'tr[data-seq="{seq}"]')
-        if not row:
-            break
+        url = entry[0]
+        if self.page.url != url:
+            await self._goto(url)
+        row = await self._row_on_page(apply_id)
+        if row is None:
+            # 一覧がずれていた場合は読み直す
+            await self._refresh(apply_id)
+            row = await self._row_on_page(apply_id) if apply_id in self.index else None
+        return row
+
+    async def profile_url(self, apply_id: str) -> Optional[str]:
+        """プロフィール（ドロワー）の取得URLを返す。分からない場合は None"""
+        if PROFILE_URL_TEMPLATE:
+            return PROFILE_URL_TEMPLATE.format(apply_id=apply_id)
+        if apply_id not in self.index:
+            await self._refresh(apply_id)
+        entry = self.index.get(apply_id)
+        return entry[2] if entry else None
+
+    async def close(self) -> None:
+        if self.page is not None:
+            try:
+                await self.page.close()
+            except Exception:
+                pass
+            self.page = None
 
-        link = await row.query_selector('td.data a[href^="https://en-gage.net/company/popup/job/"]')
-        if not link:
-            continue
+# ドロワーの「ラベル → 値」のうち取得する項目
+PROFILE_FIELDS = {'電話番号': '電話番号', 'メールアドレス': 'メールアドレス', '現住所': '_住所_raw'}
 
-        href = await link.get_attribute('href')
-        apply_id_match = re.search(r'apply_id=([^&]+)', href)
-        if not apply_id_match or apply_id_match.group(1) != target_apply_id:
-            continue
+class ProfileDataParser(HTMLParser):
+    """プロフィール（ドロワー）のHTMLから .md_list--data li.row の .label / .data を読み取る"""
 
-        profile_button = await row.query_selector('a.js_drawerProfileOpen')
-        if not profile_button:
-            continue
+    def __init__(self):
+        super().__init__()
+        self.fields: Dict[str, str] = {}
+        self._stack: List[str] = []  # 開いているタグごとの役割（label / data / ''）
+        self._label = None
+        self._texts = {'label': [], 'data': []}
 
-        await profile_button.click()
-        modal = await wait_for_element(page, '.base#js_showApplyData', timeout=10000)
-        if not modal:
-            continue
+    def handle_starttag(self, tag, attrs):
+        if tag in ('br', 'img', 'input', 'hr', 'meta', 'link'):
+            if tag == 'br' and 'data' in self._stack:
+                self._texts['data'].append('\n')
+            return
+        classes = (dict(attrs).get('class') or '').split()
+        role = ''
+        if tag == 'li' and 'row' in classes:
+            role = 'row'
+            self._texts = {'label': [], 'data': []}
+        elif 'label' in classes:
+            role = 'label'
+        elif 'data' in classes:
+            role = 'data'
+        self._stack.append(role)
+
+    def handle_endtag(self, tag):
+        if tag in ('br', 'img', 'input', 'hr', 'meta', 'link') or not self._stack:
+            return
+        role = self._stack.pop()
+        if role == 'row':
+            label = ''.join(self._texts['label']).strip()
+            if label and label not in self.fields:
+                self.fields[label] = ''.join(self._texts['data']).strip()
+
+    def handle_data(self, data):
+        for role in ('label', 'data'):
+            if role in self._stack:
+                self._texts[role].append(data)
+                return
+
+def parse_profile_html(html: str) -> Dict[str, str]:
+    """プロフィールのHTMLから電話番号・メールアドレス・現住所を取り出す"""
+    parser = ProfileDataParser()
+    parser.feed(html)
+    return {key: parser.fields[label] for label, key in PROFILE_FIELDS.items() if parser.fields.get(label)}
+
+def normalize_contact_details(details: Dict[str, str]) -> Dict[str, str]:
+    """現住所から郵便番号を抽出し XXX-XXXX 形式に統一（〒6408301 / 〒640-8301 両対応）"""
+    raw_address = details.pop('_住所_raw', '')
+    if raw_address:
+        postal_match = re.search(r'〒\s*(\d{3})-?(\d{4})', raw_address)
+        if postal_match:
+            details['郵便番号'] = f"{postal_match.group(1)}-{postal_match.group(2)}"
+    return details
 
-        await page.wait_for_selector('.tabContent--profile', state='visible', timeout=10000)
+async def fetch_applicant_info(context, url: str) -> Dict[str, str]:
+    """ログイン済みコンテキストのCookieでプロフィールを直接取得する（画面の描画・クリックなし）"""
+    response = await context.request.get(url, headers={'X-Requested-With': 'XMLHttpRequest'}, timeout=15000)
+    if not response.ok:
+        print_log(f"プロフィール取得エラー: HTTP {response.status}")
+        return {}
+    body = await response.text()
+    # JSONでHTML断片を返すエンドポイントにも対応
+    if body.lstrip().startswith('{'):
+        try:
+            payload = json.loads(body)
+            body = payload.get('html') or payload.get('data', {}).get('html', '') if isinstance(payload, dict) else ''
+        except (json.JSONDecodeError, AttributeError):
+            pass
+    return normalize_contact_details(parse_profile_html(body))
 
-        selectors = [
-            ('.md_list--data li.row:has(.label:text-is("電話番号")) .data', '電話番号'),
-            ('.md_list--data li.row:has(.label:text-is("メールアドレス")) .data', 'メールアドレス'),
-            ('.md_list--data li.row:has(.label:text-is("現住所")) .data', '_住所_raw'),
-        ]
+async def get_applicant_info(processing_page: ProcessingPage, target_apply_id):
+    """選考中ページのプロフィール（ドロワー）から電話番号・メールアドレス・郵便番号を取得する"""
+    if APPLICANT_FETCH_MODE == 'request':
+        try:
+            url = await processing_page.profile_url(target_apply_id)
+            if url:
+                details = await fetch_applicant_info(processing_page.context, url)
+                if details.get('電話番号') or details.get('メールアドレス'):
+                    processing_page.stats['fetched'] += 1
+                    return details
+        except Exception as e:
+            print_log(f"プロフィールの直接取得に失敗しました: {type(e).__name__}: {str(e)}")
+        processing_page.stats['fallbacks'] += 1
+        print_log("プロフィールを直接取得できなかったため、ドロワーを開いて取得します")
 
-        for selector, key in selectors:
-            element = await modal.query_selector(selector)
-            if element:
-                details[key] = (await element.inner_text()).strip()
-
-        # 郵便番号を抽出し XXX-XXXX 形式に統一（〒6408301 / 〒640-8301 両対応）
-        raw_address = details.pop('_住所_raw', '')
-        if raw_address:
-            postal_match = re.search(r'〒\s*(\d{3})-?(\d{4})', raw_address)
-            if postal_match:
-                details['郵便番号'] = f"{postal_match.group(1)}-{postal_match.group(2)}"
-
-        close_button = await modal.query_selector('.md_modal__close')
-        if close_button:
-            await close_button.click()
-        # 追加の閉じるボタンもチェック
-        await close_modal_if_exists(page)
+    details = {}
+    row = await processing_page.find_row(target_apply_id)
+    if not row:
+        return details
 
+    profile_button = await row.query_selector('a.js_drawerProfileOpen')
+    if not profile_button:
         return details
 
+    page = processing_page.page
+    await profile_button.click()
+    # ドロワーの表示と、プロフィールタブの描画が済むまで待つ
+    ready = await wait_for_first(page, {'ready': ['.base#js_showApplyData', '.tabContent--profile']})
+    modal = await page.query_selector('.base#js_showApplyData') if ready else None
+    if not modal:
+        return details
+
+    selectors = [
+        (f'.md_list--data li.row:has(.label:text-is("{label}")) .data', key)
+        for label, key in PROFILE_FIELDS.items()
+    ]
+
+    for selector, key in selectors:
+        element = await modal.query_selector(selector)
+        if element:
+            details[key] = (await element.inner_text()).strip()
+
+    normalize_contact_details(details)
+
+    close_button = await modal.query_selector('.md_modal__close')
+    if close_button:
+        await close_button.click()
+    # 追加の閉じるボタンもチェック
+    await close_modal_if_exists(page)
     return details
 
+async def scrape_account(page: Page, context, account: User, notification_manager: NotificationManager,
+                         duplicate_index: DuplicateIndex, all_data: List[Dict[str, str]]) -> Tuple[bool, ExecutionRecord]:
+    """
+    1アカウント分の処理（ログイン→新着応募の転記→ログアウト）を行い、実行履歴を記録する。
+    (ログアウトに成功したか, 実行履歴) を返す（ログアウト失敗時は呼び出し側でブラウザ/コンテキストを作り直す）
+    """
+    # 実行履歴の記録を開始
+    client_start = time.time()
+    record = ExecutionRecord(
+        start_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        client_name=account.client_name,
+    )
+    written_count = 0
+    duplicate_count = 0
+    new_applicants = 0
+    peak_rss_mb = memory_governor.sample()
+
+    if SESSION_REUSE and await restore_session(page, context, account):
+        record.session_reused = '再利用'
+    else:
+        with metrics.span('login'):
+            login = await login_to_website(page, account)
+        record.set_captcha(login.captcha)
+        if not login.success:
+            print_log(f"{account.client_name}のログインに失敗しました。次のアカウントに進みます。")
+            record.login_result = '失敗'
+            record.processing_time = f"{time.time() - client_start:.1f}"
+            record.peak_rss_mb = f"{max(peak_rss_mb, memory_governor.sample()):.0f}"
+            await asyncio.to_thread(write_execution_log, record)
+            return True, record
+        if SESSION_REUSE:
+            await save_session(context, account)
+
+    record.login_result = '成功'
+    print_log(f"{account.client_name}のログインに成功しました。")
+    await human_delay('navigation')
+
+    consecutive_failures = 0
+    MAX_CONSECUTIVE_FAILURES = 3
+
+    # 選考中ページ（連絡先の取得用）はアカウント内で1つのタブを使い回す
+    processing_page = ProcessingPage(context)
+    async for row_element, _ in iter_new_applicants(page, account.client_name):
+        print_log(f"{account.client_name}の新規データを処理中")
+        new_applicants += 1
+
+        try:
+            data = await process_single_row(page, row_element, account.client_name, account.user_id, context, processing_page)
+            if data:
+                consecutive_failures = 0
+                all_data.append(data)
+
+                email = data.get('メールアドレス', '')
+                job_url = data.get('求人URL', '')
+
+                # 重複チェック: 同一メールアドレス AND 同一求人URLの場合は弾く
+                with metrics.span('sheets_duplicate_check'):
+                    is_duplicate = await duplicate_index.contains_async(email, job_url)
+                if not is_duplicate:
+                    # 通知送信（エラーでも処理を継続）
+                    try:
+                        with metrics.span('notification'):
+                            await send_notification(notification_manager, account.user_id, data)
+                    except Exception as notify_err:
+                        print_log(f"通知送信エラー（処理は継続）: {type(notify_err).__name__}: {str(notify_err)}")
+                    # 永続キューに書き込み（シートへはバックグラウンドでまとめて書き込む）
+                    with metrics.span('sheets_write'):
+                        write_to_spreadsheet(data)
+                    duplicate_index.add(email, job_url)
+                    written_count += 1
+                else:
+                    print_log(f"重複応募のため、スキップされました: {email} / {job_url}")
+                    duplicate_count += 1
+            else:
+                consecutive_failures += 1
+                print_log(f"{account.client_name}のデータはスキップされました（連続失敗: {consecutive_failures}/{MAX_CONSECUTIVE_FAILURES}）")
+                if consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+                    print_log(f"{account.client_name}: 連続{MAX_CONSECUTIVE_FAILURES}回失敗のため、次のアカウントへ進みます")
+                    record.error_message = f"連続{MAX_CONSECUTIVE_FAILURES}回データ取得失敗"
+                    break
+        except PlaywrightTimeoutError as e:
+            consecutive_failures += 1
+            print_log(f"{account.client_name}のデータ処理中にタイムアウトが発生しました（連続失敗: {consecutive_failures}/{MAX_CONSECUTIVE_FAILURES}）: {str(e)}")
+            record.error_message = f"タイムアウト: {str(e)}"
+            if consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+                print_log(f"{account.client_name}: 連続{MAX_CONSECUTIVE_FAILURES}回失敗のため、次のアカウントへ進みます")
+                break
+        except Exception as e:
+            consecutive_failures += 1
+            import traceback
+            print_log(f"{account.client_name}のデータ処理中にエラーが発生しました（連続失敗: {consecutive_failures}/{MAX_CONSECUTIVE_FAILURES}）: {type(e).__name__}: {str(e)}")
+            traceback.print_exc()
+            record.error_message = f"{type(e).__name__}: {str(e)}"
+            if consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+                print_log(f"{account.client_name}: 連続{MAX_CONSECUTIVE_FAILURES}回失敗のため、次のアカウントへ進みます")
+                break
+
+        # 一覧は開き直さず次の行へ（一覧が変わった場合は iter_new_applicants が読み取り直す）
+        await close_modal_if_exists(page)
+        peak_rss_mb = max(peak_rss_mb, memory_governor.sample())
+        await human_delay('between_applicants')
+
+    await processing_page.close()
+    print_log(f"選考中ページ: 照会{processing_page.stats['lookups']}件, 索引ヒット{processing_page.stats['hits']}件, ページ読み込み{processing_page.stats['page_loads']}回, 直接取得{processing_page.stats['fetched']}件, クリック取得{processing_page.stats['fallbacks']}件")
+
+    # ログアウト処理（セッション再利用時はログアウトせずにセッションを保存し、Cookieだけ消す）
+    logout_success = False
+    try:
+        if SESSION_REUSE:
+            await park_session(context, account)
+        else:
+            await logout(page)
+        logout_success = True
+    except PlaywrightTimeoutError:
+        print_log(f"{account.client_name}のログアウトがタイムアウトしました")
+    except Exception as e:
+        print_log(f"{account.client_name}のログアウト中にエラー: {str(e)}")
+
+    # 実行履歴を記録
+    record.new_applicants = new_applicants
+    record.written_count = written_count
+    record.duplicate_count = duplicate_count
+    record.processing_time = f"{time.time() - client_start:.1f}"
+    record.peak_rss_mb = f"{max(peak_rss_mb, memory_governor.sample()):.0f}"
+    await asyncio.to_thread(write_execution_log, record)
+    captcha_history.record_run(account.client_name,
+                               time.time() - client_start - float(record.captcha_solve_time or 0))
+
+    print_log(f"{account.client_name}の対応が完了しました。（待機時間: {delay_policy.account_seconds(account.client_name):.1f}秒）")
+    return logout_success, record
+
+BROWSER_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+]
+
+
+async def new_stealth_page(context):
+    page = context.pages[0] if context.pages else await context.new_page()
+    stealth = Stealth()
+    await stealth.apply_stealth_async(page)
+    return page
+
+
+async def run_accounts_sequential(playwright, profile_dir: str, accounts: List[User], **kwargs) -> None:
+    """永続プロファイルの Chrome 1つでアカウントを順番に処理する（既定の動作）"""
+    context = None
+    page = None
+    applicants_since_launch = 0
+    try:
+        for account in accounts:
+            # ブラウザが未起動または再起動が必要な場合
+            if context is None:
+                applicants_since_launch = 0
+                print_log("ブラウザを起動中...")
+                context = await playwright.chromium.launch_persistent_context(
+                    profile_dir,
+                    headless=False,
+                    channel="chrome",
+                    locale='ja-JP',
+                    timezone_id='Asia/Tokyo',
+                    args=BROWSER_ARGS,
+                )
+                await resource_blocker.attach(context)
+                page = await new_stealth_page(context)
+
+            with delay_policy.account(account.client_name):
+                logout_success, record = await scrape_account(page, context, account, **kwargs)
+            applicants_since_launch += record.new_applicants
+            recycle_reason = memory_governor.recycle_reason(applicants_since_launch) if logout_success else None
+            if not logout_success:
+                # ログアウト失敗時はブラウザを再起動
+                print_log("ブラウザを再起動します...")
+            elif recycle_reason:
+                # メモリ上限・処理件数に達した場合も、タブ・キャッシュを解放するため再起動
+                print_log(f"ブラウザを再起動します（{recycle_reason}）")
+                memory_governor.recycles += 1
+            if not logout_success or recycle_reason:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+                context = None
+                page = None
+    finally:
+        if context:
+            await context.close()
+
+
+async def run_accounts_concurrent(playwright, accounts: List[User], concurrency: int, **kwargs) -> None:
+    """
+    Chromium 1つの中に Cookie・ストレージが独立したコンテキストを concurrency 個作り、
+    キューからアカウントを取り出して並列に処理する
+    """
+    browser = await playwright.chromium.launch(headless=False, channel="chrome", args=BROWSER_ARGS)
+    queue: asyncio.Queue = asyncio.Queue()
+    for account in accounts:
+        queue.put_nowait(account)
+
+    async def worker(worker_id: int) -> None:
+        context = None
+        page = None
+        applicants_since_launch = 0
+        try:
+            while True:
+                try:
+                    account = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                if context is None:
+                    print_log(f"[worker {worker_id}] ブラウザコンテキストを作成中...")
+                    context = await browser.new_context(locale='ja-JP', timezone_id='Asia/Tokyo')
+                    applicants_since_launch = 0
+                    await resource_blocker.attach(context)
+                    page = await new_stealth_page(context)
+                print_log(f"[worker {worker_id}] {account.client_name} の処理を開始します")
+                recycle_reason = None
+                account_start = time.time()
+                started_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                try:
+                    with delay_policy.account(account.client_name):
+                        logout_success, record = await scrape_account(page, context, account, **kwargs)
+                    applicants_since_launch += record.new_applicants
+                    recycle_reason = memory_governor.recycle_reason(applicants_since_launch)
+                except Exception as e:
+                    # 1アカウントの想定外エラーで他のアカウントを止めない（失敗として実行履歴に残す）
+                    print_log(f"[worker {worker_id}] {account.client_name} の処理中にエラー: {type(e).__name__}: {str(e)}")
+                    logout_success = False
+                    record = ExecutionRecord(
+                        start_time=started_at,
+                        client_name=account.client_name,
+                        error_message=f"{type(e).__name__}: {str(e)}",
+                        processing_time=f"{time.time() - account_start:.1f}",
+                    )
+                    await asyncio.to_thread(write_execution_log, record)
+                if not logout_success or recycle_reason:
+                    # ログアウト失敗時はコンテキストを作り直す（Cookieを次のアカウントに持ち越さない）
+                    # メモリ上限・処理件数に達した場合も、タブ・キャッシュを解放するため作り直す
+                    if recycle_reason:
+                        print_log(f"[worker {worker_id}] ブラウザコンテキストを作り直します（{recycle_reason}）")
+                        memory_governor.recycles += 1
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass
+                    context = None
+                    page = None
+        finally:
+            if context:
+                await context.close()
+
+    try:
+        await asyncio.gather(*(worker(i + 1) for i in range(min(concurrency, len(accounts)))))
+    finally:
+        await browser.close()
+
+
 async def run_scraper(playwright) -> List[Dict[str, str]]:
     """スクレイピングを実行する"""
     notification_manager = NotificationManager(config)
 
-    active_accounts = get_active_accounts()
+    active_accounts = await asyncio.to_thread(get_active_accounts)
     if not active_accounts:
         print_log("有効なアカウントが見つかりませんでした。")
         return []
 
+    # 前回実行でシートに書き込めなかった実行履歴を再送
+    await asyncio.to_thread(flush_execution_log)
+
+    # 重複チェック用インデックス（実行ごとに1回だけ読み込む）
+    with metrics.span('sheets_duplicate_load'):
+        duplicate_index = await asyncio.to_thread(DuplicateIndex.load)
+
+    # 応募者シートへの書き込み処理を開始（前回の未送信分もここで書き込む）
+    start_spreadsheet_flusher()
+
     all_data = []
-    context = None
-    page = None
 
     # Bot専用のプロファイルディレクトリ（Cookie等を永続化）
     profile_dir = os.path.join(CURRENT_DIR, "chrome_profile")
@@ -965,158 +1763,39 @@ async def run_scraper(playwright) -> List[Dict[str, str]]:
             except Exception as e:
                 print_log(f"ロックファイル削除失敗: {lock_file} ({e})")
 
-    for account in active_accounts:
-        # 実行履歴の記録を開始
-        client_start = time.time()
-        record = ExecutionRecord(
-            start_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            client_name=account.client_name,
-        )
-        written_count = 0
-        duplicate_count = 0
-        new_applicants = 0
-
-        # ブラウザが未起動または再起動が必要な場合
-        if context is None:
-            print_log("ブラウザを起動中...")
-            context = await playwright.chromium.launch_persistent_context(
-                profile_dir,
-                headless=False,
-                channel="chrome",
-                locale='ja-JP',
-                timezone_id='Asia/Tokyo',
-                args=[
-                    '--disable-blink-features=AutomationControlled',
-                    '--no-sandbox',
-                    '--disable-dev-shm-usage',
-                ]
-            )
-            page = context.pages[0] if context.pages else await context.new_page()
-            stealth = Stealth()
-            await stealth.apply_stealth_async(page)
-
-        if not await login_to_website(page, account):
-            print_log(f"{account.client_name}のログインに失敗しました。次のアカウントに進みます。")
-            record.login_result = '失敗'
-            record.recaptcha_status = _last_recaptcha_status
-            record.captcha_solve_time = _last_captcha_solve_time
-            record.processing_time = f"{time.time() - client_start:.1f}"
-            write_execution_log(record)
-            continue
-
-        record.login_result = '成功'
-        record.recaptcha_status = _last_recaptcha_status
-        record.captcha_solve_time = _last_captcha_solve_time
-
-        print_log(f"{account.client_name}のログインに成功しました。")
-        await human_delay(1000, 2000)
-
-        consecutive_failures = 0
-        MAX_CONSECUTIVE_FAILURES = 3
-
-        while True:
-            # 「新着の応募はありません」チェック
-            no_data_element = await page.query_selector('#js_applicantNoData')
-            if no_data_element:
-                is_visible = await no_data_element.is_visible()
-                if is_visible:
-                    print_log(f"{account.client_name}: 新着の応募はありません。次のアカウントへ進みます。")
-                    break
-
-            row_selector = 'tbody#js_applicantList tr[data-seq="1"]'
-            row_element = await wait_for_element(page, row_selector, timeout=5000)
-
-            if not row_element:
-                print_log(f"{account.client_name}のデータ取得完了。新規データがありません。")
-                break
-
-            print_log(f"{account.client_name}の新規データを処理中")
-            new_applicants += 1
-
-            try:
-                data = await process_single_row(page, row_element, account.client_name, account.user_id, context)
-                if data:
-                    consecutive_failures = 0
-                    all_data.append(data)
-
-                    email = data.get('メールアドレス', '')
-                    job_url = data.get('求人URL', '')
-
-                    # 重複チェック: 同一メールアドレス AND 同一求人URLの場合は弾く
-                    if not SpreadsheetManager.check_duplicate_application(email, job_url):
-                        # 通知送信（エラーでも処理を継続）
-                        try:
-                            await send_notification(notification_manager, account.user_id, data)
-                        except Exception as notify_err:
-                            print_log(f"通知送信エラー（処理は継続）: {type(notify_err).__name__}: {str(notify_err)}")
-                        # スプレッドシートに書き込み
-                        write_to_spreadsheet(data)
-                        written_count += 1
-                    else:
-                        print_log(f"重複応募のため、スキップされました: {email} / {job_url}")
-                        duplicate_count += 1
-                else:
-                    consecutive_failures += 1
-                    print_log(f"{account.client_name}のデータはスキップされました（連続失敗: {consecutive_failures}/{MAX_CONSECUTIVE_FAILURES}）")
-                    if consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
-                        print_log(f"{account.client_name}: 連続{MAX_CONSECUTIVE_FAILURES}回失敗のため、次のアカウントへ進みます")
-                        record.error_message = f"連続{MAX_CONSECUTIVE_FAILURES}回データ取得失敗"
-                        break
-            except PlaywrightTimeoutError as e:
-                consecutive_failures += 1
-                print_log(f"{account.client_name}のデータ処理中にタイムアウトが発生しました（連続失敗: {consecutive_failures}/{MAX_CONSECUTIVE_FAILURES}）: {str(e)}")
-                record.error_message = f"タイムアウト: {str(e)}"
-                if consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
-                    print_log(f"{account.client_name}: 連続{MAX_CONSECUTIVE_FAILURES}回失敗のため、次のアカウントへ進みます")
-                    break
-            except Exception as e:
-                consecutive_failures += 1
-                import traceback
-                print_log(f"{account.client_name}のデータ処理中にエラーが発生しました（連続失敗: {consecutive_failures}/{MAX_CONSECUTIVE_FAILURES}）: {type(e).__name__}: {str(e)}")
-                traceback.print_exc()
-                record.error_message = f"{type(e).__name__}: {str(e)}"
-                if consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
-                    print_log(f"{account.client_name}: 連続{MAX_CONSECUTIVE_FAILURES}回失敗のため、次のアカウントへ進みます")
-                    break
-
-            try:
-                await page.goto("https://en-gage.net/company/manage/", wait_until='domcontentloaded', timeout=30000)
-            except PlaywrightTimeoutError:
-                print_log("ページ遷移タイムアウト（続行します）")
-            await human_delay(1000, 2000)
-
-        # ログアウト処理
-        logout_success = False
-        try:
-            await logout(page)
-            logout_success = True
-        except PlaywrightTimeoutError:
-            print_log(f"{account.client_name}のログアウトがタイムアウトしました")
-        except Exception as e:
-            print_log(f"{account.client_name}のログアウト中にエラー: {str(e)}")
-
-        # ログアウト失敗時はブラウザを再起動
-        if not logout_success:
-            print_log("ブラウザを再起動します...")
-            try:
-                await context.close()
-            except Exception:
-                pass
-            context = None
-            page = None
-
-        # 実行履歴を記録
-        record.new_applicants = new_applicants
-        record.written_count = written_count
-        record.duplicate_count = duplicate_count
-        record.processing_time = f"{time.time() - client_start:.1f}"
-        write_execution_log(record)
-
-        print_log(f"{account.client_name}の対応が完了しました。")
+    # reCAPTCHAの予想時間にもとづいて処理順を決め、予算を超えるアカウントは次回に見送る
+    plans = account_scheduler.plan(active_accounts)
+    print_log(f"アカウントスケジュール: {account_scheduler.format_plan(plans, SCRAPER_CONCURRENCY)}")
+    for plan in plans:
+        if plan.deferred:
+            print_log(f"{plan.account.client_name}: 今回は見送ります（reCAPTCHA予想 {plan.expected_captcha:.0f}秒）")
+    active_accounts = [plan.account for plan in plans if not plan.deferred]
+
+    account_kwargs = dict(
+        notification_manager=notification_manager,
+        duplicate_index=duplicate_index,
+        all_data=all_data,
+    )
+    if SCRAPER_CONCURRENCY > 1:
+        print_log(f"並列モード: {SCRAPER_CONCURRENCY}コンテキストで{len(active_accounts)}アカウントを処理します")
+        await run_accounts_concurrent(playwright, active_accounts, SCRAPER_CONCURRENCY, **account_kwargs)
+    else:
+        await run_accounts_sequential(playwright, profile_dir, active_accounts, **account_kwargs)
 
     print_log("全アカウントの処理が完了しました。")
-    if context:
-        await context.close()
+    await asyncio.to_thread(stop_spreadsheet_flusher)
+    await asyncio.to_thread(flush_execution_log)
+    print_log(f"Sheets API利用状況: {sheets_registry.format_stats()}")
+    print_log(f"Sheets APIリクエスト: {sheets_scheduler.format_stats()}")
+    print_log(f"勤務地キャッシュ: {job_location_cache.format_stats()}")
+    print_log(f"通信遮断: {resource_blocker.format_stats()}")
+    resource_blocker.save_history()
+    print_log(f"ブラウザメモリ: {memory_governor.format_stats()}")
+    print_log(f"待機時間: {delay_policy.format_stats()}")
+    print_log(f"reCAPTCHA履歴: {captcha_history.format_stats()}")
+    print_log(f"処理時間: {metrics.format_stats()}")
+    metrics.write('engage_scraper')
+    await captcha_solver.close()
     return all_data
 
 async def send_notification(notification_manager: NotificationManager, account_email: str, data: Dict[str, str]):
@@ -1136,9 +1815,54 @@ async def send_notification(notification_manager: NotificationManager, account_e
 async def logout(page: Page):
     """ログアウトする（ログアウトURLに直接遷移）"""
     await page.goto('https://en-gage.net/company_login/auth/logout/', wait_until='domcontentloaded')
-    await human_delay(800, 1500)
+    await human_delay('login')
     print_log(f'ログアウト完了（{page.url}）')
 
+async def save_session(context, account: User) -> None:
+    """ログイン済みのCookie・localStorageを暗号化して保存する（失敗しても処理は継続）"""
+    try:
+        session_store.save(account.user_id, await context.storage_state())
+    except Exception as e:
+        print_log(f"{account.client_name}のセッション保存に失敗しました: {type(e).__name__}: {str(e)}")
+
+async def restore_session(page: Page, context, account: User) -> bool:
+    """保存済みセッションを復元して管理画面に直接遷移する。ログイン済みならTrue（期限切れ等はFalse）"""
+    state = session_store.load(account.user_id)
+    if not state or not state.get('cookies'):
+        return False
+
+    await context.clear_cookies()
+    await context.add_cookies(state['cookies'])
+    try:
+        await page.goto(MANAGE_URL, wait_until='domcontentloaded', timeout=30000)
+    except PlaywrightTimeoutError:
+        print_log(f"{account.client_name}: セッション復元後の管理画面遷移がタイムアウトしました")
+        await context.clear_cookies()
+        return False
+
+    if '/company/manage/' not in page.url:
+        print_log(f"{account.client_name}: 保存済みセッションの期限切れ。通常ログインします")
+        session_store.delete(account.user_id)
+        await context.clear_cookies()
+        return False
+
+    # localStorage を復元（同一オリジンのページ上で設定する）
+    for origin in state.get('origins', []):
+        if page.url.startswith(origin.get('origin', '')) and origin.get('localStorage'):
+            await page.evaluate('''(items) => {
+                for (const item of items) localStorage.setItem(item.name, item.value);
+            }''', origin['localStorage'])
+
+    print_log(f"{account.client_name}: 保存済みセッションでログインしました（ログイン処理を省略）")
+    await close_modal_if_exists(page)
+    return True
+
+async def park_session(context, account: User) -> None:
+    """ログアウトせずに最新のセッションを保存し、次のアカウントのためにCookieを消す"""
+    await save_session(context, account)
+    await context.clear_cookies()
+    print_log(f'{account.client_name}のセッションを保存しました（ログアウトは省略）')
+
 async def main() -> List[Dict[str, str]]:
     """メイン関数"""
     async with async_playwright() as playwright:
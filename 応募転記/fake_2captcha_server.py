@@ -0,0 +1,73 @@
+# fake_2captcha_server.py
+"""
+2Captcha API（in.php / res.php）の代わりになるローカルサーバー（開発・動作確認用）
+
+  python fake_2captcha_server.py --port 8765 --solve-seconds 20 --error-rate 0.1
+  TWOCAPTCHA_BASE_URL=http://127.0.0.1:8765 python engage_check_apply.py
+
+実際の課金・外部通信なしで、解決までの時間やエラー応答を再現して solver の動作を確認できる。
+bench/test_captcha_solver.py はこのサーバーを起動して TwoCaptchaSolver の動作確認とベンチマークを行う。
+トークンはダミーなので、Engage のログインには使えない。
+"""
+import argparse
+import itertools
+import random
+import time
+
+from aiohttp import web
+
+
+class FakeTwoCaptcha:
+    def __init__(self, solve_seconds=20.0, jitter_seconds=5.0, error_rate=0.0):
+        self.solve_seconds = solve_seconds
+        self.jitter_seconds = jitter_seconds
+        self.error_rate = error_rate
+        self._ids = itertools.count(1000)
+        self._requests = {}  # request_id → (解決予定時刻, 失敗させるか)
+        self.stats = {'submitted': 0, 'polls': 0}
+
+    async def submit(self, request):
+        data = await request.post()
+        if not data.get('googlekey') or not data.get('pageurl'):
+            return web.json_response({'status': 0, 'request': 'ERROR_GOOGLEKEY'})
+        request_id = str(next(self._ids))
+        ready_at = time.monotonic() + max(0.0, self.solve_seconds + random.uniform(-self.jitter_seconds, self.jitter_seconds))
+        self._requests[request_id] = (ready_at, random.random() < self.error_rate)
+        self.stats['submitted'] += 1
+        return web.json_response({'status': 1, 'request': request_id})
+
+    async def result(self, request):
+        self.stats['polls'] += 1
+        entry = self._requests.get(request.query.get('id', ''))
+        if entry is None:
+            return web.json_response({'status': 0, 'request': 'ERROR_WRONG_CAPTCHA_ID'})
+        ready_at, fail = entry
+        if time.monotonic() < ready_at:
+            return web.json_response({'status': 0, 'request': 'CAPCHA_NOT_READY'})
+        if fail:
+            return web.json_response({'status': 0, 'request': 'ERROR_CAPTCHA_UNSOLVABLE'})
+        return web.json_response({'status': 1, 'request': f"fake-token-{request.query['id']}"})
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post('/in.php', self.submit)
+        app.router.add_get('/res.php', self.result)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="2Captcha API のローカル代替サーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--solve-seconds", type=float, default=20.0, help="解決までの平均秒数")
+    parser.add_argument("--jitter-seconds", type=float, default=5.0, help="解決秒数のばらつき（±）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="ERROR_CAPTCHA_UNSOLVABLE を返す割合")
+    args = parser.parse_args()
+
+    fake = FakeTwoCaptcha(args.solve_seconds, args.jitter_seconds, args.error_rate)
+    print(f"fake 2Captcha: http://{args.host}:{args.port} （TWOCAPTCHA_BASE_URL に指定してください）")
+    web.run_app(fake.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
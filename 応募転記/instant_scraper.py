@@ -23,9 +23,16 @@ if CURRENT_DIR not in sys.path:
 
 from engage_check_apply import (
     User, login_to_website, process_single_row, close_modal_if_exists,
-    wait_for_element, human_delay, logout, print_log,
+    human_delay, logout, print_log, iter_new_applicants, ProcessingPage, captcha_solver,
 )
-from SpreadsheetManager import SpreadsheetManager, write_to_spreadsheet
+from SpreadsheetManager import DuplicateIndex, write_to_spreadsheet, start_spreadsheet_flusher, stop_spreadsheet_flusher
+from sheets_client import registry as sheets_registry
+from sheets_scheduler import scheduler as sheets_scheduler
+from job_location_cache import job_location_cache
+from resource_blocking import resource_blocker
+from delay_policy import delay_policy
+from captcha_history import captcha_history
+from metrics import metrics
 
 from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 from playwright_stealth import Stealth
@@ -85,49 +92,44 @@ async def run_instant_scraper(client_name: str, email: str, password: str, max_c
                     '--disable-dev-shm-usage',
                 ]
             )
+            await resource_blocker.attach(context)
             page = context.pages[0] if context.pages else await context.new_page()
             stealth = Stealth()
             await stealth.apply_stealth_async(page)
 
             # ログイン
-            if not await login_to_website(page, user):
+            with metrics.span('login'):
+                login = await login_to_website(page, user)
+            if not login.success:
                 result["error"] = "ログイン失敗"
                 print_log(f"即時スクレイパー: {client_name} ログイン失敗")
                 return result
 
             print_log(f"即時スクレイパー: {client_name} ログイン成功")
-            await human_delay(1000, 2000)
+            await human_delay('navigation')
 
             consecutive_failures = 0
             MAX_CONSECUTIVE_FAILURES = 3
 
             processed_count = 0
-
-            while True:
+            # 重複チェック用インデックス（実行ごとに1回だけ読み込む）
+            with metrics.span('sheets_duplicate_load'):
+                duplicate_index = await asyncio.to_thread(DuplicateIndex.load)
+            # 応募者シートへの書き込み処理を開始（前回の未送信分もここで書き込む）
+            start_spreadsheet_flusher()
+
+            # 選考中ページ（連絡先の取得用）はアカウント内で1つのタブを使い回す
+            processing_page = ProcessingPage(context)
+            async for row_element, _ in iter_new_applicants(page, client_name):
                 # 件数制限チェック
                 if max_count > 0 and processed_count >= max_count:
                     print_log(f"{client_name}: 最大処理件数({max_count})に到達")
                     break
 
-                # 「新着の応募はありません」チェック
-                no_data_element = await page.query_selector('#js_applicantNoData')
-                if no_data_element:
-                    is_visible = await no_data_element.is_visible()
-                    if is_visible:
-                        print_log(f"{client_name}: 新着の応募はありません")
-                        break
-
-                row_selector = 'tbody#js_applicantList tr[data-seq="1"]'
-                row_element = await wait_for_element(page, row_selector, timeout=5000)
-
-                if not row_element:
-                    print_log(f"{client_name}: 新規データなし")
-                    break
-
                 print_log(f"{client_name}: 新規データを処理中")
 
                 try:
-                    data = await process_single_row(page, row_element, client_name, email, context)
+                    data = await process_single_row(page, row_element, client_name, email, context, processing_page)
                     if data:
                         consecutive_failures = 0
 
@@ -138,9 +140,13 @@ async def run_instant_scraper(client_name: str, email: str, password: str, max_c
                         job_url = data.get('求人URL', '')
 
                         # 重複チェック
-                        if not SpreadsheetManager.check_duplicate_application(email_addr, job_url):
-                            # スプレッドシートに書き込み（通知はスキップ）
-                            write_to_spreadsheet(data)
+                        with metrics.span('sheets_duplicate_check'):
+                            is_duplicate = await duplicate_index.contains_async(email_addr, job_url)
+                        if not is_duplicate:
+                            # 永続キューに書き込み（通知はスキップ）
+                            with metrics.span('sheets_write'):
+                                write_to_spreadsheet(data)
+                            duplicate_index.add(email_addr, job_url)
                             result["written_count"] += 1
                             result["applicants"].append({
                                 "名前": data.get("名前", ""),
@@ -181,12 +187,12 @@ async def run_instant_scraper(client_name: str, email: str, password: str, max_c
                         result["error"] = f"{type(e).__name__}: {str(e)}"
                         break
 
-                # 管理画面に戻る
-                try:
-                    await page.goto("https://en-gage.net/company/manage/", wait_until='domcontentloaded', timeout=30000)
-                except PlaywrightTimeoutError:
-                    print_log("ページ遷移タイムアウト（続行）")
-                await human_delay(1000, 2000)
+                # 一覧は開き直さず次の行へ（一覧が変わった場合は iter_new_applicants が読み取り直す）
+                await close_modal_if_exists(page)
+                await human_delay('between_applicants')
+
+            await processing_page.close()
+            print_log(f"選考中ページ: 照会{processing_page.stats['lookups']}件, 索引ヒット{processing_page.stats['hits']}件, ページ読み込み{processing_page.stats['page_loads']}回, 直接取得{processing_page.stats['fetched']}件, クリック取得{processing_page.stats['fallbacks']}件")
 
             # ログアウト
             try:
@@ -206,6 +212,9 @@ async def run_instant_scraper(client_name: str, email: str, password: str, max_c
                 await context.close()
             except Exception:
                 pass
+        # キューに残った行をシートへ書き込む（書き込めなかった行は次回実行時に再送）
+        await asyncio.to_thread(stop_spreadsheet_flusher)
+        await captcha_solver.close()
 
     return result
 
@@ -223,6 +232,15 @@ def main():
     result = asyncio.run(run_instant_scraper(args.client_name, args.email, args.password, max_count=args.max_count))
 
     output_result(result)
+    print_log(f"Sheets API利用状況: {sheets_registry.format_stats()}")
+    print_log(f"Sheets APIリクエスト: {sheets_scheduler.format_stats()}")
+    print_log(f"勤務地キャッシュ: {job_location_cache.format_stats()}")
+    print_log(f"通信遮断: {resource_blocker.format_stats()}")
+    resource_blocker.save_history()
+    print_log(f"待機時間: {delay_policy.format_stats()}")
+    print_log(f"reCAPTCHA履歴: {captcha_history.format_stats()}")
+    print_log(f"処理時間: {metrics.format_stats()}")
+    metrics.write('instant_scraper')
     print_log(f"即時スクレイパー終了: success={result['success']}, written={result['written_count']}")
 
 
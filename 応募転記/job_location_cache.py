@@ -0,0 +1,143 @@
+# job_location_cache.py
+"""
+work_id → 勤務地（都道府県・エリア）のローカルキャッシュ
+
+同じ求人への応募が続く場合に求人ページを開き直さないよう、取得結果をローカルの SQLite に保存する。
+即時スクレイパーと定期スクレイパーが同時に書き込んでも互いの記録を消さないよう、1件ずつ書き込む。
+有効期限（JOB_LOCATION_TTL_HOURS）を過ぎたものは使わず、件数が上限を超えたら最も使われていないものから捨てる。
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_PATH = os.path.join(CURRENT_DIR, "job_location_cache.sqlite3")
+# 以前の形式（JSONファイル）。あれば初回に取り込む
+LEGACY_CACHE_PATH = os.path.join(CURRENT_DIR, "job_location_cache.json")
+
+JOB_LOCATION_TTL_HOURS = float(os.getenv("JOB_LOCATION_TTL_HOURS", "168"))
+JOB_LOCATION_CACHE_SIZE = int(os.getenv("JOB_LOCATION_CACHE_SIZE", "2000"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_locations (
+    work_id TEXT PRIMARY KEY,
+    location TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_job_locations_used_at ON job_locations (used_at);
+"""
+
+
+class JobLocationCache:
+    def __init__(self, db_path=None, ttl_hours=JOB_LOCATION_TTL_HOURS, max_size=JOB_LOCATION_CACHE_SIZE,
+                 legacy_path=LEGACY_CACHE_PATH):
+        self.db_path = db_path or DEFAULT_CACHE_PATH
+        self.legacy_path = legacy_path
+        self.ttl_seconds = ttl_hours * 3600
+        self.max_size = max_size
+        self._conn = None
+        # 接続はスレッド間で共有するため、1つの操作ごとにロックを取る
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0}
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            self._import_legacy()
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _import_legacy(self):
+        """以前の JSON ファイル（古い順）を取り込み、取り込んだファイルは .migrated に改名する"""
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+        try:
+            with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"以前の勤務地キャッシュを読み込めませんでした（取り込まずに開始）: {e}")
+            return
+        # JSON は使われた順（古い順）に並んでいるので、その順序を used_at に残す
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO job_locations (work_id, location, fetched_at, used_at) VALUES (?, ?, ?, ?)",
+            [
+                (work_id, json.dumps(entry['location'], ensure_ascii=False), entry['fetched_at'], order)
+                for order, (work_id, entry) in enumerate(entries.items())
+            ],
+        )
+        os.replace(self.legacy_path, f"{self.legacy_path}.migrated")
+        print(f"以前の勤務地キャッシュを取り込みました: {len(entries)}件")
+
+    def get(self, work_id):
+        """有効なキャッシュがあれば {"都道府県", "エリア"} を返す。なければ None"""
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT location, fetched_at FROM job_locations WHERE work_id = ?", (work_id,)
+                ).fetchone()
+                if row is None:
+                    self.stats['misses'] += 1
+                    return None
+                location, fetched_at = row
+                if time.time() - fetched_at > self.ttl_seconds:
+                    conn.execute("DELETE FROM job_locations WHERE work_id = ?", (work_id,))
+                    self.stats['expired'] += 1
+                    self.stats['misses'] += 1
+                    return None
+                conn.execute("UPDATE job_locations SET used_at = ? WHERE work_id = ?", (time.time(), work_id))
+            except sqlite3.Error as e:
+                # キャッシュが使えなくても求人ページから取得すれば済む
+                print(f"勤務地キャッシュを参照できませんでした: {e}")
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            return json.loads(location)
+
+    def put(self, work_id, location):
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO job_locations (work_id, location, fetched_at, used_at) VALUES (?, ?, ?, ?)",
+                        (work_id, json.dumps(dict(location), ensure_ascii=False), now, now),
+                    )
+                    conn.execute(
+                        "DELETE FROM job_locations WHERE work_id NOT IN ("
+                        "SELECT work_id FROM job_locations ORDER BY used_at DESC LIMIT ?)",
+                        (self.max_size,),
+                    )
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                print(f"勤務地キャッシュの保存に失敗しました: {e}")
+
+    def format_stats(self):
+        total = self.stats['hits'] + self.stats['misses']
+        rate = self.stats['hits'] / total if total else 0.0
+        return (
+            f"ヒット: {self.stats['hits']}件, ミス: {self.stats['misses']}件"
+            f"（期限切れ {self.stats['expired']}件）, ヒット率: {rate:.0%}"
+        )
+
+
+# プロセス全体で共有するキャッシュ
+job_location_cache = JobLocationCache()
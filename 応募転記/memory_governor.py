@@ -0,0 +1,71 @@
+# memory_governor.py
+"""
+スクレイパーが起動した Chrome のメモリ使用量（プロセスツリー全体のRSS）を監視し、
+上限を超えたり一定数の応募者を処理したりしたら、アカウントの切り替え時にブラウザを作り直す
+
+  BROWSER_RSS_LIMIT_MB        RSS の上限（MB、0 で無効）
+  BROWSER_RECYCLE_APPLICANTS  この件数の応募者を処理したら作り直す（0 で無効）
+
+psutil が入っていない環境では RSS の監視だけを無効にする（件数による作り直しは有効）。
+"""
+import os
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - メモリ監視は任意機能
+    psutil = None
+
+
+BROWSER_RSS_LIMIT_MB = int(os.getenv("BROWSER_RSS_LIMIT_MB", "1500"))
+BROWSER_RECYCLE_APPLICANTS = int(os.getenv("BROWSER_RECYCLE_APPLICANTS", "200"))
+
+# 監視対象のプロセス名（Playwright が起動した Chrome / Chromium）
+BROWSER_PROCESS_NAMES = ("chrome", "chromium", "headless_shell")
+
+
+class MemoryGovernor:
+    def __init__(self, rss_limit_mb=BROWSER_RSS_LIMIT_MB, recycle_applicants=BROWSER_RECYCLE_APPLICANTS):
+        self.rss_limit_mb = rss_limit_mb
+        self.recycle_applicants = recycle_applicants
+        self.peak_mb = 0.0
+        self.recycles = 0
+        self._process = psutil.Process() if psutil else None
+
+    def sample(self):
+        """自プロセス配下の Chrome プロセスの RSS 合計（MB）を返す。監視できない場合は 0"""
+        if self._process is None:
+            return 0.0
+        total = 0
+        try:
+            children = self._process.children(recursive=True)
+        except psutil.Error:
+            return 0.0
+        for child in children:
+            try:
+                if child.name().lower().startswith(BROWSER_PROCESS_NAMES):
+                    total += child.memory_info().rss
+            except psutil.Error:
+                # 測定中に終了したプロセスは無視する
+                continue
+        rss_mb = total / (1024 * 1024)
+        self.peak_mb = max(self.peak_mb, rss_mb)
+        return rss_mb
+
+    def recycle_reason(self, applicants_since_launch):
+        """ブラウザを作り直すべき理由を返す。不要なら None"""
+        if self.recycle_applicants > 0 and applicants_since_launch >= self.recycle_applicants:
+            return f"処理件数が{applicants_since_launch}件に達しました"
+        if self.rss_limit_mb > 0:
+            rss_mb = self.sample()
+            if rss_mb >= self.rss_limit_mb:
+                return f"メモリ使用量が{rss_mb:.0f}MBに達しました（上限 {self.rss_limit_mb}MB）"
+        return None
+
+    def format_stats(self):
+        if self._process is None:
+            return f"psutil 未インストールのため未計測, ブラウザ作り直し: {self.recycles}回"
+        return f"最大 {self.peak_mb:.0f}MB, ブラウザ作り直し: {self.recycles}回"
+
+
+# プロセス全体で共有する監視
+memory_governor = MemoryGovernor()
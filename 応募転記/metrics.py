@@ -0,0 +1,131 @@
+# metrics.py
+"""
+処理フェーズごとの所要時間の計測
+
+  with metrics.span('login'):
+      ...
+
+フェーズごとに所要時間を集め、実行の終わりに件数・p50・p95・最大を
+Prometheus の textfile（node_exporter の textfile collector 用）と JSON でログと同じフォルダに書き出す。
+バックグラウンドのスレッド（シートへの書き込み）からも呼べる。
+"""
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+METRIC_NAME = "engage_scraper_phase_seconds"
+MAX_METRIC_NAME = "engage_scraper_phase_max_seconds"
+ERROR_METRIC_NAME = "engage_scraper_phase_errors"
+
+
+def _quantile(sorted_values, q):
+    """最近傍法の分位点（sorted_values は昇順）"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(q * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class PhaseMetrics:
+    def __init__(self):
+        self._durations = {}  # フェーズ → [秒]
+        self._errors = {}     # フェーズ → 例外で終わった回数
+        self._lock = threading.Lock()
+
+    def observe(self, phase, seconds):
+        with self._lock:
+            self._durations.setdefault(phase, []).append(seconds)
+
+    @contextmanager
+    def span(self, phase):
+        """with の中の所要時間を phase として記録する（例外で抜けた場合も記録し、エラー回数に数える）"""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            with self._lock:
+                self._errors[phase] = self._errors.get(phase, 0) + 1
+            raise
+        finally:
+            self.observe(phase, time.perf_counter() - started)
+
+    def summary(self):
+        """フェーズ → {count, errors, sum, p50, p95, max}"""
+        with self._lock:
+            durations = {phase: sorted(values) for phase, values in self._durations.items()}
+            errors = dict(self._errors)
+        return {
+            phase: {
+                'count': len(values),
+                'errors': errors.get(phase, 0),
+                'sum': sum(values),
+                'p50': _quantile(values, 0.5),
+                'p95': _quantile(values, 0.95),
+                'max': values[-1],
+            }
+            for phase, values in durations.items()
+        }
+
+    def to_prometheus(self, job):
+        summary = self.summary()
+        lines = [
+            f"# HELP {METRIC_NAME} 処理フェーズごとの所要時間（秒）",
+            f"# TYPE {METRIC_NAME} summary",
+        ]
+        for phase, stats in sorted(summary.items()):
+            labels = f'job="{_label(job)}",phase="{_label(phase)}"'
+            lines.append(f'{METRIC_NAME}{{{labels},quantile="0.5"}} {stats["p50"]:.6f}')
+            lines.append(f'{METRIC_NAME}{{{labels},quantile="0.95"}} {stats["p95"]:.6f}')
+            lines.append(f'{METRIC_NAME}_sum{{{labels}}} {stats["sum"]:.6f}')
+            lines.append(f'{METRIC_NAME}_count{{{labels}}} {stats["count"]}')
+        lines.append(f"# HELP {MAX_METRIC_NAME} 処理フェーズごとの最大所要時間（秒）")
+        lines.append(f"# TYPE {MAX_METRIC_NAME} gauge")
+        for phase, stats in sorted(summary.items()):
+            lines.append(f'{MAX_METRIC_NAME}{{job="{_label(job)}",phase="{_label(phase)}"}} {stats["max"]:.6f}')
+        lines.append(f"# HELP {ERROR_METRIC_NAME} 処理フェーズが例外で終わった回数")
+        lines.append(f"# TYPE {ERROR_METRIC_NAME} gauge")
+        for phase, stats in sorted(summary.items()):
+            lines.append(f'{ERROR_METRIC_NAME}{{job="{_label(job)}",phase="{_label(phase)}"}} {stats["errors"]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, job, directory=CURRENT_DIR):
+        """<job>_metrics.prom と <job>_metrics.json を書き出す（前回の実行分は上書きする）"""
+        outputs = {
+            os.path.join(directory, f"{job}_metrics.prom"): self.to_prometheus(job),
+            os.path.join(directory, f"{job}_metrics.json"): json.dumps({
+                'job': job,
+                'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'phases': self.summary(),
+            }, ensure_ascii=False, indent=2),
+        }
+        for path, content in outputs.items():
+            try:
+                temp_path = f"{path}.tmp"
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                os.replace(temp_path, path)
+            except OSError as e:
+                print(f"計測結果を書き出せませんでした（{path}）: {e}")
+
+    def format_stats(self):
+        summary = self.summary()
+        if not summary:
+            return "なし"
+        return ", ".join(
+            f"{phase}: {stats['count']}回 p50 {stats['p50']:.2f}秒 / p95 {stats['p95']:.2f}秒 / 最大 {stats['max']:.2f}秒"
+            for phase, stats in sorted(summary.items(), key=lambda item: -item[1]['sum'])
+        )
+
+
+# プロセス全体で共有する計測
+metrics = PhaseMetrics()
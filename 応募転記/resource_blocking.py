@@ -0,0 +1,173 @@
+# resource_blocking.py
+"""
+スクレイピング中のブラウザコンテキストで不要な通信（画像・フォント・計測タグ等）を遮断する
+
+RESOURCE_BLOCKING で遮断の強さを選ぶ:
+  off      遮断しない（比較用）
+  standard 画像・動画・フォントと、広告・アクセス解析のホストを遮断する
+  strict   standard に加えて、許可リスト以外の外部ホストをすべて遮断する
+reCAPTCHA（google.com / gstatic.com / recaptcha.net）は常に許可する。
+プロファイルごとのページ読み込み時間・受信バイト数を履歴ファイルに積み上げ、off との比較を出力する。
+"""
+import json
+import os
+import time
+from urllib.parse import urlparse
+
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_HISTORY_PATH = os.path.join(CURRENT_DIR, "resource_blocking_history.json")
+
+RESOURCE_BLOCKING = os.getenv("RESOURCE_BLOCKING", "standard").lower()
+
+# reCAPTCHA のホスト（種別に関係なく常に許可する）
+RECAPTCHA_HOSTS = ("google.com", "gstatic.com", "recaptcha.net")
+# strict でも許可するホスト
+ALLOWED_HOSTS = ("en-gage.net",) + RECAPTCHA_HOSTS
+# 遮断するリソース種別
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+# 遮断するホスト（広告・アクセス解析・外部ウィジェット）
+BLOCKED_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googleadservices.com",
+    "googlesyndication.com",
+    "doubleclick.net",
+    "facebook.net",
+    "facebook.com",
+    "twitter.com",
+    "ads-twitter.com",
+    "yimg.jp",
+    "yahoo.co.jp",
+    "bing.com",
+    "clarity.ms",
+    "hotjar.com",
+    "karte.io",
+    "criteo.com",
+    "criteo.net",
+    "nr-data.net",
+    "newrelic.com",
+    "line-scdn.net",
+    "tiktok.com",
+)
+
+
+def _host_matches(host, domains):
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+
+class ResourceBlocker:
+    def __init__(self, profile=RESOURCE_BLOCKING, history_path=None):
+        if profile not in ("off", "standard", "strict"):
+            print(f"RESOURCE_BLOCKING の値が不正です（{profile}）。standard で実行します")
+            profile = "standard"
+        self.profile = profile
+        self.history_path = history_path or DEFAULT_HISTORY_PATH
+        self.stats = {
+            'blocked': 0, 'allowed': 0, 'blocked_by_type': {},
+            'navigations': 0, 'load_ms': 0.0, 'bytes': 0,
+        }
+        self._navigation_started = {}
+
+    def should_block(self, url, resource_type):
+        if self.profile == "off":
+            return False
+        host = (urlparse(url).hostname or "").lower()
+        # reCAPTCHA の画像チャレンジもあるため、許可ホストは種別に関係なく通す
+        if _host_matches(host, RECAPTCHA_HOSTS):
+            return False
+        if resource_type in BLOCKED_RESOURCE_TYPES:
+            return True
+        if _host_matches(host, BLOCKED_HOSTS):
+            return True
+        if self.profile == "strict" and host and not _host_matches(host, ALLOWED_HOSTS):
+            return True
+        return False
+
+    async def _route(self, route):
+        request = route.request
+        if self.should_block(request.url, request.resource_type):
+            self.stats['blocked'] += 1
+            by_type = self.stats['blocked_by_type']
+            by_type[request.resource_type] = by_type.get(request.resource_type, 0) + 1
+            await route.abort()
+            return
+        self.stats['allowed'] += 1
+        await route.continue_()
+
+    def _on_request(self, page, request):
+        if request.is_navigation_request() and request.frame == page.main_frame:
+            self._navigation_started[id(page)] = time.monotonic()
+
+    def _on_load(self, page):
+        started = self._navigation_started.pop(id(page), None)
+        if started is not None:
+            self.stats['navigations'] += 1
+            self.stats['load_ms'] += (time.monotonic() - started) * 1000
+
+    def _on_response(self, response):
+        try:
+            self.stats['bytes'] += int(response.headers.get('content-length', 0))
+        except ValueError:
+            pass
+
+    def _watch_page(self, page):
+        page.on("request", lambda request: self._on_request(page, request))
+        page.on("load", lambda _: self._on_load(page))
+
+    async def attach(self, context):
+        """コンテキストに遮断ルールと計測を設定する（作成直後に呼ぶ）"""
+        if self.profile != "off":
+            await context.route("**/*", self._route)
+        context.on("response", self._on_response)
+        context.on("page", self._watch_page)
+        for page in context.pages:
+            self._watch_page(page)
+
+    def _load_history(self):
+        if not os.path.exists(self.history_path):
+            return {}
+        try:
+            with open(self.history_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_history(self):
+        """今回の計測値をプロファイルごとの累計に加える"""
+        if not self.stats['navigations']:
+            return
+        history = self._load_history()
+        total = history.setdefault(self.profile, {'navigations': 0, 'load_ms': 0.0, 'bytes': 0})
+        for key in ('navigations', 'load_ms', 'bytes'):
+            total[key] += self.stats[key]
+        try:
+            temp_path = f"{self.history_path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(history, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.history_path)
+        except OSError as e:
+            print(f"通信遮断の計測履歴を保存できませんでした: {e}")
+
+    def format_stats(self):
+        navigations = self.stats['navigations']
+        avg_ms = self.stats['load_ms'] / navigations if navigations else 0.0
+        avg_kb = self.stats['bytes'] / navigations / 1024 if navigations else 0.0
+        blocked_by_type = ", ".join(f"{key}: {value}" for key, value in sorted(self.stats['blocked_by_type'].items()))
+        message = (
+            f"プロファイル: {self.profile}, 遮断: {self.stats['blocked']}件（{blocked_by_type or 'なし'}）, "
+            f"ページ読み込み: 平均{avg_ms:.0f}ms / 約{avg_kb:.0f}KB（{navigations}回）"
+        )
+        baseline = self._load_history().get("off")
+        if self.profile != "off" and baseline and baseline['navigations'] and navigations:
+            base_ms = baseline['load_ms'] / baseline['navigations']
+            base_kb = baseline['bytes'] / baseline['navigations'] / 1024
+            message += (
+                f", 遮断なし（off）の平均 {base_ms:.0f}ms / 約{base_kb:.0f}KB と比較して "
+                f"{base_ms - avg_ms:.0f}ms / 約{base_kb - avg_kb:.0f}KB 削減"
+            )
+        return message
+
+
+# プロセス全体で共有する遮断設定
+resource_blocker = ResourceBlocker()
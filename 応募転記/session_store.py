@@ -0,0 +1,86 @@
+# session_store.py
+"""
+アカウントごとのブラウザセッション（Cookie・localStorage）を暗号化して保存するローカルストア
+
+ログイン成功後の storage_state を Fernet で暗号化してアカウントごとのファイルに保存し、
+次回実行時に復元してログイン（とreCAPTCHA）を省略できるようにする。
+鍵は環境変数 SESSION_STORE_KEY、未設定なら初回に生成する session_store.key を使う。
+"""
+import hashlib
+import json
+import os
+
+from cryptography.fernet import Fernet, InvalidToken
+
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORE_DIR = os.path.join(CURRENT_DIR, "session_store")
+DEFAULT_KEY_PATH = os.path.join(CURRENT_DIR, "session_store.key")
+
+# 保存したセッションの有効期限（これより古いものは復元しない）
+SESSION_MAX_AGE_HOURS = float(os.getenv("SESSION_MAX_AGE_HOURS", "168"))
+
+
+def _load_key(key_path):
+    key = os.getenv("SESSION_STORE_KEY")
+    if key:
+        return key.encode()
+    if os.path.exists(key_path):
+        with open(key_path, 'rb') as f:
+            return f.read().strip()
+    key = Fernet.generate_key()
+    fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return key
+
+
+class SessionStore:
+    def __init__(self, store_dir=None, key_path=None, max_age_hours=SESSION_MAX_AGE_HOURS):
+        self.store_dir = store_dir or DEFAULT_STORE_DIR
+        self.key_path = key_path or DEFAULT_KEY_PATH
+        self.max_age_seconds = int(max_age_hours * 3600)
+        self._fernet = None
+
+    def _cipher(self):
+        if self._fernet is None:
+            self._fernet = Fernet(_load_key(self.key_path))
+        return self._fernet
+
+    def _path(self, account_id):
+        # ファイル名にログインIDを出さない
+        digest = hashlib.sha256(account_id.encode()).hexdigest()[:32]
+        return os.path.join(self.store_dir, f"{digest}.session")
+
+    def load(self, account_id):
+        """保存済みの storage_state を返す。ない・期限切れ・復号できない場合は None"""
+        path = self._path(account_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            token = f.read()
+        try:
+            return json.loads(self._cipher().decrypt(token, ttl=self.max_age_seconds or None))
+        except (InvalidToken, ValueError):
+            # 期限切れ・鍵の変更・破損したファイルは破棄する
+            self.delete(account_id)
+            return None
+
+    def save(self, account_id, state):
+        os.makedirs(self.store_dir, exist_ok=True)
+        token = self._cipher().encrypt(json.dumps(state, ensure_ascii=False).encode())
+        path = self._path(account_id)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(token)
+        os.replace(temp_path, path)
+
+    def delete(self, account_id):
+        try:
+            os.remove(self._path(account_id))
+        except FileNotFoundError:
+            pass
+
+
+# プロセス全体で共有するストア
+session_store = SessionStore()
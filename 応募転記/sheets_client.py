@@ -0,0 +1,108 @@
+# sheets_client.py
+"""
+gspread クライアントとスプレッドシート/ワークシートのハンドルをプロセス内で共有する
+
+認証済みセッション（HTTPコネクションプール）を1つだけ使い回し、
+open_by_key / worksheet() のメタデータ取得を (spreadsheet_id, sheet_name) 単位でキャッシュする。
+"""
+import os
+import threading
+
+import gspread
+from google.auth.exceptions import RefreshError
+from google.oauth2.service_account import Credentials
+
+from sheets_scheduler import scheduler
+
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CREDENTIALS_PATH = os.path.join(CURRENT_DIR, "Credentials.json")
+
+DEFAULT_SCOPES = (
+    'https://www.googleapis.com/auth/spreadsheets',
+    'https://www.googleapis.com/auth/drive',
+)
+
+
+def _status_code(exc):
+    response = getattr(exc, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+class SheetsClientRegistry:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._clients = {}       # (credentials_path, scopes) → gspread.Client
+        self._spreadsheets = {}  # spreadsheet_id → gspread.Spreadsheet
+        self._worksheets = {}    # (spreadsheet_id, sheet_name) → gspread.Worksheet
+        self.stats = {'auth_calls': 0, 'metadata_fetches': 0, 'invalidations': 0}
+
+    def get_client(self, credentials_path=None, scopes=DEFAULT_SCOPES):
+        key = (credentials_path or DEFAULT_CREDENTIALS_PATH, tuple(scopes))
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                credentials = Credentials.from_service_account_file(key[0], scopes=list(key[1]))
+                client = gspread.authorize(credentials)
+                self._clients[key] = client
+                self.stats['auth_calls'] += 1
+            return client
+
+    def get_spreadsheet(self, spreadsheet_id, credentials_path=None):
+        with self._lock:
+            spreadsheet = self._spreadsheets.get(spreadsheet_id)
+            if spreadsheet is None:
+                spreadsheet = scheduler.read(self.get_client(credentials_path).open_by_key, spreadsheet_id)
+                self._spreadsheets[spreadsheet_id] = spreadsheet
+                self.stats['metadata_fetches'] += 1
+            return spreadsheet
+
+    def get_worksheet(self, spreadsheet_id, sheet_name, credentials_path=None):
+        key = (spreadsheet_id, sheet_name)
+        with self._lock:
+            worksheet = self._worksheets.get(key)
+            if worksheet is None:
+                worksheet = scheduler.read(self.get_spreadsheet(spreadsheet_id, credentials_path).worksheet, sheet_name)
+                self._worksheets[key] = worksheet
+                self.stats['metadata_fetches'] += 1
+            return worksheet
+
+    def invalidate(self, spreadsheet_id=None, sheet_name=None, auth=False):
+        """キャッシュを破棄する。auth=True の場合は認証済みクライアントも含めて全て破棄する"""
+        with self._lock:
+            self.stats['invalidations'] += 1
+            if auth:
+                self._clients.clear()
+                self._spreadsheets.clear()
+                self._worksheets.clear()
+                return
+            if sheet_name is not None:
+                self._worksheets.pop((spreadsheet_id, sheet_name), None)
+                return
+            self._spreadsheets.pop(spreadsheet_id, None)
+            for key in [key for key in self._worksheets if key[0] == spreadsheet_id]:
+                del self._worksheets[key]
+
+    def handle_error(self, exc, spreadsheet_id=None, sheet_name=None):
+        """認証エラー・404の場合に該当キャッシュを破棄する。破棄した場合はTrueを返す"""
+        status = _status_code(exc)
+        if isinstance(exc, RefreshError) or status == 401:
+            self.invalidate(auth=True)
+            return True
+        if isinstance(exc, gspread.exceptions.WorksheetNotFound) or (status == 404 and sheet_name):
+            self.invalidate(spreadsheet_id, sheet_name)
+            return True
+        if isinstance(exc, gspread.exceptions.SpreadsheetNotFound) or status == 404:
+            self.invalidate(spreadsheet_id)
+            return True
+        return False
+
+    def format_stats(self):
+        return (
+            f"認証: {self.stats['auth_calls']}回, メタデータ取得: {self.stats['metadata_fetches']}回, "
+            f"キャッシュ破棄: {self.stats['invalidations']}回"
+        )
+
+
+# プロセス全体で共有するレジストリ
+registry = SheetsClientRegistry()
@@ -0,0 +1,136 @@
+# sheets_scheduler.py
+"""
+Google Sheets API 呼び出しのスケジューラ
+
+- 読み取り/書き込みのクォータ種別ごとのトークンバケットで毎分の上限を超えないように間隔を空ける
+- 429 / 5xx・通信エラーは指数バックオフ（ジッター付き）でリトライする
+  ただし追記（append_rows / append_row）は最初のリクエストが反映済みの可能性があるため、429 のときだけリトライする
+- 待機は呼び出したスレッドで time.sleep する。イベントループ上のコルーチンからは asyncio.to_thread 経由で呼ぶこと
+- 同時に発行された同一の読み取りは1回のAPI呼び出しにまとめる
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+import gspread
+import requests
+
+
+# Sheets API の既定クォータ（1ユーザーあたり毎分60リクエスト）
+DEFAULT_READS_PER_MINUTE = int(os.getenv("SHEETS_READS_PER_MINUTE", "60"))
+DEFAULT_WRITES_PER_MINUTE = int(os.getenv("SHEETS_WRITES_PER_MINUTE", "60"))
+
+# リトライ対象のHTTPステータス
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# 追記のリトライ対象（429 はリクエストが処理されていないことが確実）
+APPEND_RETRY_STATUSES = {429}
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1, rate_per_minute // 6)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """トークンを1つ取得する（足りなければ補充まで待機）。待機秒数を返す"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class SheetsRequestScheduler:
+    def __init__(self, reads_per_minute=DEFAULT_READS_PER_MINUTE, writes_per_minute=DEFAULT_WRITES_PER_MINUTE,
+                 max_retries=6, base_delay=1.0, max_delay=64.0):
+        self._buckets = {
+            'read': TokenBucket(reads_per_minute),
+            'write': TokenBucket(writes_per_minute),
+        }
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {'read': 0, 'write': 0, 'retries': 0, 'coalesced': 0, 'throttled_seconds': 0.0}
+
+    def read(self, fn, *args, coalesce_key=None, **kwargs):
+        """読み取りを実行する。coalesce_key が同じ読み取りが実行中ならその結果を共有する"""
+        if coalesce_key is None:
+            return self._execute('read', fn, args, kwargs)
+
+        with self._lock:
+            future = self._inflight.get(coalesce_key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[coalesce_key] = future
+            else:
+                self.stats['coalesced'] += 1
+        if not owner:
+            return future.result()
+
+        try:
+            result = self._execute('read', fn, args, kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(coalesce_key, None)
+
+    def write(self, fn, *args, **kwargs):
+        """同じ内容で再実行しても結果が変わらない書き込み（batch_update など）"""
+        return self._execute('write', fn, args, kwargs)
+
+    def append(self, fn, *args, **kwargs):
+        """
+        追記（append_rows / append_row）。タイムアウト・通信エラー・5xx は最初のリクエストが反映済みの
+        可能性があり、再送すると二重に追記されるためリトライせずに例外を送出する（429 のみリトライ）
+        """
+        return self._execute('write', fn, args, kwargs, retry_statuses=APPEND_RETRY_STATUSES, retry_network_errors=False)
+
+    def _execute(self, quota_class, fn, args, kwargs, retry_statuses=RETRY_STATUSES, retry_network_errors=True):
+        bucket = self._buckets[quota_class]
+        for attempt in range(self.max_retries + 1):
+            self.stats['throttled_seconds'] += bucket.acquire()
+            self.stats[quota_class] += 1
+            try:
+                return fn(*args, **kwargs)
+            except (gspread.exceptions.APIError, requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                status = getattr(getattr(e, 'response', None), 'status_code', None)
+                if isinstance(e, gspread.exceptions.APIError):
+                    retryable = status in retry_statuses
+                else:
+                    retryable = retry_network_errors
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                delay = min(self.max_delay, self.base_delay * (2 ** attempt)) + random.uniform(0, 1)
+                self.stats['retries'] += 1
+                print(f"Sheets API {status or type(e).__name__}: {delay:.1f}秒後にリトライします（{attempt + 1}/{self.max_retries}）")
+                time.sleep(delay)
+
+    def format_stats(self):
+        return (
+            f"読み取り: {self.stats['read']}回, 書き込み: {self.stats['write']}回, "
+            f"リトライ: {self.stats['retries']}回, 共有: {self.stats['coalesced']}回, "
+            f"クォータ待機: {self.stats['throttled_seconds']:.1f}秒"
+        )
+
+
+# プロセス全体で共有するスケジューラ
+scheduler = SheetsRequestScheduler()
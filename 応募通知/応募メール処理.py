@@ -17,6 +17,7 @@ Engage応募通知 → Chatwork/LINE連携
 import argparse
 import json
 import os
+import random
 import re
 import sys
 from datetime import datetime, timezone, timedelta
@@ -341,8 +342,58 @@ def get_region(prefecture: str) -> str:
 
 # ===== Google Sheets関連（読み取りのみ） =====
 
+# 認証済みクライアントとワークシートはプロセス内で共有する
+_sheets_client = None
+_worksheet_cache = {}  # (spreadsheet_id, sheet_name) → Worksheet
+SHEETS_STATS = {'auth_calls': 0, 'metadata_fetches': 0}
+
+
 def get_sheets_client():
-    """Google Sheets クライアントを取得"""
+    """Google Sheets クライアントを取得（2回目以降はキャッシュを返す）"""
+    global _sheets_client
+    if _sheets_client is None:
+        _sheets_client = _authorize_sheets_client()
+    return _sheets_client
+
+
+def sheets_call_with_backoff(fn, *args, max_retries: int = 5, **kwargs):
+    """Sheets APIを呼び出す（429/5xxは指数バックオフでリトライ）"""
+    for attempt in range(max_retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except gspread.exceptions.APIError as e:
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            if status not in (429, 500, 502, 503, 504) or attempt >= max_retries:
+                raise
+            delay = min(64, 2 ** attempt) + random.uniform(0, 1)
+            print(f'Sheets API {status}: {delay:.1f}秒後にリトライします（{attempt + 1}/{max_retries}）')
+            time.sleep(delay)
+
+
+def open_worksheet(client, spreadsheet_id: str, sheet_name: str):
+    """ワークシートを開く（(spreadsheet_id, sheet_name) 単位でキャッシュ）"""
+    key = (spreadsheet_id, sheet_name)
+    worksheet = _worksheet_cache.get(key)
+    if worksheet is None:
+        spreadsheet = sheets_call_with_backoff(client.open_by_key, spreadsheet_id)
+        worksheet = sheets_call_with_backoff(spreadsheet.worksheet, sheet_name)
+        SHEETS_STATS['metadata_fetches'] += 2
+        _worksheet_cache[key] = worksheet
+    return worksheet
+
+
+def invalidate_sheets_cache(error: Exception, spreadsheet_id: str, sheet_name: str):
+    """認証エラー・404の場合にキャッシュを破棄する"""
+    global _sheets_client
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status == 401:
+        _sheets_client = None
+        _worksheet_cache.clear()
+    elif status == 404 or isinstance(error, (gspread.exceptions.SpreadsheetNotFound, gspread.exceptions.WorksheetNotFound)):
+        _worksheet_cache.pop((spreadsheet_id, sheet_name), None)
+
+
+def _authorize_sheets_client():
     scopes = [
         'https://www.googleapis.com/auth/spreadsheets.readonly',
         'https://www.googleapis.com/auth/drive.readonly'
@@ -355,6 +406,7 @@ def get_sheets_client():
         try:
             creds = Credentials.from_service_account_file(creds_file, scopes=scopes)
             print('認証: credentials.json を使用')
+            SHEETS_STATS['auth_calls'] += 1
             return gspread.authorize(creds)
         except Exception as e:
             print(f'credentials.json 読み込みエラー: {e}')
@@ -365,6 +417,7 @@ def get_sheets_client():
             creds_dict = json.loads(creds_json)
             creds = Credentials.from_service_account_info(creds_dict, scopes=scopes)
             print('認証: GOOGLE_CREDENTIALS 環境変数を使用')
+            SHEETS_STATS['auth_calls'] += 1
             return gspread.authorize(creds)
         except Exception as e:
             print(f'GOOGLE_CREDENTIALS 解析エラー: {e}')
@@ -379,9 +432,8 @@ def get_notification_settings(client) -> Dict[str, dict]:
         return {}
 
     try:
-        spreadsheet = client.open_by_key(CONFIG_SPREADSHEET_ID)
-        worksheet = spreadsheet.worksheet(NOTIFY_SHEET_NAME)
-        records = worksheet.get_all_records()
+        worksheet = open_worksheet(client, CONFIG_SPREADSHEET_ID, NOTIFY_SHEET_NAME)
+        records = sheets_call_with_backoff(worksheet.get_all_records)
 
         settings = {}
         for record in records:
@@ -402,6 +454,7 @@ def get_notification_settings(client) -> Dict[str, dict]:
         return settings
 
     except Exception as e:
+        invalidate_sheets_cache(e, CONFIG_SPREADSHEET_ID, NOTIFY_SHEET_NAME)
         print(f'通知設定取得エラー: {e}')
         return {}
 
@@ -415,9 +468,8 @@ def get_login_credentials(client, notification_settings: Dict[str, dict], instan
         return []
 
     try:
-        spreadsheet = client.open_by_key(CONFIG_SPREADSHEET_ID)
-        worksheet = spreadsheet.worksheet(CONFIG_SHEET_NAME)
-        records = worksheet.get_all_records()
+        worksheet = open_worksheet(client, CONFIG_SPREADSHEET_ID, CONFIG_SHEET_NAME)
+        records = sheets_call_with_backoff(worksheet.get_all_records)
 
         credentials = []
         for i, record in enumerate(records):
@@ -466,6 +518,7 @@ def get_login_credentials(client, notification_settings: Dict[str, dict], instan
         return credentials
 
     except Exception as e:
+        invalidate_sheets_cache(e, CONFIG_SPREADSHEET_ID, CONFIG_SHEET_NAME)
         print(f'ログイン情報取得エラー: {e}')
         return []
 
@@ -476,9 +529,8 @@ def get_job_mappings(client) -> Dict[str, List[str]]:
         return {}
 
     try:
-        spreadsheet = client.open_by_key(MAPPING_SPREADSHEET_ID)
-        worksheet = spreadsheet.worksheet(JOB_MAPPING_SHEET_NAME)
-        records = worksheet.get_all_records()
+        worksheet = open_worksheet(client, MAPPING_SPREADSHEET_ID, JOB_MAPPING_SHEET_NAME)
+        records = sheets_call_with_backoff(worksheet.get_all_records)
 
         mappings = {}
         for record in records:
@@ -495,6 +547,7 @@ def get_job_mappings(client) -> Dict[str, List[str]]:
         return mappings
 
     except Exception as e:
+        invalidate_sheets_cache(e, MAPPING_SPREADSHEET_ID, JOB_MAPPING_SHEET_NAME)
         print(f'職種マッピング取得エラー: {e}')
         return {}
 
@@ -505,9 +558,8 @@ def get_facility_mappings(client) -> Dict[str, List[str]]:
         return {}
 
     try:
-        spreadsheet = client.open_by_key(MAPPING_SPREADSHEET_ID)
-        worksheet = spreadsheet.worksheet(FACILITY_MAPPING_SHEET_NAME)
-        records = worksheet.get_all_records()
+        worksheet = open_worksheet(client, MAPPING_SPREADSHEET_ID, FACILITY_MAPPING_SHEET_NAME)
+        records = sheets_call_with_backoff(worksheet.get_all_records)
 
         mappings = {}
         for record in records:
@@ -524,6 +576,7 @@ def get_facility_mappings(client) -> Dict[str, List[str]]:
         return mappings
 
     except Exception as e:
+        invalidate_sheets_cache(e, MAPPING_SPREADSHEET_ID, FACILITY_MAPPING_SHEET_NAME)
         print(f'施設形態マッピング取得エラー: {e}')
         return {}
 
@@ -1133,6 +1186,7 @@ def main():
     print(f'\n{"="*50}')
     print(f'全処理完了: 新着通知 合計 {total_count}件')
     print(f'総実行時間: {total_elapsed:.1f}秒')
+    print(f'Sheets API利用状況: 認証 {SHEETS_STATS["auth_calls"]}回, メタデータ取得 {SHEETS_STATS["metadata_fetches"]}回')
     print(f'終了時刻: {datetime.now(JST).strftime("%Y/%m/%d %H:%M:%S")} (JST)')
     print(f'{"="*50}')
 